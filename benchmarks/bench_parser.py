@@ -0,0 +1,71 @@
+"""
+Compare lines/sec of parse_tsg_line and the compiled TSGLineParser.
+
+Both parsers are run over the same set of key=value lines with varied values.
+The bulk parse_tsg_lines path is timed as well for reference.
+
+Usage:
+    uv run python benchmarks/bench_parser.py [--lines 100000] [--repeat 3]
+"""
+import argparse
+import random
+import time
+
+from tsgreader.tsgparser import TSGLineParser, parse_tsg_line, parse_tsg_lines
+
+
+def make_lines(n, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n):
+        seconds = i % 86400
+        lines.append(
+            f"t1= {rng.uniform(5, 30):.4f}, c1= {rng.uniform(3, 6):.5f}, "
+            f"s= {rng.uniform(30, 36):8.4f}, t2= {rng.uniform(5, 30):.4f}, "
+            f"lat=41 {rng.uniform(0, 60):.4f} N, lon=070 {rng.uniform(0, 60):.4f} W, "
+            f"hms={seconds // 3600:02d}{seconds // 60 % 60:02d}{seconds % 60:02d}, dmy=110825"
+        )
+    return lines
+
+
+def best_rate(func, lines, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(lines)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def general(lines):
+    for line in lines:
+        parse_tsg_line(line)
+
+
+def compiled(lines):
+    parse = TSGLineParser().parse
+    for line in lines:
+        parse(line)
+
+
+def bulk(lines):
+    parse_tsg_lines(lines, fmt='keyvalue')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, default=100000, help="number of lines")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per parser, best is kept")
+    args = parser.parse_args()
+
+    lines = make_lines(args.lines)
+    baseline = None
+    for name, func in (('parse_tsg_line', general), ('TSGLineParser', compiled),
+                       ('parse_tsg_lines', bulk)):
+        rate = best_rate(func, lines, args.repeat)
+        baseline = baseline or rate
+        print(f"{name:16s} {rate:12,.0f} lines/s  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
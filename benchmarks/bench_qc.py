@@ -0,0 +1,73 @@
+"""
+Measure records/sec of the real-time QC stage against the acquisition rate.
+
+Synthetic records with occasional spikes and conductivity dropouts are run
+through StreamingQC.process, and the rate is compared with --factor times
+--rate, by default 100 times the 1 Hz sample rate of the TSG. The rolling statistics
+are updated incrementally, so per-record cost should barely grow with the
+window sizes; the runs over several windows check that.
+
+Usage:
+    uv run python benchmarks/bench_qc.py [--records 100000] [--rate 1] [--factor 100]
+"""
+import argparse
+import random
+import time
+
+from tsgreader.qc import StreamingQC
+from tsgreader.tsgparser import TSGRecord
+
+
+def make_records(n, seed=0):
+    rng = random.Random(seed)
+    records = []
+    temp, salinity = 15.0, 32.0
+    for i in range(n):
+        temp += rng.gauss(0, 0.01)
+        salinity += rng.gauss(0, 0.005)
+        cond = 4.2 + (temp - 15.0) * 0.09
+        if rng.random() < 0.01:
+            # Bubble: salinity and conductivity drop for one sample
+            salinity_value, cond_value = salinity - rng.uniform(0.5, 3), cond - 0.3
+        elif rng.random() < 0.002:
+            salinity_value, cond_value = 0.0, 0.0
+        else:
+            salinity_value, cond_value = salinity, cond
+        records.append(TSGRecord(datetime_utc=i, cond=cond_value, temp=temp,
+                                 hull_temp=temp - 0.5, salinity=salinity_value))
+    return records
+
+
+def best_rate(qc_factory, records, repeat):
+    best = 0.0
+    for _ in range(repeat):
+        qc = qc_factory()
+        process = qc.process
+        start = time.perf_counter()
+        for record in records:
+            process(record)
+        best = max(best, len(records) / (time.perf_counter() - start))
+    return best, qc.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--rate', type=float, default=1.0, help="normal records/sec")
+    parser.add_argument('--factor', type=float, default=100, help="multiple of --rate to beat")
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    target = args.rate * args.factor
+    print(f"{len(records)} records, target {target:.0f} records/s")
+    for window, stuck_window in ((11, 60), (101, 600), (1001, 6000)):
+        rate, stats = best_rate(
+            lambda: StreamingQC.from_config({'window': window, 'stuck_window': stuck_window}),
+            records, args.repeat)
+        print(f"window {window:5d}, stuck_window {stuck_window:5d}: {rate:10.0f} records/s, "
+              f"{1e6 / rate:6.1f} us/record, {rate / target:7.0f}x target, flags {stats['flags']}")
+
+
+if __name__ == "__main__":
+    main()
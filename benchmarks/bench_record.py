@@ -0,0 +1,78 @@
+"""
+Measure memory per record and records/sec of the per-sample record type.
+
+Parses key=value lines with TSGLineParser.parse and keeps every record in a
+list, reporting the bytes allocated per record with tracemalloc. Then times
+parsing, the database row conversion and CSVSink writes per record.
+Run it before and after a change to the record type to compare.
+
+Usage:
+    uv run python benchmarks/bench_record.py [--records 100000] [--repeat 3]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from bench_parser import make_lines
+from tsgreader.sinks import CSVSink, record_to_row
+from tsgreader.tsgparser import TSGLineParser
+
+
+def bytes_per_record(lines):
+    parse = TSGLineParser().parse
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = [parse(line) for line in lines]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(records), records
+
+
+def best_rate(func, items, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(items)
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best
+
+
+def parse_all(lines):
+    parse = TSGLineParser().parse
+    for line in lines:
+        parse(line)
+
+
+def to_rows(records):
+    for record in records:
+        record_to_row(record)
+
+
+def to_csv(records):
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = CSVSink(os.path.join(tmp, 'tsg.csv'), flush_rows=1000)
+        for record in records:
+            sink.write(record)
+        sink.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=100000, help="number of records")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement, best is kept")
+    args = parser.parse_args()
+
+    lines = make_lines(args.records)
+    size, records = bytes_per_record(lines)
+    print(f"Record type: {type(records[0]).__name__}")
+    print(f"{'memory':>14s}: {size:10.0f} bytes/record")
+    for name, func, items in (('parse', parse_all, lines),
+                              ('record_to_row', to_rows, records),
+                              ('CSVSink.write', to_csv, records)):
+        print(f"{name:>14s}: {best_rate(func, items, args.repeat):10,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Measure how reprocessing throughput scales with the number of worker processes.
+
+A corpus of synthetic capture files is written to a temporary directory and
+reprocessed into a columnar archive, and optionally a SQLite database, with
+1, 2, 4, ... workers up to --max-workers. Parsing and calibration run in
+the workers, so archive output should scale close to linearly until the
+cores run out; SQLite output is bounded by inserts in the parent process.
+
+Usage:
+    uv run python benchmarks/bench_reprocess.py [--files 16] [--records 200000] [--max-workers 16] [--sqlite]
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from tsgreader.reprocess import ArchiveOutput, DatabaseOutput, reprocess_files
+from tsgreader.synthetic_data import format_tsg_lines, generate_tsg_batch
+
+
+def write_corpus(directory, files, records, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = []
+    start = 1710979200
+    for i in range(files):
+        batch = generate_tsg_batch(records, start_time=start + i * records, rng=rng)
+        path = os.path.join(directory, f"capture_{i:03d}.txt")
+        with open(path, 'w') as f:
+            f.write('\n'.join(format_tsg_lines(batch)) + '\n')
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=16)
+    parser.add_argument('--records', type=int, default=200_000, help="records per file")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-mb', type=float, default=16)
+    parser.add_argument('--sqlite', action='store_true', help="also time SQLite output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory, args.files, args.records)
+        size = sum(os.path.getsize(path) for path in paths)
+        print(f"{args.files} files, {args.files * args.records} records, {size / 1e6:.0f} MB, "
+              f"{os.cpu_count()} CPUs")
+        outputs = ['archive'] + (['sqlite'] if args.sqlite else [])
+        workers = 1
+        baseline = {}
+        while workers <= args.max_workers:
+            for kind in outputs:
+                target = os.path.join(directory, f"{kind}_{workers}")
+                output = (ArchiveOutput(target) if kind == 'archive'
+                          else DatabaseOutput(target + '.db', 'tsg'))
+                stats = reprocess_files(paths, output, workers=workers,
+                                        chunk_bytes=int(args.chunk_mb * (1 << 20)))
+                output.close()
+                rate = stats['records_per_sec']
+                baseline.setdefault(kind, rate)
+                print(f"{kind:8s} {workers:3d} workers: {rate:10.0f} records/s, "
+                      f"{stats['seconds']:6.2f} s, speedup {rate / baseline[kind]:5.2f}x")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compare SerialReader.read_lines against the previous in_waiting polling loop.
+
+A pseudo-terminal stands in for the serial port. For each reader the
+benchmark measures process CPU time while the port is idle and while lines
+arrive at a fixed rate, plus the latency from writing a line to the reader
+yielding it.
+
+Usage:
+    uv run python benchmarks/bench_serialreader.py [--lines 200] [--rate 50] [--idle 2]
+
+POSIX only (needs the pty module).
+"""
+import argparse
+import os
+import pty
+import statistics
+import threading
+import time
+import tty
+
+from tsgreader.serialreader import SerialReader
+
+LINE = "t1= 25.5397, c1= 0.03668, s=  0.1750, t2= 21.9663, lat=41 31.4341 N, lon=070 40.3335 W, hms=210916, dmy=110825"
+
+
+def polling_read_lines(reader: SerialReader):
+    """The read loop SerialReader used before blocking chunked reads."""
+    if not reader.serial_conn:
+        reader.connect()
+    while True:
+        if reader.serial_conn and reader.serial_conn.in_waiting:
+            line = reader.serial_conn.readline().decode('utf-8').strip()
+            if line:
+                yield line
+
+
+def chunked_read_lines(reader: SerialReader):
+    return reader.read_lines()
+
+
+def open_pty():
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    return master, slave, os.ttyname(slave)
+
+
+def consume(read_lines, port, count, arrivals, started):
+    reader = SerialReader(port, baudrate=115200, timeout=1)
+    reader.connect()
+    started.set()
+    try:
+        for line in read_lines(reader):
+            if not line.startswith('t1='):
+                continue
+            arrivals.append(time.perf_counter())
+            if len(arrivals) >= count:
+                break
+    except Exception:
+        pass
+    finally:
+        reader.close()
+
+
+def run(read_lines, lines, rate, idle):
+    master, slave, port = open_pty()
+    arrivals = []
+    started = threading.Event()
+    thread = threading.Thread(target=consume, args=(read_lines, port, lines, arrivals, started),
+                              daemon=True)
+    thread.start()
+    started.wait()
+
+    cpu_start = time.process_time()
+    time.sleep(idle)
+    idle_cpu = time.process_time() - cpu_start
+
+    payload = (LINE + "\r\n").encode()
+    sent = []
+    cpu_start = time.process_time()
+    for _ in range(lines):
+        sent.append(time.perf_counter())
+        os.write(master, payload)
+        time.sleep(1 / rate)
+    thread.join(timeout=5)
+    busy_cpu = time.process_time() - cpu_start
+
+    os.close(master)
+    os.close(slave)
+
+    latencies = [(a - s) * 1e3 for s, a in zip(sent, arrivals)]
+    return {
+        'lines_received': len(arrivals),
+        'idle_cpu_fraction': idle_cpu / idle,
+        'busy_cpu_seconds': busy_cpu,
+        'latency_ms_median': statistics.median(latencies) if latencies else None,
+        'latency_ms_max': max(latencies) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, default=200, help="lines to send per reader")
+    parser.add_argument('--rate', type=float, default=50, help="lines per second")
+    parser.add_argument('--idle', type=float, default=2, help="idle seconds measured")
+    args = parser.parse_args()
+
+    for name, read_lines in (('polling', polling_read_lines), ('chunked', chunked_read_lines)):
+        result = run(read_lines, args.lines, args.rate, args.idle)
+        print(
+            f"{name:8s} idle CPU {result['idle_cpu_fraction']:6.1%}  "
+            f"busy CPU {result['busy_cpu_seconds']:.3f}s  "
+            f"latency median {result['latency_ms_median']:.3f} ms  "
+            f"max {result['latency_ms_max']:.3f} ms  "
+            f"({result['lines_received']}/{args.lines} lines)"
+        )
+
+
+if __name__ == "__main__":
+    main()
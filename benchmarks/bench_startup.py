@@ -0,0 +1,73 @@
+"""
+Measure startup time of the tsg command and of importing the parser.
+
+Each case runs in a fresh interpreter so nothing is cached in sys.modules:
+    python: an empty interpreter, as a baseline
+    import tsgreader.tsgparser: what a helper script pays for the line parser
+    import tsgreader.main: importing the entry point without running it
+    tsg: main() with a config whose serial port does not exist, i.e. reading
+        the config, setting up logging, creating the sinks and migrating the
+        database up to the point where the port is opened
+
+Run it before and after a change to imports to compare.
+
+Usage:
+    uv run python benchmarks/bench_startup.py [--repeat 20]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+
+def write_config(workdir: Path) -> Path:
+    """Write a config.yaml whose serial port does not exist, so main() exits at once."""
+    config = {
+        'stream': {'port': str(workdir / 'no-such-port'), 'baudrate': 9600},
+        'file': {'log': str(workdir / 'tsg.log'), 'data': str(workdir / 'tsg.csv')},
+        'database': {'db': str(workdir / 'tsg.db'), 'table': 'tsg'},
+    }
+    path = workdir / 'config.yaml'
+    with open(path, 'w') as f:
+        yaml.safe_dump(config, f)
+    return path
+
+
+def time_command(args: list[str], repeat: int, cwd: Path) -> list[float]:
+    """Wall-clock milliseconds of each run of a command."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=cwd, check=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1e3)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=20, help="runs per case")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        config = write_config(workdir)
+        cases = {
+            'python': [sys.executable, '-c', 'pass'],
+            'import tsgreader.tsgparser': [sys.executable, '-c', 'import tsgreader.tsgparser'],
+            'import tsgreader.main': [sys.executable, '-c', 'import tsgreader.main'],
+            'tsg': [sys.executable, '-m', 'tsgreader.main', '--config', str(config)],
+        }
+        for name, command in cases.items():
+            times = time_command(command, args.repeat, workdir)
+            print(f"{name:>28s}: median {statistics.median(times):7.1f} ms, "
+                  f"min {min(times):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Benchmark suite for TSG ingest: parser, sinks and end-to-end acquisition.
+
+Corpora of synthetic lines are generated with synthetic_data.generate_tsg_batch
+in both line formats and cached in --corpus-dir. For each corpus the suite
+measures parse throughput of parse_tsg_line, TSGLineParser and parse_tsg_file.
+It then measures records/sec of write_to_csv and write_to_database against
+CSVSink and SQLiteSink, and the latency from a line being written to a pty to
+its row being committed by main().
+
+Results are written to JSON so runs can be compared across commits:
+
+    uv run python benchmarks/suite.py --sizes 10000 100000 --output before.json
+    uv run python benchmarks/suite.py --sizes 10000 100000 --output after.json --compare before.json
+
+The end-to-end benchmark needs a POSIX pty and is skipped elsewhere. It
+writes its own config into a temporary directory and passes it to the tsg
+entry point with --config. Startup time is measured by bench_startup.py.
+"""
+import argparse
+import json
+import os
+import platform
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from tsgreader.main import write_to_csv, write_to_database
+from tsgreader.schema import ensure_schema
+from tsgreader.sinks import CSVSink, SQLiteSink
+from tsgreader.synthetic_data import format_tsg_lines, generate_tsg_batch
+from tsgreader.tsgparser import TSGLineParser, parse_tsg_file, parse_tsg_line
+
+FORMATS = ('keyvalue', 'fixed')
+START_TIME = 1710957175
+GENERATE_CHUNK = 100_000
+
+
+def corpus_path(corpus_dir: Path, size: int, fmt: str) -> Path:
+    """Return the corpus file for a size and format, generating it if needed."""
+    path = corpus_dir / f"tsg_{fmt}_{size}.txt"
+    if path.exists():
+        return path
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(size)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', newline='') as f:
+        for first in range(0, size, GENERATE_CHUNK):
+            n = min(GENERATE_CHUNK, size - first)
+            records = generate_tsg_batch(n, start_time=START_TIME + first, rng=rng)
+            f.write('\r\n'.join(format_tsg_lines(records, fmt)) + '\r\n')
+    tmp.replace(path)
+    return path
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def bench_parsers(path: Path, size: int, max_line_parse: int) -> dict:
+    """Lines/sec of the per-line, compiled and bulk parsers on one corpus."""
+    results = {}
+    with open(path) as f:
+        lines = [line for _, line in zip(range(max_line_parse), f)]
+
+    def per_line(parse):
+        for line in lines:
+            parse(line)
+
+    seconds, _ = timed(per_line, parse_tsg_line)
+    results['parse_tsg_line'] = {'lines': len(lines), 'lines_per_sec': len(lines) / seconds}
+    seconds, _ = timed(per_line, TSGLineParser().parse)
+    results['TSGLineParser'] = {'lines': len(lines), 'lines_per_sec': len(lines) / seconds}
+    seconds, parsed = timed(parse_tsg_file, str(path))
+    results['parse_tsg_file'] = {
+        'lines': size,
+        'lines_per_sec': size / seconds,
+        'rejects': int(len(parsed.rejects)),
+    }
+    return results
+
+
+def create_table(db_path: str) -> None:
+    conn = sqlite3.connect(db_path)
+    ensure_schema(conn, 'tsg')
+    conn.close()
+
+
+def write_config(workdir: Path, port: str = 'COM6') -> Path:
+    """Write a config.yaml for main() that keeps all output inside workdir."""
+    config = {
+        'stream': {'port': port, 'baudrate': 115200},
+        'file': {'log': str(workdir / 'tsg.log'), 'data': str(workdir / 'tsg.csv')},
+        'database': {'db': str(workdir / 'tsg.db'), 'table': 'tsg', 'batch_size': 60,
+                     'flush_interval': 1},
+    }
+    path = workdir / 'config.yaml'
+    with open(path, 'w') as f:
+        yaml.safe_dump(config, f)
+    return path
+
+
+def bench_sinks(records: list[dict], workdir: Path) -> dict:
+    """Records/sec of the per-record writers and the buffered sinks."""
+    results = {}
+    n = len(records)
+
+    def run(name, write, close=None):
+        start = time.perf_counter()
+        for record in records:
+            write(record)
+        if close:
+            close()
+        results[name] = {'records': n, 'records_per_sec': n / (time.perf_counter() - start)}
+
+    csv_path = str(workdir / 'write_to_csv.csv')
+    run('write_to_csv', lambda r: write_to_csv(r, csv_path))
+
+    db_path = str(workdir / 'write_to_database.db')
+    create_table(db_path)
+    run('write_to_database', lambda r: write_to_database(r, db_path, 'tsg'))
+
+    csv_sink = CSVSink(str(workdir / 'csv_sink.csv'))
+    run('CSVSink', csv_sink.write, csv_sink.close)
+
+    db_path = str(workdir / 'sqlite_sink.db')
+    create_table(db_path)
+    db_sink = SQLiteSink(db_path, 'tsg')
+    run('SQLiteSink', db_sink.write, db_sink.close)
+    return results
+
+
+def bench_end_to_end(lines: list[str], rate: float, workdir: Path) -> dict:
+    """Latency from writing a line to the pty to its row being committed by main()."""
+    import pty
+    import tty
+
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    write_config(workdir, os.ttyname(slave))
+    db_path = workdir / 'tsg.db'
+    create_table(str(db_path))
+
+    # Run the real entry point in its own process, as on the ship
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'tsgreader.main', '--config', str(workdir / 'config.yaml')],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    # Wait for the port to be opened; pyserial discards anything sent before that
+    log_path = workdir / 'tsg.log'
+    deadline = time.perf_counter() + 30
+    while time.perf_counter() < deadline:
+        if log_path.exists() and 'Connected to serial port' in log_path.read_text():
+            break
+        time.sleep(0.05)
+
+    # Poll the table while sending and note when each row becomes visible
+    committed = []
+
+    def poll():
+        conn = sqlite3.connect(str(db_path))
+        deadline = time.perf_counter() + len(lines) / rate + 30
+        while len(committed) < len(lines) and time.perf_counter() < deadline:
+            count = conn.execute('SELECT COUNT(*) FROM tsg').fetchone()[0]
+            now = time.perf_counter()
+            committed.extend([now] * (count - len(committed)))
+            time.sleep(0.005)
+        conn.close()
+
+    poller = threading.Thread(target=poll)
+    poller.start()
+    sent = []
+    for line in lines:
+        sent.append(time.perf_counter())
+        os.write(master, (line + '\r\n').encode())
+        time.sleep(1 / rate)
+    poller.join()
+
+    process.send_signal(signal.SIGINT)
+    process.wait(timeout=10)
+    os.close(master)
+    os.close(slave)
+
+    latencies = np.array([c - s for s, c in zip(sent, committed)]) * 1e3
+    if not len(latencies):
+        return {'lines': len(lines), 'committed': 0}
+    return {
+        'lines': len(lines),
+        'committed': len(committed),
+        'rate': rate,
+        'latency_ms_p50': float(np.percentile(latencies, 50)),
+        'latency_ms_p95': float(np.percentile(latencies, 95)),
+        'latency_ms_max': float(latencies.max()),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def flatten(results: dict, prefix: str = '') -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(current: dict, previous: dict) -> None:
+    """Print rate and latency changes relative to a previous run."""
+    now = flatten(current['results'])
+    before = flatten(previous['results'])
+    print(f"\nCompared with {previous.get('commit', '?')}:")
+    for name, value in now.items():
+        if name in before and before[name] and (name.endswith('_per_sec') or 'latency' in name):
+            print(f"  {name:60s} {before[name]:14,.1f} -> {value:14,.1f}  ({value / before[name]:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000],
+                        help="corpus sizes in lines, e.g. 10000 100000 1000000 10000000")
+    parser.add_argument('--corpus-dir', default='bench_corpus', help="where corpora are cached")
+    parser.add_argument('--max-line-parse', type=int, default=1_000_000,
+                        help="cap on lines used for the per-line parsers")
+    parser.add_argument('--sink-records', type=int, default=2000,
+                        help="records written in the sink benchmarks")
+    parser.add_argument('--e2e-lines', type=int, default=200,
+                        help="lines sent in the end-to-end benchmark, 0 to skip")
+    parser.add_argument('--e2e-rate', type=float, default=20, help="lines/sec sent to the pty")
+    parser.add_argument('--output', default='bench_results.json', help="JSON results file")
+    parser.add_argument('--compare', help="previous JSON results to compare against")
+    args = parser.parse_args()
+
+    corpus_dir = Path(args.corpus_dir)
+    results = {'parse': {}, 'sinks': {}, 'end_to_end': {}}
+
+    for fmt in FORMATS:
+        for size in args.sizes:
+            path = corpus_path(corpus_dir, size, fmt)
+            results['parse'][f"{fmt}_{size}"] = bench_parsers(path, size, args.max_line_parse)
+            print(f"parse {fmt} {size}: " + ", ".join(
+                f"{name} {r['lines_per_sec']:,.0f} lines/s"
+                for name, r in results['parse'][f"{fmt}_{size}"].items()
+            ))
+
+    records = [dict(zip(r.dtype.names, r.tolist()))
+               for r in generate_tsg_batch(args.sink_records, start_time=START_TIME)]
+    with tempfile.TemporaryDirectory() as tmp:
+        results['sinks'] = bench_sinks(records, Path(tmp))
+    print("sinks: " + ", ".join(
+        f"{name} {r['records_per_sec']:,.0f} records/s" for name, r in results['sinks'].items()
+    ))
+
+    if args.e2e_lines and hasattr(os, 'openpty'):
+        lines = format_tsg_lines(generate_tsg_batch(args.e2e_lines, start_time=START_TIME))
+        with tempfile.TemporaryDirectory() as tmp:
+            results['end_to_end'] = bench_end_to_end(lines, args.e2e_rate, Path(tmp))
+        e2e = results['end_to_end']
+        if e2e.get('committed'):
+            print(f"end to end: {e2e['committed']}/{e2e['lines']} lines, "
+                  f"p50 {e2e['latency_ms_p50']:.1f} ms, p95 {e2e['latency_ms_p95']:.1f} ms, "
+                  f"max {e2e['latency_ms_max']:.1f} ms")
+
+    output = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'args': vars(args),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(output, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
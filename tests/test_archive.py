@@ -0,0 +1,166 @@
+import sqlite3
+import time
+import numpy as np
+from tsgreader.archive import Archive, ArchiveSink, convert, iter_csv, iter_sqlite, main
+from tsgreader.sinks import CSVSink, SQLiteSink
+from tsgreader.synthetic_data import generate_tsg_batch
+from tsgreader.tsgparser import MISSING_INT, TSG_DTYPE, TSGRecord
+
+# 2024-03-20 23:50:00 UTC, so a batch at 1 Hz crosses into the next day
+START = 1710978600
+
+def records_list(records):
+    return [TSGRecord(**{name: record[name].item() for name in TSG_DTYPE.names})
+            for record in records]
+
+class TestArchiveSink:
+    def test_splits_by_day_and_reads_back(self, tmp_path):
+        records = generate_tsg_batch(1200, start_time=START, rng=np.random.default_rng(0))
+        sink = ArchiveSink(str(tmp_path), flush_rows=100)
+        for record in records_list(records):
+            sink.write(record)
+        sink.close()
+
+        archive = Archive(str(tmp_path))
+        assert archive.days() == ['2024-03-20', '2024-03-21']
+        header = archive.header('2024-03-20')
+        assert header['count'] == 600
+        assert header['fields']['temp'] == '<f8'
+        assert np.array_equal(archive.read(), records)
+
+    def test_slices_are_memmap_views(self, tmp_path):
+        records = generate_tsg_batch(1200, start_time=START, rng=np.random.default_rng(1))
+        sink = ArchiveSink(str(tmp_path))
+        sink.append(records)
+        sink.close()
+
+        slices = list(Archive(str(tmp_path)).slices(START + 550, START + 649, ['temp']))
+        assert [len(s['temp']) for s in slices] == [50, 50]
+        assert isinstance(slices[0]['temp'], np.memmap)
+        assert np.array_equal(np.concatenate([s['temp'] for s in slices]),
+                              records['temp'][550:650])
+
+    def test_appends_across_sinks(self, tmp_path):
+        records = generate_tsg_batch(20, start_time=START, rng=np.random.default_rng(2))
+        for part in (records[:10], records[10:]):
+            sink = ArchiveSink(str(tmp_path))
+            sink.append(part)
+            sink.close()
+        assert np.array_equal(Archive(str(tmp_path)).read(), records)
+
+    def test_partial_write_is_trimmed(self, tmp_path):
+        records = generate_tsg_batch(10, start_time=START, rng=np.random.default_rng(3))
+        sink = ArchiveSink(str(tmp_path))
+        sink.append(records)
+        sink.close()
+        # As if the process died after appending a value but before the header
+        with open(tmp_path / '2024-03-20' / 'temp.bin', 'ab') as f:
+            f.write(np.float64(1.0).tobytes())
+
+        sink = ArchiveSink(str(tmp_path))
+        sink.append(records[:1])
+        sink.close()
+        archived = Archive(str(tmp_path)).read()
+        assert len(archived) == 11
+        assert archived['temp'][10] == records['temp'][0]
+
+    def test_out_of_order_day(self, tmp_path):
+        records = generate_tsg_batch(10, start_time=START, rng=np.random.default_rng(4))
+        sink = ArchiveSink(str(tmp_path))
+        sink.append(records[5:])
+        sink.append(records[:5])
+        sink.close()
+        archive = Archive(str(tmp_path))
+        assert not archive.header('2024-03-20')['sorted']
+        (part,) = archive.slices(START + 3, START + 6)
+        assert sorted(part['datetime_utc']) == [START + 3, START + 4, START + 5, START + 6]
+
+    def test_records_without_time_are_skipped(self, tmp_path):
+        sink = ArchiveSink(str(tmp_path))
+        sink.write(TSGRecord(temp=20.0))
+        sink.close()
+        assert sink.stats()['skipped'] == 1
+        assert Archive(str(tmp_path)).days() == []
+
+class TestConvert:
+    def test_from_csv(self, tmp_path):
+        records = generate_tsg_batch(50, start_time=START, rng=np.random.default_rng(5))
+        csv_path = tmp_path / 'tsg.csv'
+        sink = CSVSink(str(csv_path))
+        for record in records_list(records):
+            sink.write(record)
+        sink.close()
+
+        stats = convert(iter_csv(str(csv_path)), str(tmp_path / 'archive'))
+        assert stats['records'] == 50
+        archived = Archive(str(tmp_path / 'archive')).read()
+        assert np.array_equal(archived['datetime_utc'], records['datetime_utc'])
+        assert np.allclose(archived['salinity'], records['salinity'])
+        assert np.all(archived['qc_flag'] == MISSING_INT)
+
+        # Days already archived are not converted again
+        assert convert(iter_csv(str(csv_path)), str(tmp_path / 'archive'))['records'] == 0
+
+    def test_from_sqlite_via_main(self, tmp_path):
+        records = generate_tsg_batch(30, start_time=START, rng=np.random.default_rng(6))
+        db_path = str(tmp_path / 'tsg.db')
+        sink = SQLiteSink(db_path, 'tsg')
+        for record in records_list(records):
+            sink.write(record)
+        sink.close()
+
+        assert sum(len(chunk) for chunk in iter_sqlite(db_path, 'tsg')) == 30
+        main([str(tmp_path / 'archive'), '--db', db_path, '--table', 'tsg'])
+        archived = Archive(str(tmp_path / 'archive')).read()
+        assert np.array_equal(archived['nmea_time'], records['nmea_time'])
+        assert np.allclose(archived['temp'], records['temp'])
+
+    def test_overlapping_sources_are_archived_once(self, tmp_path):
+        records = generate_tsg_batch(1200, start_time=START, rng=np.random.default_rng(7))
+        csv_path = str(tmp_path / 'tsg.csv')
+        db_path = str(tmp_path / 'tsg.db')
+        for sink in (CSVSink(csv_path), SQLiteSink(db_path, 'tsg')):
+            for record in records_list(records):
+                sink.write(record)
+            sink.close()
+
+        root = str(tmp_path / 'archive')
+        # A partly archived day is completed rather than skipped
+        convert([records[:300]], root)
+        main([root, '--csv', csv_path, '--db', db_path, '--table', 'tsg'])
+        archived = Archive(root).read()
+        assert len(archived) == 1200
+        assert np.array_equal(archived['datetime_utc'], records['datetime_utc'])
+
+    def test_same_second_without_nmea_time_is_kept(self, tmp_path):
+        records = generate_tsg_batch(2, start_time=START, rng=np.random.default_rng(8))
+        records['datetime_utc'] = START
+        records['nmea_time'] = MISSING_INT
+
+        assert convert([records], str(tmp_path))['records'] == 2
+        assert len(Archive(str(tmp_path)).read()) == 2
+
+    def test_naive_csv_times_are_utc(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('TZ', 'America/New_York')
+        time.tzset()
+        try:
+            csv_path = tmp_path / 'tsg.csv'
+            csv_path.write_text("datetime_utc,temp,nmea_time\n"
+                                f"{START},20.0,2024-03-20 23:50:00\n")
+            (records,) = iter_csv(str(csv_path))
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+        assert records['nmea_time'][0] == START
+
+    def test_from_legacy_table_without_id(self, tmp_path):
+        db_path = str(tmp_path / 'tsg.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE tsg (datetime_utc, temp, nmea_time)")
+        conn.executemany("INSERT INTO tsg VALUES (?, ?, ?)",
+                         [(START + 1, 20.1, START + 1), (START, 20.0, START)])
+        conn.commit()
+        conn.close()
+
+        (records,) = iter_sqlite(db_path, 'tsg')
+        assert records['datetime_utc'].tolist() == [START, START + 1]
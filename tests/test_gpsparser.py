@@ -0,0 +1,58 @@
+import pytest
+from datetime import datetime, timezone
+from tsgreader.gpsparser import NMEAParser, nmea_checksum, parse_nmea_coordinate
+
+def sentence(body):
+    return f"${body}*{nmea_checksum(body):02X}"
+
+RMC = sentence("GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230324,003.1,W")
+GGA = sentence("GPGGA,123520,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,")
+
+class TestNMEAParser:
+    def test_rmc(self):
+        record = NMEAParser().parse(RMC)
+
+        assert record.sentence == 'RMC'
+        assert record.nmea_time == datetime(2024, 3, 23, 12, 35, 19, tzinfo=timezone.utc)
+        assert record.latitude == pytest.approx(48.1173)
+        assert record.longitude == pytest.approx(11.516667)
+        assert record.speed_knots == 22.4
+        assert record.course == 84.4
+
+    def test_gga_uses_rmc_date(self):
+        parser = NMEAParser()
+        assert parser.parse(GGA).nmea_time is None
+        parser.parse(RMC)
+        record = parser.parse(GGA)
+
+        assert record.sentence == 'GGA'
+        assert record.nmea_time == datetime(2024, 3, 23, 12, 35, 20, tzinfo=timezone.utc)
+        assert record.fix_quality == 1
+        assert record.satellites == 8
+        assert record.hdop == 0.9
+        assert record.altitude == 545.4
+
+    def test_rmc_without_fix_has_no_position(self):
+        record = NMEAParser().parse(sentence("GPRMC,123519,V,4807.038,N,01131.000,E,,,230324,,"))
+
+        assert record.latitude is None and record.longitude is None
+
+    def test_checksum(self):
+        # Reference sentence with its published checksum
+        assert nmea_checksum("GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W") == 0x6A
+
+    def test_bad_checksum(self):
+        with pytest.raises(ValueError):
+            NMEAParser().parse(RMC[:-2] + "00")
+
+    def test_not_nmea(self):
+        with pytest.raises(ValueError):
+            NMEAParser().parse("t1= 20.0, c1= 5.0")
+
+    def test_other_sentences_ignored(self):
+        assert NMEAParser().parse(sentence("GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1")) is None
+
+    def test_southern_western_coordinates(self):
+        assert parse_nmea_coordinate("3330.000", "S") == -33.5
+        assert parse_nmea_coordinate("07015.000", "W") == -70.25
+        assert parse_nmea_coordinate("", "N") is None
@@ -0,0 +1,83 @@
+import json
+import sqlite3
+import pytest
+from tsgreader import importer
+from tsgreader.importer import import_files, main
+
+DATA_FILE = "tests/data/2024_03_20_152p_HTcapture_SSout_notXML.TXT"
+KV_LINE = "t1= 25.5397, c1= 0.03668, s=  0.1750, t2= 21.9663, lat=41 31.4341 N, lon=070 40.3335 W, hms=210916, dmy=110825"
+
+def rows(db_path, columns="*"):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT {columns} FROM tsg ORDER BY rowid").fetchall()
+    finally:
+        conn.close()
+
+class TestImportFiles:
+    def test_imports_file(self, tmp_path):
+        db_path = str(tmp_path / "tsg.db")
+        stats = import_files([DATA_FILE], db_path, 'tsg')
+
+        assert stats['inserted'] == 86
+        assert stats['rejects'] == 0
+        assert stats['rows_per_sec'] > 0
+        assert rows(db_path, "scan_no")[0] == (15,)
+
+    def test_skips_duplicates(self, tmp_path):
+        db_path = str(tmp_path / "tsg.db")
+        import_files([DATA_FILE], db_path, 'tsg')
+        stats = import_files([DATA_FILE], db_path, 'tsg')
+
+        assert stats['inserted'] == 0
+        assert stats['duplicates'] == 86
+        assert len(rows(db_path)) == 86
+
+    def test_missing_values_stored_as_null(self, tmp_path):
+        capture = tmp_path / "capture.txt"
+        capture.write_text(KV_LINE + "\n" + "garbage\n")
+        db_path = str(tmp_path / "tsg.db")
+        stats = import_files([str(capture)], db_path, 'tsg')
+
+        assert stats['rejects'] == 1
+        scan_no, time_elapsed, nmea_time = rows(db_path, "scan_no, time_elapsed, nmea_time")[0]
+        assert scan_no is None
+        assert time_elapsed is None
+        assert nmea_time == 1754946556
+
+    def test_resumes_from_checkpoint(self, tmp_path, monkeypatch):
+        db_path = str(tmp_path / "tsg.db")
+        checkpoint = str(tmp_path / "import.json")
+        calls = []
+        records_to_rows = importer.records_to_rows
+
+        def fail_on_third_chunk(records):
+            calls.append(len(records))
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            return records_to_rows(records)
+
+        monkeypatch.setattr(importer, 'records_to_rows', fail_on_third_chunk)
+        with pytest.raises(KeyboardInterrupt):
+            import_files([DATA_FILE], db_path, 'tsg', batch_rows=1, chunk_size=1000,
+                         checkpoint_path=checkpoint)
+        saved = json.load(open(checkpoint))
+        entry = next(iter(saved.values()))
+        assert entry['offset'] > 0
+        assert not entry['done']
+        imported = len(rows(db_path))
+
+        monkeypatch.setattr(importer, 'records_to_rows', records_to_rows)
+        stats = import_files([DATA_FILE], db_path, 'tsg', checkpoint_path=checkpoint)
+
+        assert stats['inserted'] == 86 - imported
+        assert stats['duplicates'] == 0
+        assert len(rows(db_path)) == 86
+
+    def test_main_skips_finished_files(self, tmp_path):
+        db_path = str(tmp_path / "tsg.db")
+        main([DATA_FILE, '--db', db_path, '--table', 'tsg'])
+        main([DATA_FILE, '--db', db_path, '--table', 'tsg'])
+
+        assert len(rows(db_path)) == 86
+        assert (tmp_path / "tsg.db.import.json").exists()
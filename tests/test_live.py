@@ -0,0 +1,118 @@
+import json
+import math
+import pytest
+from datetime import datetime, timezone
+from urllib.error import HTTPError
+from urllib.request import urlopen
+from tsgreader.live import LiveServer, RingBuffer, records_to_json
+
+START = 1710957175
+
+def record(t, **values):
+    return dict({
+        'datetime_utc': t,
+        'scan_no': None,
+        'cond': 5.0,
+        'temp': 20.0 + (t - START) / 100,
+        'salinity': 33.1,
+        'hull_temp': 10.8,
+        'time_elapsed': None,
+        'nmea_time': datetime.fromtimestamp(t, timezone.utc),
+        'latitude': 41.3,
+        'longitude': -72.0,
+    }, **values)
+
+@pytest.fixture
+def buffer():
+    buffer = RingBuffer(10)
+    for t in range(START, START + 15):
+        buffer.write(record(t))
+    return buffer
+
+class TestRingBuffer:
+    def test_keeps_newest_records(self, buffer):
+        assert len(buffer) == 10
+        assert buffer.range()['datetime_utc'].tolist() == list(range(START + 5, START + 15))
+
+    def test_latest(self, buffer):
+        assert buffer.latest()['datetime_utc'].tolist() == [START + 14]
+        assert buffer.latest(3)['datetime_utc'].tolist() == [START + 12, START + 13, START + 14]
+        assert len(buffer.latest(100)) == 10
+
+    def test_range_across_wrap(self, buffer):
+        times = buffer.range(START + 7, START + 12)['datetime_utc'].tolist()
+
+        assert times == list(range(START + 7, START + 13))
+
+    def test_since(self, buffer):
+        assert buffer.since(START + 12)['datetime_utc'].tolist() == [START + 13, START + 14]
+        assert buffer.since(START, limit=2)['datetime_utc'].tolist() == [START + 5, START + 6]
+
+    def test_decimated(self, buffer):
+        records = buffer.decimated(max_points=4)
+
+        assert records['datetime_utc'].tolist() == [START + 5, START + 8, START + 11, START + 14]
+
+    def test_missing_values(self):
+        buffer = RingBuffer(2)
+        buffer.write(record(START, salinity=float('nan'), latitude=None))
+        result = records_to_json(buffer.latest())[0]
+
+        assert result['salinity'] is None
+        assert result['latitude'] is None
+        assert result['scan_no'] is None
+        assert result['nmea_time'] == START
+
+    def test_invalid_capacity(self):
+        with pytest.raises(ValueError):
+            RingBuffer(0)
+
+@pytest.fixture
+def server(buffer):
+    server = LiveServer(buffer, port=0)
+    server.start()
+    yield server
+    server.stop()
+
+def get(server, path):
+    host, port = server.address
+    with urlopen(f"http://{host}:{port}{path}", timeout=5) as response:
+        return json.load(response)['records']
+
+class TestLiveServer:
+    def test_latest(self, server):
+        records = get(server, "/latest?n=2")
+
+        assert [r['datetime_utc'] for r in records] == [START + 13, START + 14]
+        assert math.isclose(records[-1]['temp'], 20.14)
+
+    def test_since(self, server):
+        records = get(server, f"/since?t={START + 12}")
+
+        assert [r['datetime_utc'] for r in records] == [START + 13, START + 14]
+
+    def test_range(self, server):
+        records = get(server, f"/range?start={START + 6}&end={START + 13}&max_points=4")
+
+        assert [r['datetime_utc'] for r in records] == [START + 6, START + 8, START + 10, START + 12]
+
+    def test_stats(self, buffer):
+        server = LiveServer(buffer, port=0, stats=lambda: {'counters': {'lines': 3}})
+        server.start()
+        try:
+            host, port = server.address
+            with urlopen(f"http://{host}:{port}/stats", timeout=5) as response:
+                assert json.load(response) == {'counters': {'lines': 3}}
+        finally:
+            server.stop()
+
+    def test_bad_requests(self, server):
+        with pytest.raises(HTTPError) as error:
+            get(server, "/since")
+        assert error.value.code == 400
+        with pytest.raises(HTTPError) as error:
+            get(server, "/nothing")
+        assert error.value.code == 404
+        with pytest.raises(HTTPError) as error:
+            get(server, "/stats")
+        assert error.value.code == 404
@@ -1,22 +1,31 @@
 import pytest
-from unittest.mock import Mock, patch, mock_open
+import sqlite3
+import subprocess
+import sys
+from unittest.mock import Mock, patch
 from pathlib import Path
-from tsgreader.main import main
+from tsgreader.main import main, write_to_database
 import yaml
 
 @pytest.fixture
-def mock_config():
-    return {
+def mock_config(tmp_path):
+    config = {
         "stream": {
             "port": "/dev/ttyUSB0",
             "baudrate": 9600
         },
         "file": {
-            "log": "tsg.log",
-            "data": "tsg_data.csv",
-            "db": "tsg.db"
+            "log": str(tmp_path / "tsg.log"),
+            "data": str(tmp_path / "tsg_data.csv"),
+        },
+        "database": {
+            "db": str(tmp_path / "tsg.db"),
+            "table": "tsg"
         }
     }
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.safe_dump(config))
+    return str(path)
 
 @pytest.fixture
 def sample_tsg_data():
@@ -25,27 +34,18 @@ def sample_tsg_data():
         return [line.strip() for line in f if line.strip()]
 
 def test_main_writes_to_csv(mock_config, sample_tsg_data):
-    # Mock the config file reading
-    mock_yaml = Mock()
-    mock_yaml.safe_load.return_value = mock_config
-    
     # Mock the SerialReader
     mock_reader = Mock()
     mock_reader.read_lines.return_value = iter(sample_tsg_data)
     mock_reader.close = Mock()
     
-    # Mock the CSV file operations
-    mock_csv_file = mock_open()
-    
-    with patch('builtins.open', mock_csv_file), \
-         patch('yaml.safe_load', mock_yaml.safe_load), \
-         patch('tsgreader.main.SerialReader', return_value=mock_reader), \
+    with patch('tsgreader.main.SerialReader', return_value=mock_reader), \
          patch('csv.DictWriter') as mock_csv_writer:
         
         # Run main until KeyboardInterrupt
         #with pytest.raises(KeyboardInterrupt):
         with patch('time.time', side_effect=[0, 1, 2]):  # Simulate time passing
-            main()
+            main(["--config", mock_config])
         
         # Verify the serial port was closed
         #mock_reader.close.assert_called_once()
@@ -55,28 +55,43 @@ def test_main_writes_to_csv(mock_config, sample_tsg_data):
         assert writer.writerow.call_count == len(sample_tsg_data)
 
 def test_main_handles_parser_error(mock_config):
-    # Mock the config file reading
-    mock_yaml = Mock()
-    mock_yaml.safe_load.return_value = mock_config
-    
     # Mock the SerialReader with invalid data
     mock_reader = Mock()
     mock_reader.read_lines.return_value = iter(["invalid data"])
     mock_reader.close = Mock()
     
-    # Mock the CSV file operations
-    mock_csv_file = mock_open()
-    
-    with patch('builtins.open', mock_csv_file), \
-         patch('yaml.safe_load', mock_yaml.safe_load), \
-         patch('tsgreader.main.SerialReader', return_value=mock_reader), \
+    with patch('tsgreader.main.SerialReader', return_value=mock_reader), \
          patch('csv.DictWriter') as mock_csv_writer:
         
         # Run main until KeyboardInterrupt
         #with pytest.raises(KeyboardInterrupt):
         with patch('time.time', side_effect=[0, 1, 2]):  # Simulate time passing
-            main()
+            main(["--config", mock_config])
         
         # Verify no data was written for invalid input
         writer = mock_csv_writer.return_value
-        assert writer.writerow.call_count == 0
\ No newline at end of file
+        assert writer.writerow.call_count == 0
+
+
+def test_import_is_lazy():
+    # Importing the entry point must not read config.yaml, set up logging or load gsw
+    code = ("import sys, logging, tsgreader.main; "
+            "assert 'gsw' not in sys.modules and 'numpy' not in sys.modules; "
+            "assert not logging.getLogger().handlers")
+    result = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+def test_write_to_database_partial_record(tmp_path):
+    # Fields missing from the record are stored and rolled up as NULL
+    db_path = str(tmp_path / "tsg.db")
+    write_to_database({'datetime_utc': 1710957125, 'temp': 20.5}, db_path, 'tsg')
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT datetime_utc, temp, salinity FROM tsg").fetchall() == \
+            [(1710957125, 20.5, None)]
+        assert conn.execute("SELECT bin, n, temp_sum, salinity_n FROM tsg_1min").fetchall() == \
+            [(1710957120, 1, 20.5, 0)]
+    finally:
+        conn.close()
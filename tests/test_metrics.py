@@ -0,0 +1,109 @@
+import json
+import os
+import pytest
+from unittest.mock import Mock
+from tsgreader.metrics import LatencyHistogram, Metrics, ProfileHook, StatsReporter
+from tsgreader.sinks import SQLiteSink
+
+class TestLatencyHistogram:
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for _ in range(90):
+            histogram.record(0.001)
+        for _ in range(10):
+            histogram.record(0.5)
+
+        assert histogram.percentile(50) == pytest.approx(0.001)
+        assert histogram.percentile(95) == pytest.approx(0.5)
+        assert histogram.max == 0.5
+
+    def test_percentile_within_bucket_resolution(self):
+        histogram = LatencyHistogram()
+        histogram.record(0.0042)
+
+        # Reported as the bucket's upper bound, capped at the largest value
+        assert histogram.percentile(50) == pytest.approx(0.0042)
+        histogram.record(0.003)
+        assert 0.003 <= histogram.percentile(50) <= 0.003 * 10 ** 0.2
+
+    def test_empty(self):
+        summary = LatencyHistogram().summary()
+
+        assert summary == {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'max': None}
+
+class TestMetrics:
+    def test_snapshot(self):
+        metrics = Metrics()
+        metrics.incr('lines', 3)
+        metrics.incr('parse_errors')
+        metrics.observe('parse', 0.002)
+
+        snapshot = metrics.snapshot()
+
+        assert snapshot['counters']['lines']['total'] == 3
+        assert snapshot['counters']['parse_errors']['total'] == 1
+        assert snapshot['latency_ms']['parse']['count'] == 1
+        assert snapshot['latency_ms']['parse']['max'] == 2.0
+
+    def test_snapshot_starts_new_interval(self):
+        metrics = Metrics()
+        metrics.incr('lines', 3)
+        metrics.observe('parse', 0.002)
+        metrics.snapshot()
+
+        snapshot = metrics.snapshot()
+
+        assert snapshot['counters']['lines'] == {'total': 3, 'rate': 0.0}
+        assert snapshot['latency_ms']['parse']['count'] == 0
+
+class TestStatsReporter:
+    def test_writes_json_file(self, tmp_path):
+        metrics = Metrics()
+        metrics.incr('records', 5)
+        path = tmp_path / "stats.json"
+        reporter = StatsReporter(metrics, str(path), sources={'database': lambda: {'records': 5}})
+
+        reporter.write()
+
+        stats = json.loads(path.read_text())
+        assert stats['counters']['records']['total'] == 5
+        assert stats['database'] == {'records': 5}
+        assert reporter.latest == stats
+        assert not os.path.exists(f"{path}.tmp")
+
+    def test_failing_source_is_skipped(self, tmp_path):
+        def broken():
+            raise RuntimeError("no stats")
+        reporter = StatsReporter(Metrics(), str(tmp_path / "stats.json"), sources={'serial': broken})
+
+        assert 'serial' not in reporter.write()
+
+class TestProfileHook:
+    def test_trigger_file_starts_profile(self, tmp_path):
+        trigger = tmp_path / "tsg.profile"
+        profiler = ProfileHook(str(trigger), seconds=0, output_dir=str(tmp_path))
+        profiler.check()
+        assert not list(tmp_path.glob("*.prof"))
+
+        trigger.touch()
+        profiler.poll()
+        assert not trigger.exists()
+        profiler.check()
+        sum(range(1000))
+        profiler.check()
+
+        assert len(list(tmp_path.glob("tsg_profile_*.prof"))) == 1
+
+def test_sqlite_sink_times_commit_and_end_to_end(tmp_path):
+    metrics = Metrics()
+    sink = SQLiteSink(str(tmp_path / "tsg.db"), 'tsg', batch_size=2, metrics=metrics)
+    record = {'datetime_utc': 1710957175, 'temp': 20.0}
+    sink.write(record, arrival=0.0)
+    sink.write(record)
+    sink.close()
+
+    latency = metrics.snapshot()['latency_ms']
+    assert latency['commit']['count'] == 1
+    assert latency['end_to_end']['count'] == 2
+    # The first record claims to have arrived at perf_counter() == 0
+    assert latency['end_to_end']['max'] > latency['commit']['max']
@@ -1,6 +1,13 @@
+import csv
+import io
 import pytest
-from tsgreader.tsgparser import parse_tsg_line, conductivity_to_salinity
-from datetime import datetime
+import numpy as np
+from pathlib import Path
+from tsgreader.tsgparser import (
+    parse_tsg_line, conductivity_to_salinity, conductivity_to_salinity_array, parse_tsg_lines,
+    parse_tsg_file, iter_tsg_file, MISSING_INT, TSGLineParser, KEYVALUE_LAYOUT, TSGRecord,
+)
+from datetime import datetime, timezone
 
 class TestParseTSGLine:
     def test_parse_valid_tsg_line(self):
@@ -13,7 +20,8 @@ class TestParseTSGLine:
         assert result['hull_temp'] == 11.98
         assert result['time_elapsed'] == 3600.5
         assert isinstance(result['nmea_time'], datetime)
-        assert result['nmea_time'] == datetime.fromtimestamp(1749519966)  # Remove last 4 digits to match format
+        assert result['nmea_time'] == datetime.fromtimestamp(1749519966, timezone.utc)
+        assert result['nmea_time'].tzinfo is not None
         assert result['latitude'] == -42.1234
         assert result['longitude'] == 147.8901
 
@@ -87,6 +95,16 @@ class TestConductivityToSalinity:
 
         assert salinity > 0, "Salinity should be positive"
 
+    def test_matches_instrument_salinity(self):
+        """Conductivity in S/m gives the salinity the instrument reports in its s field."""
+        record = parse_tsg_line(KV_LINE)
+
+        assert record['salinity'] == 0.175
+        salinity = conductivity_to_salinity(record['cond'], record['temp'])
+        assert salinity == pytest.approx(0.175, abs=0.005)
+        array = conductivity_to_salinity_array([record['cond']], [record['temp']])
+        assert array[0] == pytest.approx(0.175, abs=0.005)
+
     def test_conductivity_to_salinity_invalid_inputs(self):
         """Test conductivity_to_salinity with invalid inputs."""
         with pytest.raises(ValueError):
@@ -94,3 +112,167 @@ class TestConductivityToSalinity:
 
         with pytest.raises(ValueError):
             conductivity_to_salinity(5.0, -10.0)  # Negative temperature
+
+DATA_FILE = "tests/data/2024_03_20_152p_HTcapture_SSout_notXML.TXT"
+KV_LINE = "t1= 25.5397, c1= 0.03668, s=  0.1750, t2= 21.9663, lat=41 31.4341 N, lon=070 40.3335 W, hms=210916, dmy=110825"
+
+class TestBulkParse:
+    def test_parse_file_matches_line_parser(self):
+        result = parse_tsg_file(DATA_FILE)
+        with open(DATA_FILE) as f:
+            expected = [parse_tsg_line(line.strip()) for line in f if line.strip()]
+
+        assert len(result.rejects) == 0
+        assert len(result.records) == len(expected)
+        assert result.records['scan_no'].tolist() == [r['scan_no'] for r in expected]
+        assert result.records['cond'].tolist() == [r['cond'] for r in expected]
+        assert result.records['nmea_time'][0] == 1710957175
+        assert np.allclose(result.records['salinity'], [r['salinity'] for r in expected])
+
+    def test_small_chunks_give_same_result(self):
+        whole = parse_tsg_file(DATA_FILE)
+        chunked = parse_tsg_file(DATA_FILE, chunk_size=100)
+
+        assert whole.records.tolist() == chunked.records.tolist()
+
+    def test_byte_ranges_cover_file_once(self):
+        size = Path(DATA_FILE).stat().st_size
+        bounds = [0, 1000, 1001, 4000, size]
+        records = []
+        for start, end in zip(bounds, bounds[1:]):
+            for chunk in iter_tsg_file(DATA_FILE, start=start, end=end, chunk_size=512):
+                records.append(chunk.records)
+
+        assert np.concatenate(records)['scan_no'].tolist() == list(range(15, 101))
+
+    def test_bad_lines_are_rejected(self):
+        lines = [
+            "1 4.56 12.34 11.98 3600.5 1749519966 -42.1234 147.8901",
+            "2 bad 12.34 11.98 3600.5 1749519966 -42.1234 147.8901",
+            "",
+            "3 4.56 12.34",
+            "4 4.57 12.35 11.99",
+        ]
+        result = parse_tsg_lines(lines)
+
+        assert result.records['scan_no'].tolist() == [1, 4]
+        assert result.rejects.tolist() == [1, 3]
+        assert result.records['nmea_time'][1] == MISSING_INT
+        assert np.isnan(result.records['latitude'][1])
+
+    def test_keyvalue_lines(self):
+        result = parse_tsg_lines([KV_LINE, "t1= 25.5"])
+
+        assert result.rejects.tolist() == [1]
+        record = result.records[0]
+        assert record['temp'] == 25.5397
+        assert record['salinity'] == 0.1750
+        assert record['latitude'] == pytest.approx(41 + 31.4341 / 60)
+        assert record['longitude'] == pytest.approx(-(70 + 40.3335 / 60))
+        assert record['nmea_time'] == int(datetime(2025, 8, 11, 21, 9, 16, tzinfo=timezone.utc).timestamp())
+
+    def test_invalid_format(self):
+        with pytest.raises(ValueError):
+            parse_tsg_lines([KV_LINE], fmt='xml')
+
+class TestTSGLineParser:
+    def test_matches_general_parser(self):
+        parser = TSGLineParser()
+        lines = [KV_LINE, KV_LINE.replace("t1= 25.5397", "t1= 24.1000").replace("N,", "S,")]
+        for line in lines:
+            fast = parser.parse(line)
+            expected = parse_tsg_line(line)
+            assert isinstance(expected, dict)
+            assert dict(fast.to_dict(), datetime_utc=None) == dict(expected, datetime_utc=None)
+
+        assert parser.layout == KEYVALUE_LAYOUT
+        assert parser.fast_count == 1
+        assert parser.fallback_count == 1
+
+    def test_precompiled_layout(self):
+        parser = TSGLineParser(layout=KEYVALUE_LAYOUT)
+        parser.parse(KV_LINE)
+
+        assert parser.fast_count == 1
+        assert parser.fallback_count == 0
+
+    def test_layout_without_position(self):
+        parser = TSGLineParser()
+        line = "t1= 25.5397, c1= 0.03668, s=  0.1750, t2= 21.9663"
+        parser.parse(line)
+        result = parser.parse(line)
+
+        assert parser.fast_count == 1
+        assert result['latitude'] is None
+        assert result['nmea_time'] is None
+
+    def test_mismatched_line_falls_back(self):
+        parser = TSGLineParser(layout=KEYVALUE_LAYOUT)
+        result = parser.parse("c1= 0.03668, t1= 25.5397, t2= 21.9663, s=  0.1750")
+
+        assert result['temp'] == 25.5397
+        assert parser.fallback_count == 1
+
+    def test_relearns_after_repeated_misses(self):
+        parser = TSGLineParser(layout=KEYVALUE_LAYOUT, relearn_after=2)
+        line = "c1= 0.03668, t1= 25.5397, t2= 21.9663, s=  0.1750"
+        for _ in range(3):
+            parser.parse(line)
+
+        assert parser.layout == ('c1', 't1', 't2', 's')
+        assert parser.fast_count == 1
+
+    def test_invalid_values_raise_like_general_parser(self):
+        parser = TSGLineParser(layout=KEYVALUE_LAYOUT)
+        with pytest.raises(ValueError) as exc_info:
+            parser.parse(KV_LINE.replace("dmy=110825", "dmy=119925"))
+        assert "Error parsing TSG line" in str(exc_info.value)
+
+    def test_fixed_width_lines_use_general_parser(self):
+        parser = TSGLineParser()
+        result = parser.parse("1235 4.57 12.35 11.99")
+
+        assert result['scan_no'] == 1235
+        assert parser.layout is None
+
+class TestTSGRecord:
+    def test_parse_tsg_line_returns_dict(self):
+        assert type(parse_tsg_line(KV_LINE)) is dict
+
+    def test_reads_like_a_dict(self):
+        record = TSGLineParser().parse(KV_LINE)
+
+        assert isinstance(record, TSGRecord)
+        assert record['temp'] == record.temp == record.get('temp') == 25.5397
+        assert record.get('missing', 0) == 0
+        assert 'salinity' in record.keys() and 'missing' not in record.keys()
+        assert record[3] == record.temp
+        with pytest.raises(KeyError):
+            record['missing']
+
+    def test_is_still_a_tuple(self):
+        record = TSGLineParser().parse(KV_LINE)
+
+        assert 25.5397 in record
+        assert 'temp' not in record
+        assert record[0] == record.datetime_utc
+        assert record[2:4] == (record.cond, record.temp)
+        datetime_utc, scan_no, cond, temp, *rest = record
+        assert temp == 25.5397 and len(rest) == len(record) - 4
+
+    def test_to_dict(self):
+        record = TSGLineParser().parse(KV_LINE)
+        as_dict = record.to_dict()
+
+        assert list(as_dict) == list(record.keys())
+        assert TSGRecord(**as_dict) == record
+
+    def test_csv_dictwriter(self):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=['temp', 'salinity'])
+        with pytest.raises(ValueError):
+            writer.writerow(parse_tsg_line(KV_LINE))
+
+        writer = csv.DictWriter(buffer, fieldnames=['temp', 'salinity'], extrasaction='ignore')
+        writer.writerow(parse_tsg_line(KV_LINE))
+        assert buffer.getvalue().strip() == "25.5397,0.175"
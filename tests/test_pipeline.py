@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+import pytest
+from unittest.mock import Mock
+from tsgreader.metrics import Metrics, ProfileHook
+from tsgreader.pipeline import BoundedQueue, Pipeline
+from tsgreader.tsgparser import TSGRecord
+
+class RecordingSink:
+    def __init__(self, fail=False):
+        self.records = []
+        self.fail = fail
+        self.flushes = 0
+
+    def write(self, record):
+        if self.fail:
+            raise OSError("disk full")
+        self.records.append(record)
+
+    def flush_due(self):
+        return False
+
+    def flush(self):
+        self.flushes += 1
+
+def parse(line):
+    if line == "bad":
+        raise ValueError("bad line")
+    return TSGRecord(temp=float(line))
+
+class TestBoundedQueue:
+    def test_fifo_and_close(self):
+        q = BoundedQueue('test', maxsize=3)
+        for i in range(3):
+            q.put(i)
+        q.close()
+
+        assert [q.get(), q.get(), q.get(), q.get()] == [0, 1, 2, None]
+
+    def test_get_timeout(self):
+        q = BoundedQueue('test')
+        with pytest.raises(queue.Empty):
+            q.get(timeout=0.01)
+
+    def test_drop_oldest(self):
+        q = BoundedQueue('test', maxsize=2, backpressure='drop_oldest')
+        for i in range(5):
+            q.put(i)
+
+        assert q.stats()['dropped'] == 3
+        assert [q.get(), q.get()] == [3, 4]
+
+    def test_spill_preserves_order(self, tmp_path):
+        q = BoundedQueue('test', maxsize=2, backpressure='spill',
+                         spill_path=str(tmp_path / "test.spill"))
+        for i in range(7):
+            q.put({'n': i})
+        stats = q.stats()
+
+        assert stats['depth'] == 7
+        assert stats['spilled'] == 5
+        assert [q.get()['n'] for _ in range(7)] == list(range(7))
+        assert q.depth() == 0
+
+    def test_block_waits_for_consumer(self):
+        q = BoundedQueue('test', maxsize=1)
+        q.put(0)
+        producer = threading.Thread(target=q.put, args=(1,))
+        producer.start()
+        producer.join(timeout=0.05)
+        assert producer.is_alive()
+
+        assert q.get() == 0
+        producer.join(timeout=1)
+        assert q.get() == 1
+        assert q.stats()['high_water'] == 1
+
+    def test_invalid_backpressure(self):
+        with pytest.raises(ValueError):
+            BoundedQueue('test', backpressure='ignore')
+        with pytest.raises(ValueError):
+            BoundedQueue('test', backpressure='spill')
+
+class TestPipeline:
+    def test_records_reach_every_sink(self):
+        reader = Mock()
+        reader.read_lines.return_value = iter(["1.0", "bad", "2.0"])
+        csv_sink, db_sink = RecordingSink(), RecordingSink()
+        pipeline = Pipeline(reader, parse, {'csv': csv_sink, 'database': db_sink},
+                            stats_interval=0.1)
+        pipeline.run()
+
+        assert [r['temp'] for r in csv_sink.records] == [1.0, 2.0]
+        assert [r['temp'] for r in db_sink.records] == [1.0, 2.0]
+        assert pipeline.stats()['lines_read'] == 3
+        assert pipeline.stats()['parse_errors'] == 1
+
+    def test_records_stamped_with_arrival_time(self):
+        reader = Mock()
+        reader.read_lines.return_value = iter(["1.0"])
+        sink = RecordingSink()
+        Pipeline(reader, parse, {'csv': sink}).run()
+
+        assert isinstance(sink.records[0]['datetime_utc'], int)
+
+    def test_failing_sink_does_not_block_others(self):
+        reader = Mock()
+        reader.read_lines.return_value = iter(["1.0", "2.0"])
+        good, bad = RecordingSink(), RecordingSink(fail=True)
+        pipeline = Pipeline(reader, parse, {'csv': good, 'database': bad})
+        pipeline.run()
+
+        assert len(good.records) == 2
+        assert pipeline.stats()['write_errors'] == {'csv': 0, 'database': 2}
+
+    def test_metrics_and_arrival_reach_sinks(self):
+        class ArrivalSink(RecordingSink):
+            def write(self, record, arrival=None):
+                self.arrivals.append(arrival)
+                super().write(record)
+
+        reader = Mock()
+        reader.read_lines.return_value = iter(["1.0", "bad", "2.0"])
+        csv_sink, db_sink = RecordingSink(), ArrivalSink()
+        db_sink.arrivals = []
+        metrics = Metrics()
+        before = time.perf_counter()
+        Pipeline(reader, parse, {'csv': csv_sink, 'database': db_sink}, metrics=metrics).run()
+
+        assert len(db_sink.arrivals) == 2
+        assert all(before <= arrival <= time.perf_counter() for arrival in db_sink.arrivals)
+        snapshot = metrics.snapshot()
+        assert snapshot['counters']['lines']['total'] == 3
+        assert snapshot['counters']['records']['total'] == 2
+        assert snapshot['counters']['parse_errors']['total'] == 1
+        assert snapshot['latency_ms']['db']['count'] == 2
+        assert snapshot['latency_ms']['csv']['count'] == 2
+        assert snapshot['latency_ms']['parse']['count'] == 2
+
+    def test_profiler_runs_on_parser_thread(self, tmp_path):
+        trigger = tmp_path / "profile"
+        trigger.touch()
+        profiler = ProfileHook(str(trigger), seconds=60, output_dir=str(tmp_path))
+        profiler.poll()
+        reader = Mock()
+        reader.read_lines.return_value = iter(["1.0", "2.0"])
+        Pipeline(reader, parse, {'csv': RecordingSink()}, profiler=profiler).run()
+
+        assert len(list(tmp_path.glob("tsg_profile_*.prof"))) == 1
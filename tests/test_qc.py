@@ -0,0 +1,149 @@
+import math
+import random
+import sqlite3
+import statistics
+import pytest
+from tsgreader.qc import (
+    DEFAULT_TESTS, QC_FAIL, QC_MISSING, QC_PASS, QC_SUSPECT, FieldQC, RollingMedian,
+    RollingStats, StreamingQC,
+)
+from tsgreader.sinks import SQLiteSink
+from tsgreader.tsgparser import TSGRecord
+
+def sample(temp=20.0, cond=4.5, salinity=33.0, hull_temp=19.0):
+    return TSGRecord(temp=temp, cond=cond, salinity=salinity, hull_temp=hull_temp)
+
+class TestRollingStats:
+    def test_matches_window_statistics(self):
+        rng = random.Random(1)
+        stats = RollingStats(10)
+        values = []
+        for _ in range(100):
+            value = rng.uniform(10, 20)
+            values.append(value)
+            stats.add(value)
+            window = values[-10:]
+            assert math.isclose(stats.mean, statistics.mean(window))
+            if len(window) > 1:
+                assert math.isclose(stats.variance, statistics.variance(window), abs_tol=1e-9)
+
+    def test_constant_series_has_zero_variance(self):
+        stats = RollingStats(5)
+        for value in [1.1, 2.2, 3.3] + [20.2] * 5:
+            stats.add(value)
+        assert stats.full()
+        assert stats.std == pytest.approx(0.0, abs=1e-6)
+
+    def test_invalid_window(self):
+        with pytest.raises(ValueError):
+            RollingStats(0)
+
+class TestRollingMedian:
+    def test_matches_window_median(self):
+        rng = random.Random(2)
+        median = RollingMedian(7)
+        values = []
+        for _ in range(100):
+            value = rng.choice([rng.uniform(0, 1), 5.0])
+            values.append(value)
+            median.add(value)
+            assert median.median == statistics.median(values[-7:])
+
+    def test_empty(self):
+        assert RollingMedian(3).median is None
+
+class TestFieldQC:
+    def test_range(self):
+        field = FieldQC('cond', fail_range=(0.01, 7.0), suspect_range=(2.0, 6.5))
+        assert field.check(4.5) == QC_PASS
+        assert field.check(1.0) == QC_SUSPECT
+        assert field.check(0.0) == QC_FAIL
+        assert field.check(None) == QC_MISSING
+        assert field.check(float('nan')) == QC_MISSING
+        assert field.counts['range'] == 2
+
+    def test_spike_against_median(self):
+        field = FieldQC('salinity', spike_suspect=0.2, spike_fail=1.0, min_samples=3)
+        for value in [33.0, 33.01, 32.99, 33.0]:
+            assert field.check(value) == QC_PASS
+        assert field.check(32.5) == QC_SUSPECT
+        assert field.check(30.0) == QC_FAIL
+        # A short spike does not move the median, so the next value passes
+        assert field.check(33.0) == QC_PASS
+
+    def test_spike_not_evaluated_until_window_has_values(self):
+        field = FieldQC('temp', spike_fail=1.0, min_samples=3)
+        assert field.check(10.0) == QC_PASS
+        assert field.check(20.0) == QC_PASS
+
+    def test_failed_values_stay_out_of_windows(self):
+        field = FieldQC('cond', fail_range=(0.01, 7.0), spike_fail=0.5, min_samples=3)
+        for value in [4.5, 4.5, 4.5, 0.0, 0.0, 0.0, 0.0]:
+            field.check(value)
+        assert field.median.median == 4.5
+        assert len(field.stats) == 3
+
+    def test_stuck(self):
+        field = FieldQC('temp', stuck_tolerance=0.0, stuck_window=5)
+        flags = [field.check(20.0) for _ in range(6)]
+        assert flags == [QC_PASS] * 4 + [QC_SUSPECT] * 2
+        assert field.check(20.1) == QC_PASS
+
+class TestStreamingQC:
+    def test_flags_worst_field(self):
+        qc = StreamingQC()
+        assert qc.process(sample()).qc_flag == QC_PASS
+        assert qc.process(sample(salinity=15.0)).qc_flag == QC_SUSPECT
+        assert qc.process(sample(salinity=45.0)).qc_flag == QC_FAIL
+        assert qc.process(sample(cond=0.0)).qc_flag == QC_FAIL
+        assert qc.process(TSGRecord()).qc_flag == QC_MISSING
+        assert qc.stats()['records'] == 5
+
+    def test_dropout_fails(self):
+        qc = StreamingQC()
+        for _ in range(10):
+            qc.process(sample())
+        record = qc.process(sample(cond=0.0, salinity=0.01))
+        assert record.qc_flag == QC_FAIL
+        assert record.cond == 0.0
+
+    def test_dict_records(self):
+        qc = StreamingQC()
+        record = qc.process(sample().to_dict())
+        assert record['qc_flag'] == QC_PASS
+
+    def test_wrap(self):
+        qc = StreamingQC()
+        parse = qc.wrap(lambda line: sample(temp=float(line)) if line else None)
+        assert parse("20.0").qc_flag == QC_PASS
+        assert parse("") is None
+
+    def test_from_config_merges_defaults(self):
+        qc = StreamingQC.from_config({
+            'window': 5,
+            'fields': {'temp': {'fail_range': [0, 10]}, 'hull_temp': None},
+        })
+        fields = {field.name: field for field in qc.fields}
+        assert 'hull_temp' not in fields
+        assert fields['temp'].fail_range == (0, 10)
+        assert fields['temp'].spike_fail == DEFAULT_TESTS['temp']['spike_fail']
+        assert fields['temp'].median.window == 5
+
+    def test_from_config_rejects_unknown_settings(self):
+        with pytest.raises(ValueError):
+            StreamingQC.from_config({'fields': {'temp': {'range': [0, 10]}}})
+
+    def test_flag_is_written_to_database(self, tmp_path):
+        db_path = str(tmp_path / "tsg.db")
+        qc = StreamingQC()
+        sink = SQLiteSink(db_path, 'tsg', batch_size=10)
+        sink.connect()
+        sink.write(qc.process(sample()))
+        sink.write(qc.process(sample(cond=0.0)))
+        sink.write(sample())
+        sink.close()
+
+        conn = sqlite3.connect(db_path)
+        flags = [row[0] for row in conn.execute("SELECT qc_flag FROM tsg ORDER BY id")]
+        conn.close()
+        assert flags == [QC_PASS, QC_FAIL, None]
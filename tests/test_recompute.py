@@ -0,0 +1,79 @@
+import math
+import sqlite3
+import numpy as np
+import pytest
+from tsgreader.recompute import recompute_salinity, main
+from tsgreader.sinks import DB_COLUMNS
+from tsgreader.synthetic_data import generate_tsg_batch
+from tsgreader.tsgparser import conductivity_to_salinity, conductivity_to_salinity_array
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "tsg.db")
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE tsg ({', '.join(DB_COLUMNS)})")
+    rows = [(5.0, 20.0), (4.0, 15.0), (-1.0, 10.0), (None, 10.0)]
+    conn.executemany("INSERT INTO tsg (cond, temp, salinity) VALUES (?, ?, 0)", rows)
+    conn.commit()
+    conn.close()
+    return path
+
+def salinities(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute("SELECT salinity FROM tsg ORDER BY rowid")]
+    finally:
+        conn.close()
+
+class TestConductivityToSalinityArray:
+    def test_matches_scalar_version(self):
+        cond = np.array([5.0, 4.0, 3.0])
+        temp = np.array([20.0, 15.0, 10.0])
+        expected = [conductivity_to_salinity(c, t) for c, t in zip(cond, temp)]
+
+        assert np.allclose(conductivity_to_salinity_array(cond, temp), expected)
+
+    def test_negative_values_give_nan(self):
+        result = conductivity_to_salinity_array([5.0, -1.0, 5.0, 5.0], [20.0, 20.0, -1.0, 20.0],
+                                                [0, 0, 0, -5])
+
+        assert not np.isnan(result[0])
+        assert np.isnan(result[1:]).all()
+
+    def test_generate_batch_has_salinity(self):
+        records = generate_tsg_batch(10)
+
+        assert len(records) == 10
+        assert not np.isnan(records['salinity']).any()
+
+class TestRecomputeSalinity:
+    def test_updates_all_rows_in_chunks(self, db_path):
+        updated = recompute_salinity(db_path, 'tsg', chunk_size=3)
+        result = salinities(db_path)
+
+        assert updated == 4
+        assert math.isclose(result[0], conductivity_to_salinity(5.0, 20.0))
+        assert math.isclose(result[1], conductivity_to_salinity(4.0, 15.0))
+        assert result[2] is None
+        assert result[3] is None
+
+    def test_main_uses_arguments(self, db_path):
+        main(['--db', db_path, '--table', 'tsg', '--pressure', '10'])
+
+        assert math.isclose(salinities(db_path)[0], conductivity_to_salinity(5.0, 20.0, 10))
+
+    def test_applies_calibration(self, db_path):
+        main(['--db', db_path, '--table', 'tsg', '--cal', 'cond=1.01,0.002',
+              '--cal', 'temp=1,-0.1'])
+
+        conn = sqlite3.connect(db_path)
+        cond, temp, salinity = conn.execute(
+            "SELECT cond, temp, salinity FROM tsg ORDER BY rowid").fetchone()
+        conn.close()
+        assert math.isclose(cond, 5.0 * 1.01 + 0.002)
+        assert math.isclose(temp, 19.9)
+        assert math.isclose(salinity, conductivity_to_salinity(cond, temp))
+
+    def test_rejects_unknown_calibration_field(self, db_path):
+        with pytest.raises(ValueError):
+            recompute_salinity(db_path, 'tsg', calibration={'salinity': (1, 0)})
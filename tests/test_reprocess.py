@@ -0,0 +1,106 @@
+import sqlite3
+import numpy as np
+import pytest
+from tsgreader.archive import Archive
+from tsgreader.importer import import_files
+from tsgreader.reprocess import (ArchiveOutput, DatabaseOutput, main, parse_calibration,
+                                 plan_tasks, process_task, reprocess_files)
+from tsgreader.synthetic_data import format_tsg_lines, generate_tsg_batch
+from tsgreader.tsgparser import conductivity_to_salinity_array
+
+DATA_FILE = "tests/data/2024_03_20_152p_HTcapture_SSout_notXML.TXT"
+START = 1710978600
+KV_LINE = ("t1= 25.5397, c1= 0.03668, s=  0.1750, t2= 21.9663, lat=41 31.4341 N, "
+           "lon=070 40.3335 W, hms=210916, dmy=110825")
+
+def write_capture(path, n, start_time, seed=0):
+    records = generate_tsg_batch(n, start_time=start_time, rng=np.random.default_rng(seed))
+    path.write_text('\n'.join(format_tsg_lines(records)) + '\n')
+    return str(path)
+
+def db_rows(db_path, columns):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT {columns} FROM tsg ORDER BY rowid").fetchall()
+    finally:
+        conn.close()
+
+class TestTasks:
+    def test_byte_ranges_parse_each_line_once(self):
+        tasks = plan_tasks([DATA_FILE], chunk_bytes=1000)
+        assert len(tasks) > 1
+        whole = process_task(plan_tasks([DATA_FILE])[0])
+        parts = [process_task(task) for task in tasks]
+        merged = np.concatenate([part.records for part in parts])
+        assert sum(part.lines for part in parts) == whole.lines
+        assert np.array_equal(np.sort(merged['nmea_time']), np.sort(whole.records['nmea_time']))
+
+    def test_calibration_recomputes_salinity(self):
+        (task,) = plan_tasks([DATA_FILE])
+        raw = process_task(task).records
+        calibrated = process_task(task, calibration={'cond': (1.01, 0.002)}).records
+        assert np.allclose(calibrated['cond'], raw['cond'] * 1.01 + 0.002)
+        assert np.allclose(calibrated['temp'], raw['temp'])
+        expected = conductivity_to_salinity_array(calibrated['cond'], calibrated['temp'])
+        assert np.allclose(calibrated['salinity'], expected, equal_nan=True)
+
+    def test_instrument_salinity_kept_without_calibration(self, tmp_path):
+        capture = tmp_path / "capture.txt"
+        capture.write_text(KV_LINE + "\n")
+        (task,) = plan_tasks([str(capture)])
+
+        assert process_task(task).records['salinity'][0] == 0.175
+        recomputed = process_task(task, recompute_salinity=True).records['salinity'][0]
+        assert recomputed != 0.175
+        assert recomputed == pytest.approx(0.175, abs=0.005)
+
+    def test_parse_calibration(self):
+        assert parse_calibration(['temp=1,0.5', 'cond=0.99,0']) == {'temp': (1.0, 0.5),
+                                                                    'cond': (0.99, 0.0)}
+        with pytest.raises(ValueError):
+            parse_calibration(['salinity=1,0'])
+        with pytest.raises(ValueError):
+            parse_calibration(['temp=1'])
+
+class TestReprocessFiles:
+    def test_database_output_in_time_order(self, tmp_path):
+        # Neighbouring files overlap by ten seconds
+        paths = [write_capture(tmp_path / f"{i}.txt", 300, START + i * 290, seed=i)
+                 for i in range(3)]
+        db_path = str(tmp_path / "tsg.db")
+        progress = []
+        output = DatabaseOutput(db_path, 'tsg')
+        stats = reprocess_files(paths, output, workers=2, chunk_bytes=8000,
+                                batch_rows=100, progress=progress.append)
+        output.close()
+
+        assert stats['records'] == 900
+        assert stats['out_of_order'] == 0
+        assert stats['tasks'] > 3
+        assert progress[-1]['bytes_done'] == stats['bytes']
+        times = [row[0] for row in db_rows(db_path, "datetime_utc")]
+        assert times == sorted(times)
+        assert output.inserted + output.duplicates == 900
+
+    def test_archive_output_matches_import(self, tmp_path):
+        db_path = str(tmp_path / "tsg.db")
+        import_files([DATA_FILE], db_path, 'tsg')
+        output = ArchiveOutput(str(tmp_path / "archive"))
+        reprocess_files([DATA_FILE], output, workers=2, chunk_bytes=1000)
+        output.close()
+
+        archived = Archive(str(tmp_path / "archive")).read()
+        imported = db_rows(db_path, "nmea_time, temp")
+        assert sorted(archived['nmea_time'].tolist()) == sorted(row[0] for row in imported)
+        assert np.allclose(np.sort(archived['temp']), np.sort([row[1] for row in imported]))
+
+    def test_unknown_calibration_field(self, tmp_path):
+        with pytest.raises(ValueError):
+            reprocess_files([DATA_FILE], None, calibration={'salinity': (1, 0)})
+
+class TestMain:
+    def test_main_writes_database(self, tmp_path):
+        db_path = str(tmp_path / "tsg.db")
+        main([DATA_FILE, '--db', db_path, '--table', 'tsg', '--workers', '1',
+              '--cal', 'temp=1,0.1'])
+        assert len(db_rows(db_path, "temp")) == 86
@@ -0,0 +1,91 @@
+import math
+import sqlite3
+import pytest
+from tsgreader.importer import import_files
+from tsgreader.rollup import choose_resolution, query_series, rebuild_rollups
+from tsgreader.sinks import SQLiteSink
+from tsgreader.synthetic_data import generate_tsg_batch
+
+START = 1710957120  # on a minute boundary
+DATA_FILE = "tests/data/2024_03_20_152p_HTcapture_SSout_notXML.TXT"
+
+def records(n, start=START):
+    return [dict(zip(r.dtype.names, r.tolist())) for r in generate_tsg_batch(n, start_time=start)]
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "tsg.db")
+
+def rollup_rows(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT * FROM {table} ORDER BY bin").fetchall()
+    finally:
+        conn.close()
+
+class TestUpdateRollups:
+    def test_bins_match_raw_data(self, db_path):
+        data = records(150)
+        data[10]['salinity'] = float('nan')
+        sink = SQLiteSink(db_path, 'tsg', batch_size=7)
+        for record in data:
+            sink.write(record)
+        sink.close()
+
+        conn = sqlite3.connect(db_path)
+        bins = query_series(conn, 'tsg', START, START + 149, max_points=3)['points']
+        conn.close()
+        assert [b['count'] for b in bins] == [60, 60, 30]
+        first = data[:60]
+        temps = [r['temp'] for r in first]
+        assert math.isclose(bins[0]['temp_mean'], sum(temps) / 60)
+        assert bins[0]['temp_min'] == min(temps)
+        assert bins[0]['temp_max'] == max(temps)
+        salinities = [r['salinity'] for r in first if not math.isnan(r['salinity'])]
+        assert math.isclose(bins[0]['salinity_mean'], sum(salinities) / 59)
+        assert bins[0]['latitude'] == first[-1]['latitude']
+
+    def test_incremental_matches_rebuild(self, db_path):
+        sink = SQLiteSink(db_path, 'tsg', batch_size=13)
+        for record in records(700):
+            sink.write(record)
+        sink.close()
+        incremental = [rollup_rows(db_path, t) for t in ('tsg_1min', 'tsg_10min')]
+
+        conn = sqlite3.connect(db_path)
+        with conn:
+            rebuild_rollups(conn, 'tsg')
+        conn.close()
+        rebuilt = [rollup_rows(db_path, t) for t in ('tsg_1min', 'tsg_10min')]
+
+        for a_rows, b_rows in zip(incremental, rebuilt):
+            assert len(a_rows) == len(b_rows)
+            for a, b in zip(a_rows, b_rows):
+                assert a == pytest.approx(b)
+
+    def test_import_builds_rollups(self, db_path):
+        import_files([DATA_FILE], db_path, 'tsg')
+
+        rows = rollup_rows(db_path, 'tsg_1min')
+        assert sum(row[1] for row in rows) == 86
+
+class TestQuerySeries:
+    def test_choose_resolution(self):
+        assert choose_resolution(0, 3599, 5000, 3600) == ('raw', 1)
+        assert choose_resolution(0, 3599, 100, 3600) == ('1min', 60)
+        assert choose_resolution(0, 86399, 500, 86400) == ('10min', 600)
+        assert choose_resolution(0, 864000, 10, 864000) == ('10min', 600)
+
+    def test_raw_points(self, db_path):
+        sink = SQLiteSink(db_path, 'tsg')
+        for record in records(20):
+            sink.write(record)
+        sink.close()
+
+        conn = sqlite3.connect(db_path)
+        series = query_series(conn, 'tsg', START + 5, START + 9, max_points=100)
+        conn.close()
+        assert series['resolution'] == 'raw'
+        assert [p['time'] for p in series['points']] == list(range(START + 5, START + 10))
+        point = series['points'][0]
+        assert point['temp_mean'] == point['temp_min'] == point['temp_max']
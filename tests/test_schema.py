@@ -0,0 +1,97 @@
+import sqlite3
+import pytest
+from tsgreader.schema import SCHEMA_VERSION, ensure_schema, table_version
+from tsgreader.sinks import DB_COLUMNS
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "tsg.db")
+    yield conn
+    conn.close()
+
+def index_names(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA index_list({table})")}
+
+class TestEnsureSchema:
+    def test_creates_strict_table(self, conn):
+        assert ensure_schema(conn, 'tsg') == SCHEMA_VERSION
+
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'tsg'").fetchone()[0]
+        assert sql.rstrip().endswith('STRICT')
+        types = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(tsg)")}
+        assert types['datetime_utc'] == 'INTEGER'
+        assert types['nmea_time'] == 'INTEGER'
+        assert set(DB_COLUMNS) <= set(types)
+        assert table_version(conn, 'tsg') == SCHEMA_VERSION
+
+    def test_rejects_text_times(self, conn):
+        ensure_schema(conn, 'tsg')
+
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO tsg (nmea_time) VALUES ('2025-08-11 21:09:16')")
+
+    def test_adds_time_indexes(self, conn):
+        ensure_schema(conn, 'tsg')
+
+        assert {'tsg_datetime_utc', 'tsg_nmea_time'} <= index_names(conn, 'tsg')
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM tsg WHERE datetime_utc BETWEEN 0 AND 10"
+        ).fetchall()
+        assert 'tsg_datetime_utc' in plan[0][3]
+
+    def test_is_idempotent(self, conn):
+        ensure_schema(conn, 'tsg')
+
+        assert ensure_schema(conn, 'tsg') == 0
+
+    def test_tables_versioned_separately(self, conn):
+        ensure_schema(conn, 'tsg')
+
+        assert table_version(conn, 'gps') == 0
+        assert ensure_schema(conn, 'gps') == SCHEMA_VERSION
+
+    def test_migrates_legacy_table(self, conn):
+        conn.execute(f"CREATE TABLE tsg ({', '.join(DB_COLUMNS)})")
+        conn.execute("CREATE UNIQUE INDEX tsg_nmea_time_key ON tsg (nmea_time)")
+        conn.execute(
+            "INSERT INTO tsg (datetime_utc, scan_no, temp, nmea_time) "
+            "VALUES (1754946560, '15', 20.5, '2025-08-11 21:09:16')"
+        )
+        conn.execute("INSERT INTO tsg (datetime_utc, temp, nmea_time) VALUES (1754946561, 20.6, NULL)")
+        conn.commit()
+
+        ensure_schema(conn, 'tsg')
+
+        rows = conn.execute(
+            "SELECT datetime_utc, scan_no, temp, nmea_time, typeof(scan_no) FROM tsg ORDER BY id"
+        ).fetchall()
+        assert rows == [
+            (1754946560, 15, 20.5, 1754946556, 'integer'),
+            (1754946561, None, 20.6, None, 'null'),
+        ]
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert 'tsg_legacy' not in tables
+        assert 'tsg_nmea_time_key' not in index_names(conn, 'tsg')
+
+    def test_failed_migration_is_rolled_back(self, conn, monkeypatch):
+        from tsgreader import schema
+
+        conn.execute("CREATE TABLE tsg (datetime_utc, temp)")
+        conn.execute("INSERT INTO tsg VALUES (1754946560, 20.5)")
+        conn.commit()
+
+        def fail(conn, table_name):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        monkeypatch.setattr(schema, '_copy_legacy_rows', fail)
+        with pytest.raises(sqlite3.OperationalError):
+            ensure_schema(conn, 'tsg')
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert 'tsg_legacy' not in tables
+        assert conn.execute("SELECT * FROM tsg").fetchall() == [(1754946560, 20.5)]
+        assert table_version(conn, 'tsg') == 0
+
+        monkeypatch.undo()
+        ensure_schema(conn, 'tsg')
+        assert conn.execute("SELECT datetime_utc, temp FROM tsg").fetchall() == [(1754946560, 20.5)]
+        assert table_version(conn, 'tsg') == SCHEMA_VERSION
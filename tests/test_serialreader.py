@@ -0,0 +1,216 @@
+import pytest
+import serial
+import threading
+from unittest.mock import Mock, patch
+from tsgreader.serialreader import SerialReader
+
+def make_reader(chunks):
+    """Create a SerialReader whose port returns the given chunks in order."""
+    reader = SerialReader('/dev/ttyUSB0')
+    conn = Mock()
+    conn.in_waiting = 0
+    conn.read.side_effect = list(chunks) + [serial.SerialException("done")]
+    reader.serial_conn = conn
+    return reader
+
+def read_all(reader):
+    lines = []
+    with pytest.raises(serial.SerialException):
+        for line in reader.read_lines():
+            lines.append(line)
+    return lines
+
+class TestReadLines:
+    def test_splits_chunk_into_lines(self):
+        reader = make_reader([b"t1= 1.0, c1= 2.0\r\nt1= 1.1, c1= 2.1\r\n"])
+
+        assert read_all(reader) == ["t1= 1.0, c1= 2.0", "t1= 1.1, c1= 2.1"]
+
+    def test_carries_partial_line_to_next_read(self):
+        reader = make_reader([b"t1= 1.0, c1", b"= 2.0\r\nt1= 1.1", b", c1= 2.1\r\n"])
+
+        assert read_all(reader) == ["t1= 1.0, c1= 2.0", "t1= 1.1, c1= 2.1"]
+
+    def test_timeout_reads_are_skipped(self):
+        reader = make_reader([b"", b"line one\n", b"", b"line two\n"])
+
+        assert read_all(reader) == ["line one", "line two"]
+
+    def test_reads_everything_waiting(self):
+        reader = make_reader([b"line\n"])
+        reader.serial_conn.in_waiting = 42
+        read_all(reader)
+
+        reader.serial_conn.read.assert_any_call(42)
+
+    def test_stats_report_buffer_occupancy(self):
+        reader = make_reader([b"line\npart"])
+        reader.serial_conn.in_waiting = 9
+        read_all(reader)
+
+        stats = reader.stats()
+        assert stats['bytes_read'] == 9
+        assert stats['in_waiting_high_water'] == 9
+        assert stats['partial_line_bytes'] == 4
+
+    def test_skips_blank_and_undecodable_lines(self):
+        reader = make_reader([b"\r\n\xff\xfe\nline\n"])
+
+        assert read_all(reader) == ["line"]
+
+    def test_discards_overlong_partial_line(self):
+        reader = make_reader([b"x" * 20, b"line\n"])
+        reader.max_line_length = 10
+
+        assert read_all(reader) == ["line"]
+
+    def test_discards_overlong_line_before_newline(self):
+        reader = make_reader([b"x" * 20 + b"\nline\n"])
+        reader.max_line_length = 10
+
+        assert read_all(reader) == ["line"]
+
+    def test_abandoned_generator_does_not_repeat_lines(self):
+        reader = make_reader([b"a\nb\n", b"c\n"])
+        lines = reader.read_lines()
+        assert next(lines) == "a"
+        lines.close()
+
+        assert read_all(reader) == ["b", "c"]
+
+    def test_serial_error_closes_port(self):
+        reader = make_reader([])
+        read_all(reader)
+
+        reader.serial_conn.close.assert_called_once()
+
+    def test_on_idle_called_on_timeout(self):
+        reader = make_reader([b"", b"line\n", b""])
+        on_idle = Mock()
+        with pytest.raises(serial.SerialException):
+            list(reader.read_lines(on_idle=on_idle))
+
+        assert on_idle.call_count == 2
+
+class TestReadChunk:
+    def test_returns_completed_lines(self):
+        reader = make_reader([b"line one\nline", b"", b" two\n"])
+
+        assert reader.read_chunk() == ["line one"]
+        assert reader.read_chunk() == []
+        assert reader.read_chunk() == ["line two"]
+        with pytest.raises(serial.SerialException):
+            reader.read_chunk()
+
+def port_info(device, vid=0x0403, pid=0x6001, serial_number='A10K'):
+    info = Mock()
+    info.device = device
+    info.vid = vid
+    info.pid = pid
+    info.serial_number = serial_number
+    return info
+
+def new_conn(chunks):
+    conn = Mock()
+    conn.in_waiting = 0
+    conn.read.side_effect = list(chunks) + [serial.SerialException("done")]
+    return conn
+
+class TestReconnect:
+    def make_reader(self, chunks, **kwargs):
+        reader = make_reader(chunks)
+        reader.reconnect = True
+        reader.max_reconnect_attempts = kwargs.pop('max_reconnect_attempts', 3)
+        for name, value in kwargs.items():
+            setattr(reader, name, value)
+        return reader
+
+    def test_reconnects_and_keeps_partial_line(self):
+        reader = self.make_reader([b"line one\nline t"], max_reconnect_attempts=1)
+        on_reconnect = Mock()
+        reader.on_reconnect = on_reconnect
+        reopened = [new_conn([b"wo\nline three\n"]), serial.SerialException("gone")]
+
+        with patch('tsgreader.serialreader.serial.Serial', side_effect=reopened), \
+             patch('tsgreader.serialreader.time.sleep'), \
+             patch('tsgreader.serialreader.list_ports.comports', return_value=[]):
+            lines = read_all(reader)
+
+        assert lines == ["line one", "line two", "line three"]
+        assert reader.reconnects == 1
+        failed_at, restored_at = on_reconnect.call_args.args
+        assert restored_at >= failed_at
+        assert reader.stats()['reconnects'] == 1
+
+    def test_exponential_backoff_with_jitter(self):
+        reader = self.make_reader([], reconnect_delay=1, max_reconnect_delay=4,
+                                  max_reconnect_attempts=5)
+        attempts = [serial.SerialException("gone")] * 4 + [new_conn([b"line\n"])]
+
+        with patch('tsgreader.serialreader.serial.Serial', side_effect=attempts), \
+             patch('tsgreader.serialreader.time.sleep') as sleep, \
+             patch('tsgreader.serialreader.list_ports.comports', return_value=[]):
+            assert reader.read_chunk() == ["line"]
+
+        delays = [call.args[0] for call in sleep.call_args_list]
+        assert len(delays) == 5
+        for delay, limit in zip(delays, [1, 2, 4, 4, 4]):
+            assert limit / 2 <= delay <= limit
+
+    def test_gives_up_after_max_attempts(self):
+        reader = self.make_reader([], max_reconnect_attempts=2)
+
+        with patch('tsgreader.serialreader.serial.Serial', side_effect=serial.SerialException("gone")), \
+             patch('tsgreader.serialreader.time.sleep'), \
+             patch('tsgreader.serialreader.list_ports.comports', return_value=[]):
+            with pytest.raises(serial.SerialException, match="Gave up"):
+                reader.read_chunk()
+
+    def test_finds_renamed_usb_port(self):
+        reader = self.make_reader([])
+        reader._identity = (0x0403, 0x6001, 'A10K')
+        ports = [port_info('/dev/ttyS0', vid=None), port_info('/dev/ttyUSB1')]
+
+        with patch('tsgreader.serialreader.serial.Serial',
+                   return_value=new_conn([b"line\n"])) as open_port, \
+             patch('tsgreader.serialreader.time.sleep'), \
+             patch('tsgreader.serialreader.list_ports.comports', return_value=ports):
+            assert reader.read_chunk() == ["line"]
+
+        assert reader.port == '/dev/ttyUSB1'
+        assert open_port.call_args.kwargs['port'] == '/dev/ttyUSB1'
+
+    def test_initial_connect_still_fails(self):
+        reader = SerialReader('/dev/ttyUSB9', reconnect=True)
+
+        with patch('tsgreader.serialreader.serial.Serial', side_effect=serial.SerialException("no port")):
+            with pytest.raises(serial.SerialException):
+                reader.read_chunk()
+
+    def test_close_from_another_thread_does_not_reconnect(self):
+        reader = self.make_reader([])
+        reading = threading.Event()
+        closed = threading.Event()
+
+        def blocking_read(size):
+            reading.set()
+            closed.wait(5)
+            # As pyserial does on Windows and macOS when the port is closed under a read
+            raise serial.PortNotOpenError()
+
+        reader.serial_conn.read.side_effect = blocking_read
+        reader.serial_conn.close.side_effect = lambda: closed.set()
+        lines = []
+        with patch('tsgreader.serialreader.serial.Serial') as reopen, \
+             patch('tsgreader.serialreader.time.sleep') as sleep:
+            thread = threading.Thread(target=lambda: lines.extend(reader.read_lines()))
+            thread.start()
+            assert reading.wait(5)
+            reader.close()
+            thread.join(5)
+
+        assert not thread.is_alive()
+        assert lines == []
+        reopen.assert_not_called()
+        sleep.assert_not_called()
+        assert reader.reconnects == 0
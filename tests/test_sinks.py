@@ -0,0 +1,206 @@
+import csv
+import sqlite3
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import patch
+from tsgreader.sinks import CSVSink, SQLiteSink, CSV_FIELDNAMES, DB_COLUMNS
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "tsg.db"
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE tsg ({', '.join(DB_COLUMNS)})")
+    conn.close()
+    return str(path)
+
+@pytest.fixture
+def record():
+    return {
+        'datetime_utc': 1710957175,
+        'scan_no': 15,
+        'cond': 5.0,
+        'temp': 20.2,
+        'salinity': 33.1,
+        'hull_temp': 10.8,
+        'time_elapsed': 56.0,
+        'nmea_time': 1710957175,
+        'latitude': 41.31663,
+        'longitude': -72.06076,
+    }
+
+def count_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM tsg").fetchone()[0]
+    finally:
+        conn.close()
+
+class TestSQLiteSink:
+    def test_flushes_when_batch_full(self, db_path, record):
+        sink = SQLiteSink(db_path, 'tsg', batch_size=3, flush_interval=60)
+        for _ in range(5):
+            sink.write(record)
+
+        assert count_rows(db_path) == 3
+        assert sink.batches_written == 1
+        sink.close()
+        assert count_rows(db_path) == 5
+
+    def test_flushes_when_batch_stale(self, db_path, record):
+        sink = SQLiteSink(db_path, 'tsg', batch_size=100, flush_interval=5)
+        with patch('tsgreader.sinks.time.monotonic', side_effect=[0, 1, 6]):
+            sink.write(record)
+            sink.write(record)
+
+        assert count_rows(db_path) == 2
+        sink.close()
+
+    def test_uses_wal_journal(self, db_path, record):
+        sink = SQLiteSink(db_path, 'tsg')
+        sink.write(record)
+        sink.flush()
+        mode = sink.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        sink.close()
+
+        assert mode == 'wal'
+
+    def test_creates_table_on_connect(self, tmp_path, record):
+        db_path = str(tmp_path / "new.db")
+        sink = SQLiteSink(db_path, 'tsg')
+        sink.write(record)
+        sink.close()
+
+        assert count_rows(db_path) == 1
+
+    def test_stores_nmea_time_as_epoch(self, db_path, record):
+        sink = SQLiteSink(db_path, 'tsg')
+        nmea_time = datetime.fromtimestamp(record['nmea_time'], timezone.utc)
+        sink.write(dict(record, nmea_time=nmea_time))
+        sink.close()
+
+        conn = sqlite3.connect(db_path)
+        stored = conn.execute("SELECT nmea_time, typeof(nmea_time) FROM tsg").fetchone()
+        conn.close()
+        assert stored == (record['nmea_time'], 'integer')
+
+    def test_failed_flush_drops_batch(self, db_path, record):
+        sink = SQLiteSink(db_path, 'tsg', batch_size=10)
+        sink.connect()
+        sink.conn.execute("DROP TABLE tsg")
+        sink.write(record)
+        with pytest.raises(sqlite3.OperationalError):
+            sink.flush()
+
+        assert sink.stats()['pending'] == 0
+        sink.close()
+
+    def test_writes_several_tables_in_one_flush(self, db_path, record):
+        from tsgreader.gpsparser import GPSRecord
+        sink = SQLiteSink(db_path, 'tsg', batch_size=2)
+        sink.add_table('gps', kind='gps')
+        sink.write(record)
+        sink.write(GPSRecord(datetime_utc=1710957175, sentence='GGA', latitude=41.3), 'gps')
+        sink.close()
+
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("SELECT COUNT(*) FROM tsg").fetchone()[0] == 1
+        assert conn.execute("SELECT sentence, latitude FROM gps").fetchall() == [('GGA', 41.3)]
+        conn.close()
+
+    def test_unknown_table_kind(self, db_path):
+        with pytest.raises(ValueError):
+            SQLiteSink(db_path, 'tsg').add_table('ctd', kind='ctd')
+
+    def test_stats_reports_throughput(self, db_path, record):
+        sink = SQLiteSink(db_path, 'tsg', batch_size=2)
+        for _ in range(4):
+            sink.write(record)
+        stats = sink.stats()
+        sink.close()
+
+        assert stats['records'] == 4
+        assert stats['batches'] == 2
+        assert stats['records_per_sec'] > 0
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+class TestCSVSink:
+    def test_buffers_until_flush_rows(self, tmp_path, record):
+        path = tmp_path / "tsg.csv"
+        sink = CSVSink(str(path), flush_rows=3, flush_interval=60)
+        sink.write(record)
+        sink.write(record)
+
+        assert path.read_text() == ''
+        sink.write(record)
+        rows = read_csv(path)
+        sink.close()
+
+        assert rows[0] == DB_COLUMNS
+        assert len(rows) == 4
+
+    def test_header_written_once_per_file(self, tmp_path, record):
+        path = tmp_path / "tsg.csv"
+        for _ in range(2):
+            sink = CSVSink(str(path))
+            sink.write(record)
+            sink.close()
+
+        rows = read_csv(path)
+        assert len(rows) == 3
+        assert rows.count(DB_COLUMNS) == 1
+
+    def test_daily_rotation(self, tmp_path, record):
+        sink = CSVSink(str(tmp_path / "tsg.csv"), rotate='daily')
+        sink.write(record)
+        sink.write(dict(record, datetime_utc=record['datetime_utc'] + 86400))
+        sink.close()
+
+        day1 = read_csv(tmp_path / "tsg_20240320.csv")
+        day2 = read_csv(tmp_path / "tsg_20240321.csv")
+        assert day1[0] == DB_COLUMNS and len(day1) == 2
+        assert day2[0] == DB_COLUMNS and len(day2) == 2
+
+    def test_size_rotation(self, tmp_path, record):
+        sink = CSVSink(str(tmp_path / "tsg.csv"), rotate='size', max_bytes=200, flush_rows=1)
+        for _ in range(4):
+            sink.write(record)
+        sink.close()
+
+        files = sorted(p.name for p in tmp_path.glob("tsg*.csv"))
+        assert files == ["tsg.csv", "tsg_1.csv"]
+        for name in files:
+            assert read_csv(tmp_path / name)[0] == DB_COLUMNS
+
+    def test_existing_file_with_other_columns_is_not_appended(self, tmp_path, record):
+        old_header = ','.join(DB_COLUMNS[:-1])
+        (tmp_path / "tsg.csv").write_text(old_header + "\r\n1,2,3,4,5,6,7,8,9,10\r\n")
+        sink = CSVSink(str(tmp_path / "tsg.csv"))
+        sink.write(record)
+        sink.close()
+
+        assert (tmp_path / "tsg.csv").read_text().splitlines()[0] == old_header
+        new = read_csv(tmp_path / "tsg_1.csv")
+        assert new[0] == DB_COLUMNS and len(new) == 2
+
+        sink = CSVSink(str(tmp_path / "tsg.csv"))
+        sink.write(record)
+        sink.close()
+        assert len(read_csv(tmp_path / "tsg_1.csv")) == 3
+
+    def test_size_rotation_counts_bytes(self, tmp_path):
+        path = tmp_path / "names.csv"
+        sink = CSVSink(str(path), rotate='size', max_bytes=1000, flush_rows=1,
+                       fieldnames=['name'])
+        sink.write({'name': 'Ångström ' * 5})
+        assert sink._size == path.stat().st_size
+        sink.close()
+
+    def test_csv_columns_match_database(self):
+        assert CSV_FIELDNAMES == DB_COLUMNS
+
+    def test_invalid_rotate_mode(self, tmp_path):
+        with pytest.raises(ValueError):
+            CSVSink(str(tmp_path / "tsg.csv"), rotate='hourly')
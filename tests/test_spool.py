@@ -0,0 +1,152 @@
+import shutil
+import sqlite3
+import time
+import pytest
+from tsgreader.sinks import TABLE_KINDS, SQLiteSink
+from tsgreader.spool import Spool, read_spool, replay_rows
+
+def record(second, temp=20.0):
+    return {'datetime_utc': 1710957175 + second, 'cond': 4.5, 'temp': temp,
+            'salinity': 33.0, 'hull_temp': 19.0, 'nmea_time': 1710957175 + second}
+
+def rows(db_path, table='tsg'):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT datetime_utc, temp FROM {table} ORDER BY datetime_utc").fetchall()
+    finally:
+        conn.close()
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "tsg.db"), str(tmp_path / "tsg_spool.jsonl")
+
+def locked(db_path):
+    """Hold the database write lock, as another writer would."""
+    conn = sqlite3.connect(db_path)
+    conn.execute('BEGIN IMMEDIATE')
+    return conn
+
+class TestSpool:
+    def test_append_and_read(self, tmp_path):
+        spool = Spool(str(tmp_path / "spool.jsonl"))
+        assert not spool.active
+        spool.append({'tsg': (['datetime_utc', 'temp'], [(1, 20.0), (2, None)])})
+        spool.close()
+        assert spool.active
+        path = spool.take()
+        assert list(read_spool(path)) == [('tsg', ['datetime_utc', 'temp'],
+                                           [[1, 20.0], [2, None]])]
+
+    def test_torn_line_is_skipped(self, tmp_path):
+        path = tmp_path / "spool.jsonl"
+        spool = Spool(str(path))
+        spool.append({'tsg': (['datetime_utc'], [(1,)])})
+        spool.close()
+        with open(path, 'a') as f:
+            f.write('{"table": "tsg", "colu')
+        assert len(list(read_spool(str(path)))) == 1
+
+    def test_leftover_spool_is_active(self, tmp_path):
+        path = str(tmp_path / "spool.jsonl")
+        spool = Spool(path)
+        spool.append({'tsg': (['datetime_utc'], [(1,)])})
+        spool.close()
+        assert Spool(path).active
+
+class TestReplay:
+    def test_deduplicates_on_key(self, tmp_path):
+        db_path = str(tmp_path / "tsg.db")
+        sink = SQLiteSink(db_path, 'tsg')
+        sink.connect()
+        sink.close()
+        table = TABLE_KINDS['tsg']
+        columns = ['datetime_utc', 'temp', 'nmea_time']
+        batch = [[1, 20.0, 1], [2, 21.0, 2], [2, 21.0, 2], [3, 22.0, None]]
+        conn = sqlite3.connect(db_path)
+        with conn:
+            # Records sharing a key within one batch are all kept
+            assert replay_rows(conn, 'tsg', table, columns, batch) == 4
+        with conn:
+            # Only the row without an nmea_time cannot be matched
+            assert replay_rows(conn, 'tsg', table, columns, batch) == 1
+        assert conn.execute("SELECT COUNT(*) FROM tsg_1min").fetchone()[0] == 1
+        conn.close()
+
+    def test_same_second_without_nmea_time_is_kept(self, tmp_path):
+        db_path = str(tmp_path / "tsg.db")
+        sink = SQLiteSink(db_path, 'tsg')
+        sink.connect()
+        sink.close()
+        columns = ['datetime_utc', 'temp', 'nmea_time']
+        conn = sqlite3.connect(db_path)
+        with conn:
+            assert replay_rows(conn, 'tsg', TABLE_KINDS['tsg'], columns,
+                               [[5, 20.0, None], [5, 20.1, None]]) == 2
+        assert rows(db_path) == [(5, 20.0), (5, 20.1)]
+        conn.close()
+
+class TestSQLiteSinkSpool:
+    def test_locked_database_spools_then_drains(self, paths):
+        db_path, spool_path = paths
+        sink = SQLiteSink(db_path, 'tsg', batch_size=2, spool_path=spool_path,
+                          latency_budget=0.05, drain_interval=60)
+        sink.connect()
+        lock = locked(db_path)
+
+        start = time.perf_counter()
+        for second in range(4):
+            sink.write(record(second))
+        # Waits at most the budget once, then goes straight to the spool
+        assert time.perf_counter() - start < 1.0
+        assert sink.spool.active
+        assert sink.spool.records_spooled == 4
+        assert sink.drainer.drain() == 0
+
+        lock.rollback()
+        lock.close()
+        assert sink.drainer.drain() == 4
+        assert not sink.spool.active
+        sink.write(record(4))
+        sink.write(record(5))
+        assert sink.stats()['records'] == 2
+        sink.close()
+        assert [row[0] - 1710957175 for row in rows(db_path)] == list(range(6))
+
+    def test_unavailable_database_spools(self, tmp_path):
+        spool_path = str(tmp_path / "tsg_spool.jsonl")
+        # A directory that does not exist cannot hold the database
+        db_path = str(tmp_path / "missing" / "tsg.db")
+        sink = SQLiteSink(db_path, 'tsg', batch_size=1, spool_path=spool_path,
+                          drain_interval=60)
+        with pytest.raises(sqlite3.Error):
+            sink.connect()
+        sink.write(record(0))
+        sink.close()
+        assert sink.spool.pending_bytes() > 0
+
+        (tmp_path / "missing").mkdir()
+        sink = SQLiteSink(db_path, 'tsg', spool_path=spool_path, drain_interval=60)
+        assert sink.spool.active
+        sink.connect()
+        sink.close()
+        assert len(rows(db_path)) == 1
+        assert sink.spool.pending_bytes() == 0
+
+    def test_replay_after_crash_adds_no_duplicates(self, paths, tmp_path):
+        db_path, spool_path = paths
+        sink = SQLiteSink(db_path, 'tsg', batch_size=1, spool_path=spool_path,
+                          drain_interval=60)
+        sink.connect()
+        sink.spool.active = True
+        sink.write(record(0))
+        sink.write(record(1))
+        sink.spool.close()
+        shutil.copy(spool_path, tmp_path / "copy.jsonl")
+        sink.drainer.drain()
+        # As if the process died after committing but before removing the file
+        shutil.copy(tmp_path / "copy.jsonl", spool_path)
+        sink.spool.active = True
+        sink.drainer.drain()
+        sink.close()
+        assert len(rows(db_path)) == 2
+        assert sink.spool.records_duplicate == 2
@@ -0,0 +1,53 @@
+import logging
+from logging.handlers import QueueHandler
+from unittest.mock import patch
+from tsgreader.status import StatusSummary, setup_logging, stop_logging
+from tsgreader.tsgparser import TSGRecord
+
+class TestStatusSummary:
+    def test_min_mean_max(self):
+        summary = StatusSummary(interval=60)
+        summary.add(TSGRecord(temp=20.0, hull_temp=10.0, salinity=33.0))
+        summary.add(TSGRecord(temp=22.0, hull_temp=float('nan'), salinity=35.0))
+        summary.add({'temp': 24.0})
+
+        result = summary.summary()
+        assert result['count'] == 3
+        assert result['temp'] == (20.0, 22.0, 24.0)
+        assert result['hull_temp'] == (10.0, 10.0, 10.0)
+        assert result['salinity'] == (33.0, 34.0, 35.0)
+
+    def test_logs_once_per_interval(self, caplog):
+        with patch('tsgreader.status.time.monotonic', side_effect=[0, 1, 2, 61, 62]):
+            summary = StatusSummary(interval=60)
+            with caplog.at_level(logging.INFO, logger='tsgreader.status'):
+                summary.add(TSGRecord(temp=20.0, hull_temp=10.0, salinity=33.0))
+                summary.add(TSGRecord(temp=22.0, hull_temp=10.0, salinity=33.0))
+                summary.add(TSGRecord(temp=24.0, hull_temp=10.0, salinity=33.0))
+                summary.add(TSGRecord(temp=30.0, hull_temp=10.0, salinity=33.0))
+
+        assert len(caplog.records) == 1
+        assert "3 records in 61 s" in caplog.text
+        assert "Lab 20/22/24" in caplog.text
+        assert summary.count == 1
+
+    def test_warns_when_no_records(self, caplog):
+        summary = StatusSummary(interval=0)
+        with caplog.at_level(logging.INFO, logger='tsgreader.status'):
+            summary.tick()
+
+        assert caplog.records[0].levelno == logging.WARNING
+        assert "no records" in caplog.text
+
+def test_setup_logging_writes_from_listener(tmp_path):
+    path = tmp_path / "tsg.log"
+    level = logging.getLogger().level
+    listener = setup_logging(str(path))
+    try:
+        logging.getLogger('tsgreader.test').error("Serial port failed")
+    finally:
+        stop_logging(listener)
+        logging.getLogger().setLevel(level)
+
+    assert "ERROR - Serial port failed" in path.read_text()
+    assert not any(isinstance(h, QueueHandler) for h in logging.getLogger().handlers)
@@ -0,0 +1,76 @@
+import asyncio
+import sqlite3
+import serial
+from unittest.mock import Mock
+from tsgreader.gpsparser import NMEAParser, nmea_checksum
+from tsgreader.qc import QC_FAIL, StreamingQC
+from tsgreader.sinks import SQLiteSink
+from tsgreader.streams import Stream, run_streams
+from tsgreader.tsgparser import TSGLineParser
+
+TSG_LINE = ("t1= 25.5397, c1= 0.03668, s=  0.1750, t2= 21.9663, "
+            "lat=41 31.4341 N, lon=070 40.3335 W, hms=210916, dmy=110825")
+
+def gps_line(body="GPGGA,123520,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,"):
+    return f"${body}*{nmea_checksum(body):02X}"
+
+def fake_reader(chunks):
+    """A reader whose read_chunk returns the given line lists, then fails."""
+    reader = Mock()
+    reader.read_chunk.side_effect = list(chunks) + [serial.SerialException("done")]
+    return reader
+
+def count(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+class TestRunStreams:
+    def test_streams_share_database(self, tmp_path):
+        db_path = str(tmp_path / "tsg.db")
+        db_sink = SQLiteSink(db_path, 'tsg', batch_size=100)
+        db_sink.add_table('gps', kind='gps')
+        db_sink.connect()
+        csv_sink = Mock()
+        streams = [
+            Stream('tsg', fake_reader([[TSG_LINE, TSG_LINE], [], [TSG_LINE]]),
+                   TSGLineParser().parse, 'tsg', db_sink, [csv_sink]),
+            Stream('gps', fake_reader([[gps_line(), "garbage"]]),
+                   NMEAParser().parse, 'gps', db_sink),
+        ]
+
+        asyncio.run(run_streams(streams, idle_flush=0.01))
+        db_sink.close()
+
+        assert count(db_path, 'tsg') == 3
+        assert count(db_path, 'gps') == 1
+        assert csv_sink.write.call_count == 3
+        assert streams[0].stats() == {'lines': 3, 'records': 3, 'parse_errors': 0}
+        assert streams[1].stats() == {'lines': 2, 'records': 1, 'parse_errors': 1}
+
+    def test_failing_sink_does_not_stop_stream(self):
+        db_sink = Mock()
+        bad_sink = Mock()
+        bad_sink.write.side_effect = OSError("disk full")
+        bad_sink.flush_due.return_value = False
+        db_sink.flush_due.return_value = False
+        stream = Stream('tsg', fake_reader([[TSG_LINE, TSG_LINE]]),
+                        TSGLineParser().parse, 'tsg', db_sink, [bad_sink])
+
+        asyncio.run(run_streams([stream]))
+
+        assert db_sink.write.call_count == 2
+        assert db_sink.write.call_args.args[1] == 'tsg'
+
+    def test_qc_flags_records(self):
+        db_sink = Mock()
+        db_sink.flush_due.return_value = False
+        dropout = TSG_LINE.replace("c1= 0.03668", "c1= 0.00000")
+        stream = Stream('tsg', fake_reader([[dropout]]), TSGLineParser().parse, 'tsg', db_sink,
+                        qc=StreamingQC())
+
+        asyncio.run(run_streams([stream]))
+
+        assert db_sink.write.call_args.args[0].qc_flag == QC_FAIL
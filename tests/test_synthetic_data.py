@@ -0,0 +1,56 @@
+import time
+import numpy as np
+from tsgreader.serialreader import SerialReader
+from tsgreader.synthetic_data import InstrumentEmulator, format_tsg_lines, generate_tsg_batch
+from tsgreader.tsgparser import parse_tsg_lines
+
+def split_lines(data):
+    """Frame emulator output the same way SerialReader does."""
+    return list(SerialReader('/dev/null')._split_lines(data))
+
+class TestFormatTSGLines:
+    def test_round_trip_both_formats(self):
+        records = generate_tsg_batch(20, start_time=1710957175, rng=np.random.default_rng(0))
+        for fmt in ('keyvalue', 'fixed'):
+            parsed = parse_tsg_lines(format_tsg_lines(records, fmt))
+
+            assert len(parsed.rejects) == 0
+            assert parsed.records['nmea_time'].tolist() == records['nmea_time'].tolist()
+            assert np.allclose(parsed.records['temp'], records['temp'])
+            assert np.allclose(parsed.records['latitude'], records['latitude'], atol=1e-5)
+            assert np.allclose(parsed.records['longitude'], records['longitude'], atol=1e-5)
+
+class TestInstrumentEmulator:
+    def test_max_speed_sends_all_lines(self):
+        sent = []
+        emulator = InstrumentEmulator(speed=float('inf'), batch_size=30, seed=0)
+        emulator.run(sent.append, count=100)
+
+        lines = split_lines(b''.join(sent))
+        assert len(lines) == 100
+        assert len(parse_tsg_lines(lines).rejects) == 0
+        assert emulator.stats()['lines'] == 100
+
+    def test_paced_output(self):
+        sent = []
+        emulator = InstrumentEmulator(rate=1, speed=50, seed=0)
+        start = time.monotonic()
+        emulator.run(sent.append, count=5)
+
+        assert time.monotonic() - start >= 4 / 50
+        assert len(sent) == 5
+
+    def test_faults_are_injected(self):
+        sent = []
+        emulator = InstrumentEmulator(fmt='fixed', speed=float('inf'), partial=0.1,
+                                      garbage=0.1, burst=0.05, burst_size=5, seed=1)
+        emulator.run(sent.append, count=500)
+        stats = emulator.stats()
+
+        assert stats['partial'] > 0
+        assert stats['garbage'] > 0
+        assert stats['burst'] > 0
+        lines = split_lines(b''.join(sent))
+        # Partial lines merge with the next one and garbage fails to decode
+        assert len(lines) <= 500 - stats['partial']
+        assert len(parse_tsg_lines(lines).records) < 500
@@ -0,0 +1,481 @@
+import argparse
+import csv
+import json
+import logging
+import math
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from tsgreader.config import database_target
+from tsgreader.live import record_to_array_row
+from tsgreader.tsgparser import MISSING_INT, TSG_DTYPE
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_VERSION = 1
+HEADER_NAME = 'header.json'
+
+# On-disk dtype of each column file, little-endian whatever the platform
+ARCHIVE_DTYPES = {name: TSG_DTYPE[name].newbyteorder('<') for name in TSG_DTYPE.names}
+
+_SECONDS_PER_DAY = 86400
+
+
+def day_name(timestamp: int) -> str:
+    """Return the UTC day of a Unix timestamp as YYYY-MM-DD, the name of its directory."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d')
+
+
+def read_header(day_dir: str) -> Optional[dict]:
+    """Read a day's header, or None if the day has not been written."""
+    try:
+        with open(os.path.join(day_dir, HEADER_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_header(day_dir: str, header: dict) -> None:
+    # Replaced atomically, so readers see either the old or the new count
+    path = os.path.join(day_dir, HEADER_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(header, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class _Day:
+    def __init__(self, day_dir: str, day: str):
+        """Open (or create) one day's column files for appending."""
+        self.dir = day_dir
+        os.makedirs(day_dir, exist_ok=True)
+        self.header = read_header(day_dir) or {
+            'version': ARCHIVE_VERSION,
+            'day': day,
+            'count': 0,
+            'start': None,
+            'end': None,
+            'sorted': True,
+            'fields': {name: dtype.str for name, dtype in ARCHIVE_DTYPES.items()},
+        }
+        if self.header['version'] != ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported archive version {self.header['version']} in {day_dir}")
+        # A day keeps the columns it was started with
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in self.header['fields'].items()
+                       if name in TSG_DTYPE.names}
+        paths = {name: os.path.join(day_dir, f"{name}.bin") for name in self.dtypes}
+        count = self.header['count']
+        complete = min((os.path.getsize(path) // self.dtypes[name].itemsize
+                        if os.path.exists(path) else 0) for name, path in paths.items())
+        if complete < count:
+            logger.warning(f"Archive {day_dir} holds {complete} complete rows, not {count}")
+            self.header['count'] = count = complete
+        self.files = {}
+        for name, dtype in self.dtypes.items():
+            f = open(paths[name], 'ab')
+            # Values appended after the last header update, e.g. before a
+            # crash, are not part of the archive; drop them so columns line up
+            if f.tell() != count * dtype.itemsize:
+                f.truncate(count * dtype.itemsize)
+                f.seek(0, os.SEEK_END)
+            self.files[name] = f
+
+    def append(self, records: np.ndarray, fsync: bool = False) -> None:
+        for name, dtype in self.dtypes.items():
+            f = self.files[name]
+            f.write(np.ascontiguousarray(records[name], dtype=dtype).tobytes())
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+        header = self.header
+        times = records['datetime_utc']
+        first, last = int(times[0]), int(times[-1])
+        if header['count'] and first < header['end'] or np.any(np.diff(times) < 0):
+            header['sorted'] = False
+        header['start'] = first if header['start'] is None else min(header['start'], first)
+        header['end'] = last if header['end'] is None else max(header['end'], int(times.max()))
+        header['count'] += len(records)
+        _write_header(self.dir, header)
+
+    def close(self) -> None:
+        for f in self.files.values():
+            f.close()
+
+
+class ArchiveSink:
+    def __init__(self, root: str, flush_rows: int = 60, flush_interval: float = 5.0,
+                 fsync: bool = False):
+        """
+        Columnar archive of TSG records, one directory per UTC day.
+
+        Each day directory holds one raw file per TSG_DTYPE field
+        (<field>.bin, little-endian, fixed width) and a header.json with
+        the record count, time range and dtypes. Records are appended to
+        every column and the header is replaced afterwards, so the header
+        count always covers complete rows; bytes past it are trimmed when
+        the day is next opened. Read it back with Archive, which memory-maps
+        the columns without parsing or copying.
+
+        Rows are buffered like CSVSink: written every flush_rows records or
+        when the oldest has waited flush_interval seconds. Records without a
+        datetime_utc cannot be placed in a day and are skipped.
+
+        Args:
+            root (str): Archive directory
+            flush_rows (int): Records buffered before writing
+            flush_interval (float): Maximum age in seconds of a buffered record
+            fsync (bool): fsync the column files after each write
+        """
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._rows: list[tuple] = []
+        self._pending_since: Optional[float] = None
+        self._day: Optional[_Day] = None
+
+        self.records_written = 0
+        self.records_skipped = 0
+
+    def write(self, record) -> None:
+        """Buffer a single parsed record, writing the buffer if due."""
+        if not self._rows:
+            self._pending_since = time.monotonic()
+        self._rows.append(record_to_array_row(record))
+        if self.flush_due():
+            self.flush()
+
+    def flush_due(self) -> bool:
+        if not self._rows:
+            return False
+        if len(self._rows) >= self.flush_rows:
+            return True
+        return time.monotonic() - self._pending_since >= self.flush_interval
+
+    def flush(self) -> None:
+        """Write the buffered records."""
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        self._pending_since = None
+        self.append(np.array(rows, dtype=TSG_DTYPE))
+
+    def append(self, records: np.ndarray) -> int:
+        """
+        Append TSG_DTYPE records, split by the UTC day of their datetime_utc.
+
+        Returns:
+            int: Number of records written
+        """
+        times = records['datetime_utc']
+        valid = times != MISSING_INT
+        if not valid.all():
+            self.records_skipped += int((~valid).sum())
+            logger.warning(f"Skipping {int((~valid).sum())} records without datetime_utc")
+            records = records[valid]
+            times = times[valid]
+        if not len(records):
+            return 0
+
+        days = times // _SECONDS_PER_DAY
+        # Split where the day changes, keeping record order within each day
+        breaks = np.flatnonzero(np.diff(days)) + 1
+        for part in np.split(records, breaks):
+            self._open_day(day_name(int(part['datetime_utc'][0]))).append(part, self.fsync)
+        self.records_written += len(records)
+        return len(records)
+
+    def _open_day(self, day: str) -> _Day:
+        if self._day is None or self._day.header['day'] != day:
+            if self._day is not None:
+                self._day.close()
+            self._day = _Day(os.path.join(self.root, day), day)
+        return self._day
+
+    def stats(self) -> dict:
+        return {'records': self.records_written, 'skipped': self.records_skipped,
+                'pending': len(self._rows)}
+
+    def close(self) -> None:
+        """Write any buffered records and close the column files."""
+        try:
+            self.flush()
+        finally:
+            if self._day is not None:
+                self._day.close()
+                self._day = None
+
+
+class Archive:
+    def __init__(self, root: str):
+        """
+        Read a columnar archive written by ArchiveSink.
+
+        Columns are opened with np.memmap, read-only, so slicing a day
+        touches only the pages of the rows and columns used. Days whose
+        records arrived in time order are sliced by binary search on
+        datetime_utc and return views; others fall back to a boolean mask,
+        which copies.
+
+        Args:
+            root (str): Archive directory
+        """
+        self.root = root
+
+    def days(self) -> list[str]:
+        """Return the archived days, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, name, HEADER_NAME)))
+
+    def header(self, day: str) -> Optional[dict]:
+        return read_header(os.path.join(self.root, day))
+
+    def columns(self, day: str, fields: Optional[Iterable[str]] = None) -> dict[str, np.ndarray]:
+        """
+        Memory-map the columns of one day.
+
+        Args:
+            day (str): Day as YYYY-MM-DD
+            fields (Iterable[str]): Columns to map, default all
+
+        Returns:
+            dict: Field name to a read-only np.memmap of the day's values
+        """
+        header = self.header(day)
+        if header is None:
+            raise KeyError(day)
+        count = header['count']
+        columns = {}
+        for name in fields or header['fields']:
+            dtype = np.dtype(header['fields'][name])
+            if count == 0:
+                columns[name] = np.empty(0, dtype=dtype)
+                continue
+            columns[name] = np.memmap(os.path.join(self.root, day, f"{name}.bin"),
+                                      dtype=dtype, mode='r', shape=(count,))
+        return columns
+
+    def slices(self, start: Optional[int] = None, end: Optional[int] = None,
+               fields: Optional[Iterable[str]] = None) -> Iterator[dict[str, np.ndarray]]:
+        """
+        Yield, per day, the columns of the records with start <= datetime_utc <= end.
+
+        Args:
+            start (int): First Unix timestamp, or None for the first record
+            end (int): Last Unix timestamp, or None for the last record
+            fields (Iterable[str]): Columns to return, default all
+
+        Yields:
+            dict: Field name to the day's values in the range, views of the memmaps
+                where the day is in time order
+        """
+        fields = list(fields) if fields else None
+        for day in self.days():
+            header = self.header(day)
+            if not header['count']:
+                continue
+            if start is not None and header['end'] < start:
+                continue
+            if end is not None and header['start'] > end:
+                continue
+            wanted = fields or list(header['fields'])
+            columns = self.columns(day, set(wanted) | {'datetime_utc'})
+            times = columns['datetime_utc']
+            if header['sorted']:
+                first = 0 if start is None else np.searchsorted(times, start, 'left')
+                last = len(times) if end is None else np.searchsorted(times, end, 'right')
+                if first < last:
+                    yield {name: columns[name][first:last] for name in wanted}
+            else:
+                mask = np.ones(len(times), dtype=bool)
+                if start is not None:
+                    mask &= times >= start
+                if end is not None:
+                    mask &= times <= end
+                if mask.any():
+                    yield {name: columns[name][mask] for name in wanted}
+
+    def read(self, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        """Return the records in a time range as one TSG_DTYPE array (a copy)."""
+        parts = []
+        for columns in self.slices(start, end):
+            part = np.empty(len(columns['datetime_utc']), dtype=TSG_DTYPE)
+            for name in TSG_DTYPE.names:
+                if name in columns:
+                    part[name] = columns[name]
+                else:
+                    # A column added after the day was written
+                    part[name] = MISSING_INT if TSG_DTYPE[name].kind == 'i' else math.nan
+            parts.append(part)
+        return np.concatenate(parts) if parts else np.empty(0, dtype=TSG_DTYPE)
+
+
+def _csv_value(name: str, value: str):
+    if value == '' or value is None:
+        return None
+    if TSG_DTYPE[name].kind == 'i':
+        try:
+            return int(float(value))
+        except ValueError:
+            # nmea_time written by csv.DictWriter from a datetime; naive
+            # values are UTC, as in the schema migration, not local time
+            when = datetime.fromisoformat(value)
+            if when.tzinfo is None:
+                when = when.replace(tzinfo=timezone.utc)
+            return int(when.timestamp())
+    return float(value)
+
+
+def _to_array(rows: list[dict]) -> np.ndarray:
+    return np.array([record_to_array_row(row) for row in rows], dtype=TSG_DTYPE)
+
+
+def iter_csv(path: str, chunk_rows: int = 100_000) -> Iterator[np.ndarray]:
+    """Yield TSG_DTYPE chunks of a CSV file written by CSVSink or write_to_csv."""
+    with open(path, newline='') as f:
+        rows = []
+        for number, row in enumerate(csv.DictReader(f), 2):
+            try:
+                rows.append({name: _csv_value(name, row.get(name))
+                             for name in TSG_DTYPE.names})
+            except ValueError as e:
+                logger.warning(f"Skipping line {number} of {path}: {str(e)}")
+                continue
+            if len(rows) >= chunk_rows:
+                yield _to_array(rows)
+                rows = []
+        if rows:
+            yield _to_array(rows)
+
+
+def iter_sqlite(db_path: str, table_name: str, chunk_rows: int = 100_000) -> Iterator[np.ndarray]:
+    """Yield TSG_DTYPE chunks of a TSG table in datetime_utc order."""
+    conn = sqlite3.connect(db_path)
+    try:
+        available = {row[1] for row in conn.execute(f'PRAGMA table_info({table_name})')}
+        names = [name for name in TSG_DTYPE.names if name in available]
+        # Tables from before the schema was managed have no id column
+        order = 'id' if 'id' in available else 'rowid'
+        cursor = conn.execute(
+            f"SELECT {', '.join(names)} FROM {table_name} ORDER BY datetime_utc, {order}"
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield _to_array([dict(zip(names, row)) for row in rows])
+    finally:
+        conn.close()
+
+
+def _archived_keys(archive: Archive, day: str) -> set[tuple[int, int]]:
+    """Return the (datetime_utc, nmea_time) keys archived for a day, leaving out missing nmea_time."""
+    if archive.header(day) is None:
+        return set()
+    columns = archive.columns(day, ['datetime_utc', 'nmea_time'])
+    nmea_time = columns['nmea_time']
+    known = nmea_time != MISSING_INT
+    return set(zip(columns['datetime_utc'][known].tolist(), nmea_time[known].tolist()))
+
+
+def convert(chunks: Iterable[np.ndarray], root: str) -> dict:
+    """
+    Build an archive from TSG_DTYPE chunks, e.g. from iter_csv or iter_sqlite.
+
+    Records are deduplicated on (datetime_utc, nmea_time) against what is
+    already archived for their day, including chunks written earlier in
+    the same run, so converting overlapping sources (a CSV file and the
+    database holding the same records) or converting twice adds each
+    record once, and a partly archived day is completed. As in spool
+    replay, records within one chunk are not compared with each other and
+    a missing nmea_time never matches, so distinct records sharing a
+    second are all kept. Only the keys of the day being converted are held
+    in memory.
+
+    Returns:
+        dict: Records written, duplicates skipped and records skipped for
+            lacking a datetime_utc
+    """
+    start = time.perf_counter()
+    archive = Archive(root)
+    sink = ArchiveSink(root)
+    written = duplicates = 0
+    day, keys = None, set()
+    try:
+        for records in chunks:
+            times = records['datetime_utc']
+            # Runs of records on one day; records without a time are counted
+            # and skipped by the sink
+            days = np.where(times == MISSING_INT, MISSING_INT, times // _SECONDS_PER_DAY)
+            breaks = np.flatnonzero(np.diff(days)) + 1
+            for part in np.split(records, breaks):
+                if not len(part):
+                    continue
+                first = int(part['datetime_utc'][0])
+                if first != MISSING_INT:
+                    if day_name(first) != day:
+                        day = day_name(first)
+                        keys = _archived_keys(archive, day)
+                    part_keys = list(zip(part['datetime_utc'].tolist(),
+                                         part['nmea_time'].tolist()))
+                    keep = np.array([key not in keys for key in part_keys], dtype=bool)
+                    duplicates += len(part) - int(keep.sum())
+                    part = part[keep]
+                    keys.update(key for key, kept in zip(part_keys, keep)
+                                if kept and key[1] != MISSING_INT)
+                # Written straight away, so a day converted again later in
+                # the run is read back complete
+                written += sink.append(part)
+    finally:
+        sink.close()
+    elapsed = time.perf_counter() - start
+    if duplicates:
+        logger.warning(f"Skipped {duplicates} records already in {root}")
+    logger.info(f"Archived {written} records in {elapsed:.1f}s")
+    return {'records': written, 'duplicates': duplicates,
+            'skipped_time': sink.records_skipped, 'seconds': elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build a memory-mapped columnar archive from TSG CSV files or SQLite"
+    )
+    parser.add_argument('output', help="archive directory")
+    parser.add_argument('--csv', nargs='+', default=[], help="CSV files written by tsg")
+    parser.add_argument('--sqlite', action='store_true',
+                        help="read the database table (default from config)")
+    parser.add_argument('--config', default='config.yaml',
+                        help="config file supplying the default database and table")
+    parser.add_argument('--db', help="SQLite database (default from config)")
+    parser.add_argument('--table', help="table name (default from config)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if not args.csv and not (args.sqlite or args.db):
+        parser.error("give --csv files and/or --sqlite")
+
+    def chunks():
+        for path in sorted(args.csv):
+            logger.info(f"Reading {path}")
+            yield from iter_csv(path)
+        if args.sqlite or args.db:
+            db_path, table_name = database_target(args.db, args.table, args.config)
+            if db_path is None or table_name is None:
+                parser.error("--db and --table are required without a config file")
+            logger.info(f"Reading table {table_name} of {db_path}")
+            yield from iter_sqlite(db_path, table_name)
+
+    convert(chunks(), args.output)
+
+
+if __name__ == "__main__":
+    main()
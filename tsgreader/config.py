@@ -0,0 +1,31 @@
+import os
+from typing import Optional
+
+
+def load_config(config_path: str = "config.yaml") -> dict:
+    """Read a YAML configuration file."""
+    # Imported here to keep PyYAML's import out of module import time
+    import yaml
+
+    with open(config_path, "r") as f:
+        return yaml.safe_load(f)
+
+
+def database_target(db_path: Optional[str], table_name: Optional[str],
+                    config_path: str = "config.yaml") -> tuple[Optional[str], Optional[str]]:
+    """
+    Fill in a database path and table name missing from the command line.
+
+    Args:
+        db_path (str): Database given on the command line, or None
+        table_name (str): Table given on the command line, or None
+        config_path (str): Config file consulted for whatever is missing, if it exists
+
+    Returns:
+        tuple: (db_path, table_name), either of which may still be None
+    """
+    if (db_path is None or table_name is None) and os.path.exists(config_path):
+        database = load_config(config_path)["database"]
+        db_path = db_path or database["db"]
+        table_name = table_name or database["table"]
+    return db_path, table_name
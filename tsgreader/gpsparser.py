@@ -0,0 +1,123 @@
+import time
+from datetime import datetime, timezone
+from functools import reduce
+from typing import NamedTuple, Optional
+
+
+class GPSRecord(NamedTuple):
+    """One position fix from an RMC or GGA sentence; fields a sentence lacks are None."""
+    datetime_utc: Optional[int] = None
+    sentence: Optional[str] = None
+    nmea_time: Optional[datetime] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    speed_knots: Optional[float] = None
+    course: Optional[float] = None
+    fix_quality: Optional[int] = None
+    satellites: Optional[int] = None
+    hdop: Optional[float] = None
+    altitude: Optional[float] = None
+
+
+def nmea_checksum(body: str) -> int:
+    """XOR of the characters between '$' and '*'."""
+    return reduce(lambda checksum, char: checksum ^ ord(char), body, 0)
+
+
+def parse_nmea_coordinate(value: str, hemisphere: str) -> Optional[float]:
+    """
+    Parse an NMEA ddmm.mmmm or dddmm.mmmm coordinate to decimal degrees.
+
+    Args:
+        value (str): Degrees and minutes, e.g. "4131.4341"
+        hemisphere (str): 'N', 'S', 'E' or 'W'
+
+    Returns:
+        float: Decimal degrees, negative for S and W, or None if empty
+    """
+    if not value:
+        return None
+    raw = float(value)
+    degrees = int(raw // 100)
+    decimal_degrees = degrees + (raw - degrees * 100) / 60.0
+    return -decimal_degrees if hemisphere in ('S', 'W') else decimal_degrees
+
+
+def _optional(value: str, convert):
+    return convert(value) if value else None
+
+
+class NMEAParser:
+    def __init__(self):
+        """
+        Parser for the GPS feed's RMC and GGA sentences from any talker.
+
+        GGA sentences carry only a time of day, so the date of the most
+        recent RMC sentence is used for their nmea_time.
+        """
+        self._date: Optional[tuple] = None
+
+    def parse(self, line: str) -> Optional[GPSRecord]:
+        """
+        Parse one NMEA 0183 sentence.
+
+        Args:
+            line (str): A sentence such as "$GPRMC,...*hh"
+
+        Returns:
+            GPSRecord: The fix, or None for sentence types that are not used
+
+        Raises:
+            ValueError: If the sentence is malformed or its checksum is wrong
+        """
+        if not line.startswith('$'):
+            raise ValueError(f"Not an NMEA sentence: {line}")
+        body, sep, checksum = line[1:].partition('*')
+        if sep and int(checksum[:2], 16) != nmea_checksum(body):
+            raise ValueError(f"Bad NMEA checksum: {line}")
+
+        fields = body.split(',')
+        sentence = fields[0][2:]
+        try:
+            if sentence == 'RMC':
+                return self._parse_rmc(fields)
+            if sentence == 'GGA':
+                return self._parse_gga(fields)
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"Error parsing NMEA sentence: {str(e)}") from e
+        return None
+
+    def _nmea_time(self, hms: str) -> Optional[datetime]:
+        if not hms or self._date is None:
+            return None
+        year, month, day = self._date
+        return datetime(year, month, day, int(hms[0:2]), int(hms[2:4]), int(hms[4:6]),
+                        tzinfo=timezone.utc)
+
+    def _parse_rmc(self, fields: list[str]) -> GPSRecord:
+        dmy = fields[9]
+        if dmy:
+            self._date = (2000 + int(dmy[4:6]), int(dmy[2:4]), int(dmy[0:2]))
+        valid = fields[2] == 'A'
+        return GPSRecord(
+            datetime_utc=int(time.time()),
+            sentence='RMC',
+            nmea_time=self._nmea_time(fields[1]),
+            latitude=parse_nmea_coordinate(fields[3], fields[4]) if valid else None,
+            longitude=parse_nmea_coordinate(fields[5], fields[6]) if valid else None,
+            speed_knots=_optional(fields[7], float),
+            course=_optional(fields[8], float),
+        )
+
+    def _parse_gga(self, fields: list[str]) -> GPSRecord:
+        return GPSRecord(
+            datetime_utc=int(time.time()),
+            sentence='GGA',
+            nmea_time=self._nmea_time(fields[1]),
+            latitude=parse_nmea_coordinate(fields[2], fields[3]),
+            longitude=parse_nmea_coordinate(fields[4], fields[5]),
+            fix_quality=_optional(fields[6], int),
+            satellites=_optional(fields[7], int),
+            hdop=_optional(fields[8], float),
+            altitude=_optional(fields[9], float),
+        )
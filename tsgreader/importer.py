@@ -0,0 +1,202 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+from tsgreader.config import database_target
+from tsgreader.rollup import rebuild_rollups
+from tsgreader.schema import ensure_schema
+from tsgreader.sinks import DB_COLUMNS
+from tsgreader.tsgparser import MISSING_INT, iter_tsg_file
+
+logger = logging.getLogger(__name__)
+
+
+def insert_new_sql(table_name: str) -> str:
+    """Build an INSERT that skips rows whose nmea_time is already in the table."""
+    columns = ', '.join(DB_COLUMNS)
+    placeholders = ', '.join(f'?{i}' for i in range(1, len(DB_COLUMNS) + 1))
+    # The nmea_time parameter is reused for the lookup on the nmea_time index
+    nmea_time = f"?{DB_COLUMNS.index('nmea_time') + 1}"
+    return (f'INSERT INTO {table_name} ({columns}) SELECT {placeholders} '
+            f'WHERE {nmea_time} IS NULL OR NOT EXISTS '
+            f'(SELECT 1 FROM {table_name} WHERE nmea_time = {nmea_time})')
+
+
+def records_to_rows(records: np.ndarray) -> list[tuple]:
+    """Convert TSG_DTYPE records to DB_COLUMNS rows, with NaN and MISSING_INT as NULL."""
+    columns = []
+    for name in DB_COLUMNS:
+        values = records[name]
+        column = values.astype(object)
+        if values.dtype.kind == 'f':
+            column[np.isnan(values)] = None
+        else:
+            column[values == MISSING_INT] = None
+        columns.append(column)
+    return list(zip(*(column.tolist() for column in columns)))
+
+
+class Checkpoint:
+    def __init__(self, path: Optional[str]):
+        """
+        Import progress per file, saved as JSON after every committed transaction.
+
+        Args:
+            path (str): Checkpoint file, or None to disable checkpointing
+        """
+        self.path = path
+        self.files = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.files = json.load(f)
+
+    def get(self, file_path: str) -> dict:
+        """Return the saved progress for a file, or a fresh entry if it changed."""
+        key = os.path.abspath(file_path)
+        size = os.path.getsize(file_path)
+        entry = self.files.get(key)
+        # A file that shrank is a different file; start it over
+        if entry is None or entry['offset'] > size:
+            entry = {'offset': 0, 'lines': 0, 'done': False}
+        self.files[key] = entry
+        return entry
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.files, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def import_files(paths: Iterable[str], db_path: str, table_name: str, fmt: str = 'auto',
+                 batch_rows: int = 100_000, chunk_size: int = 1 << 20,
+                 checkpoint_path: Optional[str] = None) -> dict:
+    """
+    Load raw capture files into the TSG table.
+
+    Files are streamed through the bulk parser and inserted with executemany
+    in transactions of about batch_rows rows. Rows whose nmea_time is already
+    in the table are skipped, and the rollup bins covering each transaction
+    are rebuilt. After each transaction the byte offset reached in the file
+    is saved to the checkpoint, so an interrupted import resumes where it
+    stopped.
+
+    Args:
+        paths (Iterable[str]): Raw capture files
+        db_path (str): Path to the SQLite database
+        table_name (str): TSG table to insert into
+        fmt (str): 'keyvalue', 'fixed' or 'auto'
+        batch_rows (int): Rows per transaction
+        chunk_size (int): Bytes parsed at a time
+        checkpoint_path (str): Progress file for resuming, or None
+
+    Returns:
+        dict: Counts of parsed, inserted, duplicate and rejected rows and rows/sec
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    ensure_schema(conn, table_name)
+    sql = insert_new_sql(table_name)
+
+    stats = {'files': 0, 'parsed': 0, 'inserted': 0, 'duplicates': 0, 'rejects': 0}
+    start = time.perf_counter()
+
+    def commit(rows, entry, offset, lines):
+        # datetime_utc is the first column
+        times = [row[0] for row in rows if row[0] is not None]
+        before = conn.total_changes
+        with conn:
+            conn.executemany(sql, rows)
+            inserted = conn.total_changes - before
+            if inserted and times:
+                rebuild_rollups(conn, table_name, min(times), max(times))
+        stats['inserted'] += inserted
+        stats['duplicates'] += len(rows) - inserted
+        entry.update(offset=offset, lines=lines)
+        checkpoint.save()
+
+    try:
+        for path in paths:
+            entry = checkpoint.get(path)
+            if entry['done']:
+                logger.info(f"Skipping {path}, already imported")
+                continue
+            if entry['offset']:
+                logger.info(f"Resuming {path} at byte {entry['offset']}")
+
+            rows = []
+            offset, lines = entry['offset'], entry['lines']
+            first_line = lines
+            for chunk in iter_tsg_file(path, fmt, chunk_size, start=entry['offset']):
+                rows.extend(records_to_rows(chunk.records))
+                stats['parsed'] += len(chunk.records)
+                stats['rejects'] += len(chunk.rejects)
+                for line in chunk.rejects[:5]:
+                    logger.warning(f"Rejected {path} line {first_line + line + 1}")
+                offset, lines = chunk.offset, lines + chunk.lines
+
+                if len(rows) >= batch_rows:
+                    commit(rows, entry, offset, lines)
+                    rows = []
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"{path}: {lines} lines, {stats['parsed'] / elapsed:.0f} rows/s")
+
+            commit(rows, entry, offset, lines)
+            entry['done'] = True
+            checkpoint.save()
+            stats['files'] += 1
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    stats['seconds'] = elapsed
+    stats['rows_per_sec'] = stats['parsed'] / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"Imported {stats['inserted']} rows from {stats['files']} files in {elapsed:.1f}s "
+        f"({stats['rows_per_sec']:.0f} rows/s), {stats['duplicates']} duplicates skipped, "
+        f"{stats['rejects']} lines rejected"
+    )
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import raw TSG capture files into SQLite")
+    parser.add_argument('files', nargs='+', help="raw capture files")
+    parser.add_argument('--config', default='config.yaml',
+                        help="config file supplying the default database and table")
+    parser.add_argument('--db', help="SQLite database (default from config)")
+    parser.add_argument('--table', help="table name (default from config)")
+    parser.add_argument('--format', choices=('auto', 'keyvalue', 'fixed'), default='auto',
+                        help="line format")
+    parser.add_argument('--batch-rows', type=int, default=100_000, help="rows per transaction")
+    parser.add_argument('--checkpoint', help="progress file (default: <db>.import.json)")
+    parser.add_argument('--restart', action='store_true',
+                        help="ignore any saved progress and start from the beginning")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    db_path, table_name = database_target(args.db, args.table, args.config)
+    if db_path is None or table_name is None:
+        parser.error("--db and --table are required without a config file")
+
+    checkpoint_path = args.checkpoint or f"{db_path}.import.json"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    import_files(args.files, db_path, table_name, args.format, args.batch_rows,
+                 checkpoint_path=checkpoint_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import json
+import logging
+import math
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from tsgreader.tsgparser import MISSING_INT, TSG_DTYPE, TSGRecord
+
+logger = logging.getLogger(__name__)
+
+
+def record_to_array_row(record) -> tuple:
+    """Convert a parsed TSG record to a TSG_DTYPE tuple, with NaN and MISSING_INT for gaps."""
+    values = record if isinstance(record, TSGRecord) else map(record.get, TSG_DTYPE.names)
+    row = []
+    for name, value in zip(TSG_DTYPE.names, values):
+        if isinstance(value, datetime):
+            value = int(value.timestamp())
+        if value is None:
+            value = MISSING_INT if TSG_DTYPE[name].kind == 'i' else math.nan
+        row.append(value)
+    return tuple(row)
+
+
+def records_to_json(records: np.ndarray) -> list[dict]:
+    """Convert TSG_DTYPE records to JSON-ready dicts, with NaN and MISSING_INT as None."""
+    columns = []
+    for name in TSG_DTYPE.names:
+        values = records[name]
+        column = values.astype(object)
+        if values.dtype.kind == 'f':
+            column[np.isnan(values)] = None
+        else:
+            column[values == MISSING_INT] = None
+        columns.append(column.tolist())
+    return [dict(zip(TSG_DTYPE.names, row)) for row in zip(*columns)]
+
+
+class RingBuffer:
+    def __init__(self, capacity: int):
+        """
+        Fixed-size in-memory store of the most recent TSG records.
+
+        Records are kept in a preallocated TSG_DTYPE array; once it is full
+        each new record overwrites the oldest. Queries by time assume
+        records arrive in datetime_utc order, as they do during acquisition.
+        It has the same write/flush_due/flush/close interface as the other
+        sinks so it can be fed by run_loop or a Pipeline writer thread.
+
+        Args:
+            capacity (int): Number of records held
+        """
+        if capacity < 1:
+            raise ValueError(f"Invalid ring buffer capacity: {capacity}")
+        self.capacity = capacity
+        self._data = np.empty(capacity, dtype=TSG_DTYPE)
+        self._head = 0  # index of the next write
+        self._count = 0
+        self._lock = threading.Lock()
+        self.records_written = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def write(self, record) -> None:
+        """Store a single record, overwriting the oldest if full."""
+        row = record_to_array_row(record)
+        with self._lock:
+            self._data[self._head] = row
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self.records_written += 1
+
+    def flush_due(self) -> bool:
+        return False
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def _segments(self) -> list[np.ndarray]:
+        """Views of the stored records, oldest first. Call with the lock held."""
+        if self._count < self.capacity:
+            return [self._data[:self._count]]
+        return [self._data[self._head:], self._data[:self._head]]
+
+    def latest(self, n: int = 1) -> np.ndarray:
+        """Return a copy of the newest n records, oldest first."""
+        with self._lock:
+            n = max(0, min(n, self._count))
+            indices = (self._head - n + np.arange(n)) % self.capacity
+            return self._data[indices]
+
+    def range(self, start: Optional[float] = None, end: Optional[float] = None) -> np.ndarray:
+        """
+        Return a copy of the records with start <= datetime_utc <= end.
+
+        Args:
+            start (float): First timestamp, or None for the oldest record
+            end (float): Last timestamp, or None for the newest record
+
+        Returns:
+            np.ndarray: TSG_DTYPE records, oldest first
+        """
+        with self._lock:
+            parts = []
+            for segment in self._segments():
+                times = segment['datetime_utc']
+                first = 0 if start is None else np.searchsorted(times, start, 'left')
+                last = len(segment) if end is None else np.searchsorted(times, end, 'right')
+                parts.append(segment[first:last])
+            return np.concatenate(parts) if len(parts) > 1 else parts[0].copy()
+
+    def since(self, timestamp: float, limit: Optional[int] = None) -> np.ndarray:
+        """Return records newer than timestamp, at most limit of the oldest of them."""
+        records = self.range(start=math.floor(timestamp) + 1)
+        return records[:limit] if limit is not None else records
+
+    def decimated(self, start: Optional[float] = None, end: Optional[float] = None,
+                  max_points: int = 1000) -> np.ndarray:
+        """Return records in a time range, keeping every k-th so at most max_points remain."""
+        records = self.range(start, end)
+        step = math.ceil(len(records) / max_points) if max_points > 0 else 1
+        return records[::max(step, 1)]
+
+
+class _LiveRequestHandler(BaseHTTPRequestHandler):
+    buffer: RingBuffer = None
+    stats: Optional[Callable[[], Optional[dict]]] = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            stats = self.stats() if self.stats else None
+            if stats is None:
+                self._send(404, {'error': "No stats available"})
+            else:
+                self._send(200, stats)
+            return
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if url.path == '/latest':
+                records = self.buffer.latest(int(query.get('n', 1)))
+            elif url.path == '/since':
+                limit = query.get('limit')
+                records = self.buffer.since(float(query['t']),
+                                            int(limit) if limit is not None else None)
+            elif url.path == '/range':
+                start, end = query.get('start'), query.get('end')
+                records = self.buffer.decimated(
+                    float(start) if start is not None else None,
+                    float(end) if end is not None else None,
+                    int(query.get('max_points', 1000)),
+                )
+            else:
+                self._send(404, {'error': f"Unknown path: {url.path}"})
+                return
+        except (KeyError, ValueError) as e:
+            self._send(400, {'error': f"Invalid query: {str(e)}"})
+            return
+        self._send(200, {'records': records_to_json(records)})
+
+    def _send(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class LiveServer:
+    def __init__(self, buffer: RingBuffer, host: str = '127.0.0.1', port: int = 8765,
+                 stats: Optional[Callable[[], Optional[dict]]] = None):
+        """
+        Loopback HTTP server answering queries from a RingBuffer.
+
+        Endpoints, all returning {"records": [...]} as JSON:
+            /latest?n=N: the newest N records (default 1)
+            /since?t=T&limit=N: records with datetime_utc after T
+            /range?start=T0&end=T1&max_points=N: records in [T0, T1],
+                decimated to at most N (default 1000)
+        and /stats, returning the latest acquisition stats if stats is given.
+
+        Args:
+            buffer (RingBuffer): Records to serve
+            host (str): Address to listen on; keep to loopback
+            port (int): TCP port, 0 to pick a free one
+            stats (callable): Returns the latest stats snapshot, or None
+        """
+        handler = type('LiveRequestHandler', (_LiveRequestHandler,),
+                       {'buffer': buffer, 'stats': staticmethod(stats) if stats else None})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> tuple:
+        return self.server.server_address[:2]
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.server.serve_forever, name='live-server',
+                                        daemon=True)
+        self._thread.start()
+        host, port = self.address
+        logger.info(f"Serving live data on http://{host}:{port}")
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
@@ -1,70 +1,53 @@
-from tsgreader.tsgparser import parse_tsg_line
+from tsgreader.tsgparser import TSGLineParser
 from tsgreader.serialreader import SerialReader
+from tsgreader.pipeline import Pipeline
+from tsgreader.metrics import Metrics, ProfileHook, StatsReporter
+from tsgreader.qc import StreamingQC
+from tsgreader.status import StatusSummary, setup_logging, stop_logging
+from tsgreader.config import load_config
+from tsgreader.sinks import (CSVSink, SQLiteSink, CSV_FIELDNAMES, DB_COLUMNS, TABLE_KINDS,
+                             insert_sql, record_to_row)
+from tsgreader.schema import ensure_schema
+from tsgreader.rollup import update_rollups
+import argparse
 import logging
-import yaml
 import csv
 import sqlite3
-from datetime import datetime, timezone
-
-
-# Read the configuration file
-with open("config.yaml", "r") as file:
-    config = yaml.safe_load(file)
-
-# Access configuration values
-TSG_PORT = config["stream"]["port"]
-TSG_BAUD = config["stream"]["baudrate"]
-LOGFILE = config["file"]["log"]
-DATAFILE = config["file"]["data"]
-DB_PATH = config["database"]["db"]
-DB_TABLE = config["database"]["table"]
-
-# Configure logging
-logging.basicConfig(
-    # filename=LOGFILE,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%dT%H:%M:%S",
-    handlers=[logging.FileHandler(LOGFILE), logging.StreamHandler()],
-)
+import time
+from typing import Optional
 
 # Start logger
 logger = logging.getLogger(__name__)
 
 def write_to_database(parsed_line, db_path, table_name):
-    """Write a single TSG data record to SQLite database."""
+    """
+    Write a single TSG data record to SQLite database.
+
+    Opens and commits a new connection per call; use SQLiteSink for
+    continuous acquisition.
+    """
     # Connect to database
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
     
     try:
+        ensure_schema(conn, table_name)
         # Insert data into database
-        cursor.execute(f'''
-            INSERT INTO {table_name} 
-            (datetime_utc, scan_no, cond, temp, salinity, hull_temp, time_elapsed, nmea_time, latitude, longitude)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            parsed_line.get('datetime_utc'),
-            parsed_line.get('scan_no'),
-            parsed_line.get('cond'),
-            parsed_line.get('temp'),
-            parsed_line.get('salinity'),
-            parsed_line.get('hull_temp'),
-            parsed_line.get('time_elapsed'),
-            parsed_line.get('nmea_time'),
-            parsed_line.get('latitude'),
-            parsed_line.get('longitude')
-        ))
+        row = record_to_row(parsed_line)
+        conn.execute(insert_sql(table_name), row)
+        # Roll up the stored row, so missing fields are NULL in both
+        update_rollups(conn, table_name, [dict(zip(DB_COLUMNS, row))])
         conn.commit()
     finally:
         conn.close()
 
 def write_to_csv(parsed_line, datafile):
-    """Write a single TSG data record to CSV file."""
+    """
+    Write a single TSG data record to CSV file.
+
+    Reopens the file for every call; use CSVSink for continuous acquisition.
+    """
     with open(datafile, 'a', newline='') as f:
-        fieldnames = ['datetime_utc', 'scan_no', 'cond', 'temp', 'salinity', 'hull_temp',
-                      'time_elapsed', 'nmea_time', 'latitude', 'longitude']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDNAMES)
         
         # Write header if file is empty
         if f.tell() == 0:
@@ -72,55 +55,382 @@ def write_to_csv(parsed_line, datafile):
         
         writer.writerow(parsed_line)
 
-def main():
-    
-    # Create SerialReader instance
-    reader = SerialReader(TSG_PORT, baudrate=TSG_BAUD)
-    
-    logger.info("Starting TSG data acquisition...")
-    logger.info(f"Writing to CSV: {DATAFILE}")
-    logger.info(f"Writing to database: {DB_PATH}")
-    
-    try:
-        # Continuously read data and write to both CSV and database
-        for line in reader.read_lines():
-            try:
-                parsed_line = parse_tsg_line(line)
+def flush_due_sinks(csv_sink, db_sink, archive=None):
+    """Write buffered records that have waited longer than their flush interval."""
+    sinks = [('CSV', csv_sink), ('database', db_sink)]
+    if archive is not None:
+        sinks.append(('archive', archive))
+    for name, sink in sinks:
+        try:
+            if sink.flush_due():
+                sink.flush()
+        except Exception as e:
+            logger.error(f"Error writing to {name}: {str(e)}")
+
+def run_loop(reader, parse, csv_sink, db_sink, live_buffer=None,
+             metrics: Optional[Metrics] = None, profiler: Optional[ProfileHook] = None,
+             summary: Optional[StatusSummary] = None, qc: Optional[StreamingQC] = None,
+             archive=None):
+    """
+    Read, parse and write each line in turn on the calling thread.
+
+    Records are added to summary, which logs their min/mean/max once per
+    interval instead of a line per record. With qc, each record's qc_flag
+    is set before it is written. With archive (an ArchiveSink), records
+    are also appended to the columnar archive.
+
+    Each stage is timed into metrics ('parse', 'qc', 'csv', 'db', 'live',
+    'archive' and 'line', from arrival to the last sink), and lines, records and
+    rejected lines are counted. profiler.check() is called once per line
+    and whenever the port is idle.
+    """
+    metrics = metrics or Metrics()
+    summary = summary or StatusSummary()
+
+    def on_idle():
+        flush_due_sinks(csv_sink, db_sink, archive)
+        summary.tick()
+        if profiler:
+            profiler.check()
+
+    # Continuously read data and write to both CSV and database
+    for line in reader.read_lines(on_idle=on_idle):
+        arrival = time.perf_counter()
+        metrics.incr('lines')
+        if profiler:
+            profiler.check()
+        try:
+            parsed_line = parse(line)
+            
+            if parsed_line:  # Only write if parsing was successful
+                parsed = time.perf_counter()
+                metrics.observe('parse', parsed - arrival)
+                metrics.incr('records')
+                if qc is not None:
+                    parsed_line = qc.process(parsed_line)
+                    checked = time.perf_counter()
+                    metrics.observe('qc', checked - parsed)
+                    parsed = checked
+                summary.add(parsed_line)
                 
-                if parsed_line:  # Only write if parsing was successful
-                    logger.info(
-                        f"Lab: {parsed_line.get('temp'):.2g}, "
-                        f"Hull: {parsed_line.get('hull_temp'):.2g}, "
-                        f"Sal: {parsed_line.get('salinity'):.2g}"
-                    )
-                    
-                    # Write to CSV
+                # Write to CSV
+                try:
+                    csv_sink.write(parsed_line)
+                except Exception as e:
+                    metrics.incr('csv_errors')
+                    logger.error(f"Error writing to CSV: {str(e)}")
+                written_csv = time.perf_counter()
+                metrics.observe('csv', written_csv - parsed)
+                
+                # Write to database
+                try:
+                    db_sink.write(parsed_line, arrival=arrival)
+                except Exception as e:
+                    metrics.incr('db_errors')
+                    logger.error(f"Error writing to database: {str(e)}")
+                written_db = time.perf_counter()
+                metrics.observe('db', written_db - written_csv)
+
+                if live_buffer is not None:
+                    live_buffer.write(parsed_line)
+                    metrics.observe('live', time.perf_counter() - written_db)
+                if archive is not None:
+                    archive_start = time.perf_counter()
                     try:
-                        write_to_csv(parsed_line, DATAFILE)
+                        archive.write(parsed_line)
                     except Exception as e:
-                        logger.error(f"Error writing to CSV: {str(e)}")
+                        metrics.incr('archive_errors')
+                        logger.error(f"Error writing to archive: {str(e)}")
+                    metrics.observe('archive', time.perf_counter() - archive_start)
+                metrics.observe('line', time.perf_counter() - arrival)
                     
-                    # Write to database
-                    try:
-                        write_to_database(parsed_line, DB_PATH, DB_TABLE)
-                    except Exception as e:
-                        logger.error(f"Error writing to database: {str(e)}")
-                        
-            except Exception as e:
-                logger.error(f"Error parsing line: {line}. Error: {str(e)}")
-                continue
-                
+        except Exception as e:
+            metrics.incr('parse_errors')
+            logger.error(f"Error parsing line: {line}. Error: {str(e)}")
+            continue
+
+def make_pipeline(config, reader, parse, csv_sink, db_sink, live_buffer=None, archive=None,
+                  metrics: Optional[Metrics] = None, profiler: Optional[ProfileHook] = None):
+    """Create a threaded Pipeline from the pipeline section of the config."""
+    pipeline_config = config.get("pipeline", {})
+    sinks = {'csv': csv_sink, 'database': db_sink}
+    if live_buffer is not None:
+        sinks['live'] = live_buffer
+    if archive is not None:
+        sinks['archive'] = archive
+    return Pipeline(
+        reader,
+        parse,
+        sinks,
+        queue_size=pipeline_config.get("queue_size", 1000),
+        backpressure=pipeline_config.get("backpressure", "block"),
+        spill_dir=pipeline_config.get("spill_dir", "spill"),
+        on_record=StatusSummary(config["file"].get("summary_interval", 60)).add,
+        stats_interval=pipeline_config.get("stats_interval", 60),
+        metrics=metrics,
+        profiler=profiler,
+    )
+
+def make_csv_sink(config, datafile=None, fieldnames=CSV_FIELDNAMES):
+    """Create a CSVSink with the rotation and flush settings of the file section."""
+    file_config = config["file"]
+    return CSVSink(datafile or file_config["data"],
+                   rotate=file_config.get("rotate", "none"),
+                   max_bytes=file_config.get("max_bytes", 100_000_000),
+                   flush_rows=file_config.get("flush_rows", 60),
+                   flush_interval=file_config.get("flush_interval", 5),
+                   fsync=file_config.get("fsync", False), fieldnames=fieldnames)
+
+def make_reader(stream_config, metrics=None):
+    """
+    Create a SerialReader from a stream section of the config.
+
+    Reconnecting after a fault is on unless the section sets reconnect:
+    false. Each outage is counted ('serial_reconnects') and its length
+    recorded ('serial_gap') in metrics.
+    """
+    def on_reconnect(failed_at, restored_at):
+        if metrics is not None:
+            metrics.incr('serial_reconnects')
+            metrics.observe('serial_gap', restored_at - failed_at)
+
+    return SerialReader(stream_config.get("port"), baudrate=stream_config.get("baudrate", 9600),
+                        reconnect=stream_config.get("reconnect", True),
+                        reconnect_delay=stream_config.get("reconnect_delay", 0.5),
+                        max_reconnect_delay=stream_config.get("max_reconnect_delay", 30),
+                        on_reconnect=on_reconnect)
+
+def make_qc(config) -> Optional[StreamingQC]:
+    """Create a StreamingQC from the qc section of the config, or None if QC is disabled."""
+    qc_config = config.get("qc", {})
+    if not qc_config.get("enabled", False):
+        return None
+    return StreamingQC.from_config(qc_config)
+
+def make_archive(config):
+    """Create an ArchiveSink from the archive section of the config, or None if it is disabled."""
+    archive_config = config.get("archive", {})
+    if not archive_config.get("enabled", False):
+        return None
+    # Imported here as it needs NumPy, which is slow to import
+    from tsgreader.archive import ArchiveSink
+
+    return ArchiveSink(archive_config.get("dir", "archive"),
+                       flush_rows=archive_config.get("flush_rows", 60),
+                       flush_interval=archive_config.get("flush_interval", 5),
+                       fsync=archive_config.get("fsync", False))
+
+def make_streams(config, db_sink, csv_sink, live_buffer=None, metrics=None, archive=None):
+    """
+    Create a Stream for each entry of the streams section of the config.
+
+    The first TSG stream writes to the database table, CSV file, live
+    buffer and archive configured elsewhere. Every other stream writes to its own table
+    (default: its name) and to a CSV file only if it sets `data`. With QC
+    enabled, each TSG stream gets its own StreamingQC, so its rolling
+    windows only see that instrument's data.
+    """
+    from tsgreader.streams import PARSERS, Stream
+
+    summary_interval = config["file"].get("summary_interval", 60)
+    streams = []
+    primary = True
+    for i, stream_config in enumerate(config["streams"]):
+        kind = stream_config.get("parser", "tsg")
+        if kind not in PARSERS:
+            raise ValueError(f"Invalid parser for stream {i + 1}: {kind}")
+        name = stream_config.get("name", f"stream{i + 1}")
+        is_primary = primary and kind == 'tsg'
+        primary = primary and not is_primary
+
+        table = stream_config.get("table", config["database"]["table"] if is_primary else name)
+        db_sink.add_table(table, kind)
+        sinks = []
+        if "data" in stream_config:
+            sinks.append(make_csv_sink(config, stream_config["data"], TABLE_KINDS[kind].columns))
+        elif is_primary:
+            sinks.append(csv_sink)
+        if is_primary and live_buffer is not None:
+            sinks.append(live_buffer)
+        if is_primary and archive is not None:
+            sinks.append(archive)
+
+        reader = make_reader(stream_config, metrics)
+        streams.append(Stream(name, reader, PARSERS[kind]().parse, table, db_sink, sinks,
+                              on_record=(StatusSummary(summary_interval, name=name).add
+                                         if kind == 'tsg' else None),
+                              metrics=metrics, qc=make_qc(config) if kind == 'tsg' else None))
+        logger.info(f"Stream {name}: {stream_config['port']} ({kind}) -> table {table}")
+    return streams
+
+def main(argv=None):
+    """
+    Entry point for the tsg command.
+
+    Reads the configuration and sets up logging here rather than at import,
+    so importing this module stays cheap.
+    """
+    parser = argparse.ArgumentParser(description="Acquire TSG data from a serial port.")
+    parser.add_argument("--config", default="config.yaml",
+                        help="configuration file (default: config.yaml)")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    # File and console output are written by a background thread
+    log_listener = setup_logging(config["file"]["log"])
+    try:
+        run(config)
+    except Exception as e:
+        logger.critical(f"Unhandled exception: {str(e)}", exc_info=True)
+    finally:
+        stop_logging(log_listener)
+
+def run(config):
+    """Acquire data with the given configuration until interrupted."""
+    stream = config.get("stream", {})
+    database = config["database"]
+    pipeline_config = config.get("pipeline", {})
+    live = config.get("live", {})
+    metrics_config = config.get("metrics", {})
+
+    metrics = Metrics()
+    csv_sink = make_csv_sink(config)
+    db_sink = SQLiteSink(database["db"], database["table"],
+                         batch_size=database.get("batch_size", 60),
+                         flush_interval=database.get("flush_interval", 5), metrics=metrics,
+                         spool_path=database.get("spool"),
+                         latency_budget=database.get("latency_budget", 0.5),
+                         drain_interval=database.get("drain_interval", 5))
+    
+    logger.info("Starting TSG data acquisition...")
+    logger.info(f"Writing to CSV: {config['file']['data']}")
+    logger.info(f"Writing to database: {database['db']}")
+
+    profiler = None
+    reporter = None
+    if metrics_config.get("enabled", False):
+        # Stage latencies and counters written periodically to a JSON file
+        if metrics_config.get("profile_trigger"):
+            profiler = ProfileHook(metrics_config["profile_trigger"],
+                                   metrics_config.get("profile_seconds", 30),
+                                   metrics_config.get("profile_dir", "."))
+        reporter = StatsReporter(metrics, metrics_config.get("file", "tsg_stats.json"),
+                                 metrics_config.get("interval", 60), profiler=profiler)
+
+    live_buffer = None
+    live_server = None
+    if live.get("enabled", False):
+        # Imported here as it needs NumPy, which is slow to import
+        from tsgreader.live import LiveServer, RingBuffer
+
+        # Recent records kept in memory so live displays never touch the database
+        capacity = int(live.get("hours", 12) * 3600 * live.get("rate", 1))
+        live_buffer = RingBuffer(capacity)
+        try:
+            live_server = LiveServer(live_buffer, live.get("host", "127.0.0.1"),
+                                     live.get("port", 8765),
+                                     stats=(lambda: reporter.latest) if reporter else None)
+            live_server.start()
+        except OSError as e:
+            logger.error(f"Error starting live server: {str(e)}")
+
+    archive = make_archive(config)
+    if archive is not None:
+        logger.info(f"Writing to archive: {archive.root}")
+
+    if config.get("streams"):
+        streams = make_streams(config, db_sink, csv_sink, live_buffer, metrics, archive)
+        readers = [stream.reader for stream in streams]
+    else:
+        # Create SerialReader instance
+        streams = None
+        readers = [make_reader(stream, metrics)]
+    parser = TSGLineParser()
+    qc = None if streams else make_qc(config)
+
+    # Create or upgrade the tables before any data arrives
+    try:
+        db_sink.connect()
+    except sqlite3.Error as e:
+        logger.error(f"Error preparing database: {str(e)}")
+    
+    pipeline = None
+    if reporter:
+        reporter.sources['serial'] = lambda: {reader.port: reader.stats() for reader in readers}
+        reporter.sources['database'] = db_sink.stats
+        if archive is not None:
+            reporter.sources['archive'] = archive.stats
+        if streams:
+            reporter.sources['streams'] = lambda: {stream.name: stream.stats() for stream in streams}
+        else:
+            reporter.sources['parser'] = lambda: {'fast': parser.fast_count,
+                                                  'fallback': parser.fallback_count}
+        if streams:
+            qc_stages = {stream.name: stream.qc for stream in streams if stream.qc}
+        else:
+            qc_stages = {'tsg': qc} if qc else {}
+        if qc_stages:
+            reporter.sources['qc'] = lambda: {name: stage.stats()
+                                              for name, stage in qc_stages.items()}
+        reporter.start()
+    try:
+        if streams:
+            # All instruments in one process, sharing the sinks
+            import asyncio
+            from tsgreader.streams import run_streams
+
+            if pipeline_config.get("enabled", False):
+                logger.warning("Pipeline settings are ignored when several streams are configured")
+            asyncio.run(run_streams(streams, profiler=profiler))
+        elif pipeline_config.get("enabled", False):
+            # Read, parse and write on separate threads
+            # QC runs on the parser thread, before records are queued for the sinks
+            pipeline = make_pipeline(config, readers[0],
+                                     qc.wrap(parser.parse) if qc else parser.parse,
+                                     csv_sink, db_sink, live_buffer, archive, metrics,
+                                     profiler)
+            if reporter:
+                reporter.sources['pipeline'] = pipeline.stats
+            pipeline.run()
+        else:
+            run_loop(readers[0], parser.parse, csv_sink, db_sink, live_buffer, metrics, profiler,
+                     StatusSummary(config["file"].get("summary_interval", 60)), qc, archive)
+
     except KeyboardInterrupt:
         logger.info("Received keyboard interrupt, shutting down...")
     except Exception as e:
         logger.error(f"Unexpected error in main loop: {str(e)}")
     finally:
-        reader.close()
+        if pipeline:
+            pipeline.stop()
+        if live_server:
+            live_server.stop()
+        for reader in readers:
+            reader.close()
+        csv_sinks = [csv_sink]
+        for stream in streams or []:
+            csv_sinks += [sink for sink in stream.sinks
+                          if isinstance(sink, CSVSink) and sink is not csv_sink]
+        for sink in csv_sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                logger.error(f"Error flushing CSV: {str(e)}")
+        try:
+            db_sink.close()
+        except Exception as e:
+            logger.error(f"Error flushing database: {str(e)}")
+        if archive is not None:
+            try:
+                archive.close()
+            except Exception as e:
+                logger.error(f"Error flushing archive: {str(e)}")
+        if profiler:
+            profiler.stop()
+        if reporter:
+            reporter.stop()
         logger.info("TSG data acquisition stopped.")
     
 
 if __name__ == "__main__":
-    try:
-        main()
-    except Exception as e:
-        logger.critical(f"Unhandled exception: {str(e)}", exc_info=True)
\ No newline at end of file
+    main()
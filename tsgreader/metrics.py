@@ -0,0 +1,279 @@
+import cProfile
+import json
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds: 1 µs to 100 s, five buckets per decade
+LATENCY_BOUNDS = tuple(10 ** (exponent / 5) for exponent in range(-30, 11))
+
+
+class LatencyHistogram:
+    def __init__(self, bounds: tuple = LATENCY_BOUNDS):
+        """
+        Fixed-bucket histogram of durations in seconds.
+
+        Recording is a bisect into the bucket bounds, so memory does not grow
+        with the number of samples. Percentiles are reported as the upper
+        bound of the bucket that holds them, capped at the largest value seen.
+
+        Args:
+            bounds (tuple): Increasing bucket upper bounds in seconds
+        """
+        self.bounds = bounds
+        self.reset()
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the q-th percentile (0-100) in seconds, or None if nothing was recorded."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                break
+        if index < len(self.bounds):
+            return min(self.bounds[index], self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """Return count, mean, p50, p95 and max, with times in milliseconds."""
+        def ms(seconds):
+            return round(seconds * 1000, 3) if seconds is not None else None
+        return {
+            'count': self.count,
+            'mean': ms(self.total / self.count) if self.count else None,
+            'p50': ms(self.percentile(50)),
+            'p95': ms(self.percentile(95)),
+            'max': ms(self.max) if self.count else None,
+        }
+
+
+class Metrics:
+    def __init__(self):
+        """
+        Rolling counters and per-stage latency histograms.
+
+        Counter totals cover the whole run; counter rates and the latency
+        histograms cover the interval since the last snapshot. Safe to
+        update from several threads.
+        """
+        self._lock = threading.Lock()
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._counters: dict[str, int] = {}
+        self._interval_counters: dict[str, int] = {}
+        self._started = time.monotonic()
+        self._interval_start = self._started
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record the duration of one pass through a stage."""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        """Add n to a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+            self._interval_counters[name] = self._interval_counters.get(name, 0) + n
+
+    def snapshot(self, reset: bool = True) -> dict:
+        """
+        Return the current counters and latency summaries.
+
+        Args:
+            reset (bool): Start a new interval for rates and histograms
+
+        Returns:
+            dict: JSON-serialisable stats, latencies in milliseconds
+        """
+        with self._lock:
+            now = time.monotonic()
+            interval = now - self._interval_start
+            snapshot = {
+                'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'uptime': round(now - self._started, 3),
+                'interval': round(interval, 3),
+                'counters': {
+                    name: {
+                        'total': total,
+                        'rate': (self._interval_counters.get(name, 0) / interval
+                                 if interval > 0 else 0.0),
+                    }
+                    for name, total in self._counters.items()
+                },
+                'latency_ms': {stage: histogram.summary()
+                               for stage, histogram in self._histograms.items()},
+            }
+            if reset:
+                self._interval_start = now
+                self._interval_counters = {}
+                for histogram in self._histograms.values():
+                    histogram.reset()
+        return snapshot
+
+
+class ProfileHook:
+    def __init__(self, trigger_path: str, seconds: float = 30, output_dir: str = '.'):
+        """
+        Profile the acquisition loop on demand with cProfile.
+
+        Creating trigger_path requests a profile; the next call to check()
+        on the acquisition thread starts cProfile there, and after `seconds`
+        the stats are dumped to a .prof file in output_dir for pstats or
+        snakeviz. cProfile only sees the thread that calls check().
+
+        Args:
+            trigger_path (str): File whose appearance starts a profile
+            seconds (float): Length of each profile
+            output_dir (str): Directory for the .prof files
+        """
+        self.trigger_path = trigger_path
+        self.seconds = seconds
+        self.output_dir = output_dir
+        self._requested = False
+        self._profile: Optional[cProfile.Profile] = None
+        self._until = 0.0
+
+    def poll(self) -> None:
+        """Check for the trigger file; called from a background thread."""
+        if os.path.exists(self.trigger_path):
+            try:
+                os.remove(self.trigger_path)
+            except OSError as e:
+                logger.error(f"Error removing profile trigger: {str(e)}")
+            self._requested = True
+
+    def check(self) -> None:
+        """Start or finish a requested profile; called from the acquisition loop."""
+        if self._requested:
+            self._requested = False
+            if self._profile is None:
+                self._start()
+        elif self._profile is not None and time.monotonic() >= self._until:
+            self.stop()
+
+    def stop(self) -> Optional[str]:
+        """Finish any running profile and return the path of its stats file."""
+        if self._profile is None:
+            return None
+        profile, self._profile = self._profile, None
+        profile.disable()
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+        path = os.path.join(self.output_dir, f"tsg_profile_{stamp}.prof")
+        try:
+            profile.dump_stats(path)
+        except OSError as e:
+            logger.error(f"Error writing profile: {str(e)}")
+            return None
+        logger.info(f"Wrote profile to {path}")
+        return path
+
+    def _start(self) -> None:
+        self._profile = cProfile.Profile()
+        self._until = time.monotonic() + self.seconds
+        try:
+            self._profile.enable()
+        except ValueError as e:
+            # Another profiler is already active on this thread
+            logger.error(f"Error starting profile: {str(e)}")
+            self._profile = None
+            return
+        logger.info(f"Profiling acquisition loop for {self.seconds} s")
+
+
+class StatsReporter:
+    def __init__(self, metrics: Metrics, path: str, interval: float = 60,
+                 sources: Optional[dict[str, Callable[[], dict]]] = None,
+                 profiler: Optional[ProfileHook] = None, poll_interval: float = 1.0):
+        """
+        Write Metrics snapshots to a JSON file from a background thread.
+
+        The file is replaced atomically every interval seconds, so readers
+        never see a partial write. The latest snapshot is also kept in
+        `latest` for the live server's /stats endpoint.
+
+        Args:
+            metrics (Metrics): Counters and histograms to report
+            path (str): JSON file to write
+            interval (float): Seconds between snapshots
+            sources (dict): Extra sections, name to a function returning a dict,
+                e.g. the sinks' stats methods
+            profiler (ProfileHook): Polled for its trigger file
+            poll_interval (float): Seconds between trigger file checks
+        """
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.sources = dict(sources or {})
+        self.profiler = profiler
+        self.poll_interval = poll_interval
+        self.latest: Optional[dict] = None
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='tsg-stats', daemon=True)
+        self._thread.start()
+        logger.info(f"Writing stats to {self.path} every {self.interval} s")
+
+    def stop(self) -> None:
+        """Stop the thread and write a final snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+    def write(self) -> dict:
+        """Take a snapshot, add the sources and write it to the stats file."""
+        snapshot = self.metrics.snapshot()
+        for name, source in self.sources.items():
+            try:
+                snapshot[name] = source()
+            except Exception as e:
+                logger.error(f"Error collecting {name} stats: {str(e)}")
+        self.latest = snapshot
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            data = json.dumps(snapshot, indent=2, default=str)
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Error writing stats file: {str(e)}")
+        return snapshot
+
+    def _run(self) -> None:
+        next_write = time.monotonic() + self.interval
+        while not self._stop.wait(self.poll_interval):
+            if self.profiler is not None:
+                self.profiler.poll()
+            if time.monotonic() >= next_write:
+                self.write()
+                next_write += self.interval
@@ -0,0 +1,355 @@
+import inspect
+import logging
+import os
+import pickle
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from tsgreader.metrics import Metrics, ProfileHook
+
+logger = logging.getLogger(__name__)
+
+BACKPRESSURE_MODES = ('block', 'drop_oldest', 'spill')
+
+# Metric names of sink stages, matching the serial loop in main.run_loop
+_STAGE_NAMES = {'database': 'db'}
+
+
+class BoundedQueue:
+    def __init__(self, name: str, maxsize: int = 1000, backpressure: str = 'block',
+                 spill_path: Optional[str] = None):
+        """
+        Thread-safe FIFO queue with a configurable policy for when it is full.
+
+        Backpressure modes:
+            block: put() waits until a consumer makes room
+            drop_oldest: the oldest queued item is discarded
+            spill: new items are pickled to spill_path and read back in order
+                   once the consumer catches up
+
+        Args:
+            name (str): Name used in logs and stats
+            maxsize (int): Number of items held in memory
+            backpressure (str): 'block', 'drop_oldest' or 'spill'
+            spill_path (str): File used for spilled items in 'spill' mode
+        """
+        if backpressure not in BACKPRESSURE_MODES:
+            raise ValueError(
+                f"Invalid backpressure mode: {backpressure}. Expected one of {BACKPRESSURE_MODES}"
+            )
+        if backpressure == 'spill' and not spill_path:
+            raise ValueError("spill_path is required for spill backpressure")
+
+        self.name = name
+        self.maxsize = maxsize
+        self.backpressure = backpressure
+        self.spill_path = spill_path
+
+        self._items: deque = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._spill_writer = None
+        self._spill_reader = None
+        self._spill_pending = 0
+
+        self.put_count = 0
+        self.high_water = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.blocked_seconds = 0.0
+
+    def put(self, item) -> None:
+        """Add an item, applying the backpressure policy if the queue is full."""
+        with self._cond:
+            self.put_count += 1
+            if self.backpressure == 'spill' and (self._spill_pending or self._full()):
+                self._spill(item)
+            else:
+                if self._full():
+                    if self.backpressure == 'drop_oldest':
+                        self._items.popleft()
+                        self.dropped += 1
+                    else:
+                        start = time.monotonic()
+                        while self._full() and not self._closed:
+                            self._cond.wait()
+                        self.blocked_seconds += time.monotonic() - start
+                self._items.append(item)
+                self.high_water = max(self.high_water, len(self._items))
+            self._cond.notify_all()
+
+    def get(self, timeout: Optional[float] = None):
+        """
+        Remove and return the oldest item.
+
+        Returns None once the queue has been closed and fully drained.
+
+        Raises:
+            queue.Empty: If no item arrives within timeout seconds
+        """
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._items and not self._spill_pending:
+                if self._closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._cond.wait(remaining)
+            if not self._items:
+                self._unspill()
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self) -> None:
+        """Mark the queue closed; consumers drain what is left and then get None."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def depth(self) -> int:
+        """Number of items waiting, including spilled items."""
+        with self._cond:
+            return len(self._items) + self._spill_pending
+
+    def stats(self) -> dict:
+        """Return queue depth and backpressure counters."""
+        with self._cond:
+            return {
+                'depth': len(self._items) + self._spill_pending,
+                'maxsize': self.maxsize,
+                'high_water': self.high_water,
+                'put': self.put_count,
+                'dropped': self.dropped,
+                'spilled': self.spilled,
+                'spill_pending': self._spill_pending,
+                'blocked_seconds': self.blocked_seconds,
+            }
+
+    def _full(self) -> bool:
+        return len(self._items) >= self.maxsize
+
+    def _spill(self, item) -> None:
+        if self._spill_writer is None:
+            self._spill_writer = open(self.spill_path, 'wb')
+            self._spill_reader = open(self.spill_path, 'rb')
+            logger.warning(f"Queue {self.name} is full, spilling to {self.spill_path}")
+        pickle.dump(item, self._spill_writer)
+        self._spill_writer.flush()
+        self._spill_pending += 1
+        self.spilled += 1
+
+    def _unspill(self) -> None:
+        """Move spilled items back into memory, oldest first."""
+        while self._spill_pending and not self._full():
+            self._items.append(pickle.load(self._spill_reader))
+            self._spill_pending -= 1
+        if not self._spill_pending:
+            # Everything has been read back, so start the spill file over
+            self._spill_writer.seek(0)
+            self._spill_writer.truncate()
+            self._spill_reader.seek(0)
+
+
+class Pipeline:
+    def __init__(self, reader, parse: Callable[[str], tuple], sinks: dict,
+                 queue_size: int = 1000, backpressure: str = 'block',
+                 spill_dir: Optional[str] = None,
+                 on_record: Optional[Callable[[tuple], None]] = None,
+                 stats_interval: float = 60, idle_flush: float = 1.0,
+                 metrics: Optional[Metrics] = None, profiler: Optional[ProfileHook] = None):
+        """
+        Threaded acquisition pipeline.
+
+        The reader thread only frames lines and stamps their arrival time.
+        A parser thread turns lines into records and fans them out to one
+        writer thread per sink. Every hand-off goes through a BoundedQueue so
+        a slow sink cannot stall serial reads.
+
+        Each line carries its time.perf_counter() arrival through the
+        queues. Sinks whose write() takes an arrival keyword (SQLiteSink)
+        are given it, so their end_to_end metric runs from serial arrival
+        to commit rather than from dequeue.
+
+        Args:
+            reader: SerialReader (or anything with read_lines() and close())
+            parse (callable): Function turning a line into a record, a NamedTuple
+                such as TSGRecord whose datetime_utc is set to the arrival time
+            sinks (dict): Sink name to sink object with write/flush/flush_due
+            queue_size (int): Capacity of each queue
+            backpressure (str): Queue policy, see BoundedQueue
+            spill_dir (str): Directory for spill files in 'spill' mode
+            on_record (callable): Called with each parsed record on the parser thread
+            stats_interval (float): Seconds between queue depth log messages
+            idle_flush (float): Seconds a writer waits before checking for a due flush
+            metrics (Metrics): Lines, records and errors are counted, and the
+                parse stage and each sink's writes timed ('csv', 'db', 'live', 'archive')
+            profiler (ProfileHook): Checked on the parser thread for each line and
+                every idle_flush seconds without one, so a requested profile covers parsing
+        """
+        self.reader = reader
+        self.parse = parse
+        self.sinks = sinks
+        self.on_record = on_record
+        self.stats_interval = stats_interval
+        self.idle_flush = idle_flush
+        self.metrics = metrics or Metrics()
+        self.profiler = profiler
+        self._takes_arrival = {name: 'arrival' in inspect.signature(sink.write).parameters
+                               for name, sink in sinks.items()}
+
+        if backpressure == 'spill' and spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+        def make_queue(name):
+            spill_path = os.path.join(spill_dir, f"{name}.spill") if spill_dir else None
+            return BoundedQueue(name, queue_size, backpressure, spill_path)
+
+        self.line_queue = make_queue('lines')
+        self.sink_queues = {name: make_queue(name) for name in sinks}
+
+        self.lines_read = 0
+        self.parse_errors = 0
+        self.write_errors = {name: 0 for name in sinks}
+
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the reader, parser and writer threads."""
+        self._threads = [
+            threading.Thread(target=self._read, name='tsg-reader', daemon=True),
+            threading.Thread(target=self._parse, name='tsg-parser', daemon=True),
+        ]
+        for name, sink in self.sinks.items():
+            self._threads.append(threading.Thread(
+                target=self._write, args=(name, sink, self.sink_queues[name]),
+                name=f'tsg-{name}', daemon=True,
+            ))
+        for thread in self._threads:
+            thread.start()
+
+    def run(self) -> None:
+        """Start the pipeline and log queue stats until the reader stops."""
+        self.start()
+        next_stats = time.monotonic() + self.stats_interval
+        while any(thread.is_alive() for thread in self._threads):
+            self._threads[-1].join(timeout=min(1.0, self.stats_interval))
+            if time.monotonic() >= next_stats:
+                self.log_stats()
+                next_stats += self.stats_interval
+        self.log_stats()
+
+    def stop(self, timeout: float = 10) -> None:
+        """Stop reading and wait for queued records to reach the sinks."""
+        self._stop.set()
+        self.reader.close()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        """Return per-queue counters along with read and error totals."""
+        return {
+            'lines_read': self.lines_read,
+            'parse_errors': self.parse_errors,
+            'write_errors': dict(self.write_errors),
+            'queues': {q.name: q.stats() for q in (self.line_queue, *self.sink_queues.values())},
+        }
+
+    def log_stats(self) -> None:
+        for q in (self.line_queue, *self.sink_queues.values()):
+            stats = q.stats()
+            message = (
+                f"Queue {q.name}: depth {stats['depth']}/{stats['maxsize']}, "
+                f"high water {stats['high_water']}, dropped {stats['dropped']}, "
+                f"spilled {stats['spilled']}"
+            )
+            if stats['high_water'] >= stats['maxsize'] or stats['dropped']:
+                logger.warning(message)
+            else:
+                logger.info(message)
+
+    def _read(self) -> None:
+        try:
+            for line in self.reader.read_lines():
+                self.line_queue.put((time.time(), time.perf_counter(), line))
+                self.lines_read += 1
+                self.metrics.incr('lines')
+                if self._stop.is_set():
+                    break
+        except Exception as e:
+            if not self._stop.is_set():
+                logger.error(f"Error reading serial port: {str(e)}")
+        finally:
+            self.line_queue.close()
+
+    def _parse(self) -> None:
+        while True:
+            try:
+                item = self.line_queue.get(timeout=self.idle_flush)
+            except queue.Empty:
+                # Let a requested profile start, or a running one finish, while idle
+                if self.profiler:
+                    self.profiler.check()
+                continue
+            if item is None:
+                break
+            if self.profiler:
+                self.profiler.check()
+            timestamp, arrival, line = item
+            start = time.perf_counter()
+            try:
+                record = self.parse(line)
+            except Exception as e:
+                self.parse_errors += 1
+                self.metrics.incr('parse_errors')
+                logger.error(f"Error parsing line: {line}. Error: {str(e)}")
+                continue
+            self.metrics.observe('parse', time.perf_counter() - start)
+            if not record:
+                continue
+            self.metrics.incr('records')
+
+            # Stamp with the arrival time rather than the time of parsing
+            record = record._replace(datetime_utc=int(timestamp))
+            if self.on_record:
+                self.on_record(record)
+            for sink_queue in self.sink_queues.values():
+                sink_queue.put((arrival, record))
+
+        if self.profiler:
+            # cProfile has to be stopped on the thread that started it
+            self.profiler.stop()
+        for sink_queue in self.sink_queues.values():
+            sink_queue.close()
+
+    def _write(self, name: str, sink, sink_queue: BoundedQueue) -> None:
+        while True:
+            try:
+                item = sink_queue.get(timeout=self.idle_flush)
+            except queue.Empty:
+                # Nothing arrived, but a partial batch may now be old enough to write
+                if sink.flush_due():
+                    self._call_sink(name, sink.flush)
+                continue
+            if item is None:
+                break
+            arrival, record = item
+            start = time.perf_counter()
+            if self._takes_arrival[name]:
+                self._call_sink(name, sink.write, record, arrival=arrival)
+            else:
+                self._call_sink(name, sink.write, record)
+            self.metrics.observe(_STAGE_NAMES.get(name, name), time.perf_counter() - start)
+
+    def _call_sink(self, name: str, method, *args, **kwargs) -> None:
+        try:
+            method(*args, **kwargs)
+        except Exception as e:
+            self.write_errors[name] += 1
+            self.metrics.incr(f"{_STAGE_NAMES.get(name, name)}_errors")
+            logger.error(f"Error writing to {name}: {str(e)}")
@@ -0,0 +1,317 @@
+import logging
+import math
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# QARTOD flag values
+QC_PASS = 1
+QC_NOT_EVALUATED = 2
+QC_SUSPECT = 3
+QC_FAIL = 4
+QC_MISSING = 9
+
+# Which flag wins when combining tests and fields: the worst result, and
+# any evaluated result over one that was not evaluated or missing
+_FLAG_RANK = {QC_MISSING: 0, QC_NOT_EVALUATED: 1, QC_PASS: 2, QC_SUSPECT: 3, QC_FAIL: 4}
+
+# Default tests per record field. Ranges are (low, high); values outside
+# fail_range fail and values outside suspect_range are suspect. Spike limits
+# apply to the distance from the median of the last `window` values.
+# Conductivity is in S/m, so a dropout to c1=0 fails its range test.
+DEFAULT_TESTS = {
+    'temp': {'fail_range': (-5.0, 40.0), 'suspect_range': (-2.0, 35.0),
+             'spike_suspect': 0.5, 'spike_fail': 2.0},
+    'hull_temp': {'fail_range': (-5.0, 40.0), 'suspect_range': (-2.0, 35.0),
+                  'spike_suspect': 0.5, 'spike_fail': 2.0},
+    'cond': {'fail_range': (0.01, 7.0), 'suspect_range': (2.0, 6.5),
+             'spike_suspect': 0.05, 'spike_fail': 0.5},
+    'salinity': {'fail_range': (0.0, 42.0), 'suspect_range': (20.0, 40.0),
+                 'spike_suspect': 0.2, 'spike_fail': 1.0},
+}
+
+FIELD_SETTINGS = ('fail_range', 'suspect_range', 'spike_suspect', 'spike_fail',
+                  'spike_sigma', 'stuck_tolerance')
+
+
+class RollingStats:
+    def __init__(self, window: int):
+        """
+        Mean and variance of the last `window` values, updated in O(1).
+
+        Uses Welford's update, extended to remove the value leaving the
+        window, so there is no sum of squares to lose precision in and
+        nothing is recomputed over the window.
+
+        Args:
+            window (int): Number of values kept
+        """
+        if window < 1:
+            raise ValueError(f"Invalid window: {window}. Expected at least 1")
+        self.window = window
+        self._values: deque = deque()
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def full(self) -> bool:
+        return len(self._values) == self.window
+
+    def add(self, value: float) -> None:
+        values = self._values
+        if len(values) < self.window:
+            values.append(value)
+            delta = value - self.mean
+            self.mean += delta / len(values)
+            self._m2 += delta * (value - self.mean)
+            return
+        # Replace the oldest value in one step
+        old = values.popleft()
+        values.append(value)
+        mean = self.mean
+        self.mean = mean + (value - old) / self.window
+        self._m2 += (value - old) * (value - self.mean + old - mean)
+        if self._m2 < 0.0:
+            # Rounding can leave a tiny negative sum for a constant series
+            self._m2 = 0.0
+
+    @property
+    def variance(self) -> float:
+        """Sample variance, 0 for fewer than two values."""
+        n = len(self._values)
+        return self._m2 / (n - 1) if n > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class RollingMedian:
+    def __init__(self, window: int):
+        """
+        Median of the last `window` values.
+
+        The window is kept sorted alongside a FIFO of arrival order, so each
+        update is one insort and one removal found by bisection, and reading
+        the median is O(1). For the short windows used by the spike test this
+        is a few small memmoves, far cheaper than re-sorting the window or
+        any structure with per-node overhead.
+
+        Args:
+            window (int): Number of values kept
+        """
+        if window < 1:
+            raise ValueError(f"Invalid window: {window}. Expected at least 1")
+        self.window = window
+        self._values: deque = deque()
+        self._sorted: list = []
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, value: float) -> None:
+        if len(self._values) == self.window:
+            old = self._values.popleft()
+            del self._sorted[bisect_left(self._sorted, old)]
+        self._values.append(value)
+        insort(self._sorted, value)
+
+    @property
+    def median(self) -> Optional[float]:
+        """Median of the window, None if it is empty."""
+        values = self._sorted
+        n = len(values)
+        if not n:
+            return None
+        middle = n // 2
+        if n % 2:
+            return values[middle]
+        return (values[middle - 1] + values[middle]) / 2
+
+
+class FieldQC:
+    def __init__(self, name: str, fail_range: Optional[tuple] = None,
+                 suspect_range: Optional[tuple] = None, spike_suspect: Optional[float] = None,
+                 spike_fail: Optional[float] = None, spike_sigma: Optional[float] = None,
+                 stuck_tolerance: Optional[float] = 0.0, window: int = 11,
+                 stuck_window: int = 60, min_samples: int = 5):
+        """
+        Range, spike and stuck-value tests on one record field.
+
+        Tests are skipped when their settings are None.
+            range: fail outside fail_range, suspect outside suspect_range
+            spike: distance from the rolling median of the previous `window`
+                values above spike_suspect or spike_fail, or above spike_sigma
+                times the rolling standard deviation of the stuck window
+            stuck: suspect once the last stuck_window values vary by no more
+                than stuck_tolerance (standard deviation)
+
+        Values that fail the range test, and missing values, are not added to
+        the windows, so a dropout does not drag the median or the variance.
+
+        Args:
+            name (str): Record field tested
+            fail_range (tuple): (low, high) outside which values fail
+            suspect_range (tuple): (low, high) outside which values are suspect
+            spike_suspect (float): Distance from the median that is suspect
+            spike_fail (float): Distance from the median that fails
+            spike_sigma (float): Distance in standard deviations that is suspect
+            stuck_tolerance (float): Standard deviation at or below which
+                a full stuck window is suspect
+            window (int): Values in the rolling median
+            stuck_window (int): Values in the rolling mean and variance
+            min_samples (int): Values needed before the spike test is evaluated
+        """
+        self.name = name
+        self.fail_range = fail_range
+        self.suspect_range = suspect_range
+        self.spike_suspect = spike_suspect
+        self.spike_fail = spike_fail
+        self.spike_sigma = spike_sigma
+        self.stuck_tolerance = stuck_tolerance
+        self.min_samples = min(min_samples, window)
+        self.median = RollingMedian(window)
+        self.stats = RollingStats(stuck_window)
+        self.counts = {'range': 0, 'spike': 0, 'stuck': 0}
+
+    def check(self, value) -> int:
+        """Run the tests on the next value and return its QARTOD flag."""
+        # NaN compares unequal to itself and is treated as missing
+        if value is None or value != value:
+            return QC_MISSING
+
+        flag = QC_PASS
+        if self.fail_range is not None:
+            low, high = self.fail_range
+            if value < low or value > high:
+                self.counts['range'] += 1
+                return QC_FAIL
+        if self.suspect_range is not None:
+            low, high = self.suspect_range
+            if value < low or value > high:
+                self.counts['range'] += 1
+                flag = QC_SUSPECT
+
+        median = self.median
+        if len(median) >= self.min_samples:
+            deviation = abs(value - median.median)
+            spike = QC_PASS
+            if self.spike_fail is not None and deviation > self.spike_fail:
+                spike = QC_FAIL
+            elif self.spike_suspect is not None and deviation > self.spike_suspect:
+                spike = QC_SUSPECT
+            elif (self.spike_sigma is not None and len(self.stats) > 1
+                  and deviation > self.spike_sigma * self.stats.std):
+                spike = QC_SUSPECT
+            if spike != QC_PASS:
+                self.counts['spike'] += 1
+                flag = max(flag, spike)
+
+        median.add(value)
+        stats = self.stats
+        stats.add(value)
+        if (self.stuck_tolerance is not None and stats.full()
+                and stats.std <= self.stuck_tolerance):
+            self.counts['stuck'] += 1
+            flag = max(flag, QC_SUSPECT)
+        return flag
+
+
+class StreamingQC:
+    def __init__(self, fields: Optional[dict] = None, window: int = 11,
+                 stuck_window: int = 60, min_samples: int = 5):
+        """
+        Real-time QC stage between the parser and the sinks.
+
+        Each record's fields are tested as it arrives (see FieldQC) and the
+        record is returned with qc_flag set to the worst QARTOD flag of its
+        fields: 1 pass, 3 suspect, 4 fail, or 9 if every tested field is
+        missing. The rolling windows make the cost per record constant, so
+        the stage keeps up with the serial port without buffering.
+
+        Args:
+            fields (dict): Field name to FieldQC settings (see FIELD_SETTINGS);
+                default DEFAULT_TESTS
+            window (int): Values in each rolling median
+            stuck_window (int): Values in each rolling mean and variance
+            min_samples (int): Values needed before spikes are tested
+        """
+        fields = DEFAULT_TESTS if fields is None else fields
+        self.fields = [
+            FieldQC(name, window=window, stuck_window=stuck_window,
+                    min_samples=min_samples, **settings)
+            for name, settings in fields.items()
+        ]
+        self.records = 0
+        self.flags = {QC_PASS: 0, QC_SUSPECT: 0, QC_FAIL: 0, QC_MISSING: 0}
+
+    @classmethod
+    def from_config(cls, qc_config: dict) -> 'StreamingQC':
+        """
+        Create a StreamingQC from the qc section of the config.
+
+        Settings under `fields` are merged over DEFAULT_TESTS, so a field
+        only needs the settings it changes; a field set to null is not tested.
+        """
+        fields = {name: dict(settings) for name, settings in DEFAULT_TESTS.items()}
+        for name, settings in (qc_config.get('fields') or {}).items():
+            if settings is None:
+                fields.pop(name, None)
+                continue
+            unknown = set(settings) - set(FIELD_SETTINGS)
+            if unknown:
+                raise ValueError(
+                    f"Invalid QC settings for {name}: {sorted(unknown)}. "
+                    f"Expected some of {FIELD_SETTINGS}"
+                )
+            fields.setdefault(name, {}).update(settings)
+        for settings in fields.values():
+            for key in ('fail_range', 'suspect_range'):
+                if settings.get(key) is not None:
+                    settings[key] = tuple(settings[key])
+        return cls(fields, window=qc_config.get('window', 11),
+                   stuck_window=qc_config.get('stuck_window', 60),
+                   min_samples=qc_config.get('min_samples', 5))
+
+    def flag(self, record) -> int:
+        """Test a record's fields and return its combined QARTOD flag."""
+        flag = QC_MISSING
+        rank = 0
+        get = record.get
+        for field in self.fields:
+            result = field.check(get(field.name))
+            if _FLAG_RANK[result] > rank:
+                flag = result
+                rank = _FLAG_RANK[result]
+        self.records += 1
+        self.flags[flag] = self.flags.get(flag, 0) + 1
+        return flag
+
+    def process(self, record):
+        """Return the record with qc_flag set; TSGRecords are replaced, dicts updated."""
+        flag = self.flag(record)
+        if isinstance(record, dict):
+            record['qc_flag'] = flag
+            return record
+        return record._replace(qc_flag=flag)
+
+    def wrap(self, parse: Callable) -> Callable:
+        """Return a parse function that also applies QC to each record it returns."""
+        process = self.process
+
+        def parse_with_qc(line):
+            record = parse(line)
+            return process(record) if record else record
+        return parse_with_qc
+
+    def stats(self) -> dict:
+        """Return records checked, counts per flag, and failed tests per field."""
+        return {
+            'records': self.records,
+            'flags': {str(flag): count for flag, count in self.flags.items()},
+            'tests': {field.name: dict(field.counts) for field in self.fields},
+        }
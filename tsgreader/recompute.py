@@ -0,0 +1,126 @@
+import argparse
+import logging
+import sqlite3
+import time
+from typing import Optional
+
+import numpy as np
+
+from tsgreader.config import database_target
+from tsgreader.reprocess import (CALIBRATED_FIELDS, apply_calibration, check_calibration,
+                                 parse_calibration)
+from tsgreader.rollup import rebuild_rollups, rollups_exist
+
+logger = logging.getLogger(__name__)
+
+
+def recompute_salinity(db_path: str, table_name: str, pressure: float = 0,
+                       chunk_size: int = 10000, calibration: Optional[dict] = None) -> int:
+    """
+    Recalculate the salinity column of a TSG table from cond and temp.
+
+    With calibration, the stored cond, temp and hull_temp values are first
+    corrected with new linear coefficients (see reprocess.apply_calibration)
+    and written back along with salinity. The coefficients apply to the
+    values as stored, so running twice applies them twice; to calibrate
+    from the raw readings, reprocess the capture files with tsg-reprocess.
+
+    Rows are processed in rowid order, chunk_size at a time, and each chunk
+    is committed on its own so an interrupted run leaves every row either
+    old or fully updated. Rows with negative or missing cond or temp get a
+    NULL salinity. Rollup tables, if the table has them, are rebuilt
+    afterwards.
+
+    Args:
+        db_path (str): Path to the SQLite database
+        table_name (str): TSG table to update
+        pressure (float): Pressure in dbar used for every sample
+        chunk_size (int): Number of rows read and updated per transaction
+        calibration (dict): Field in CALIBRATED_FIELDS to (slope, offset)
+
+    Returns:
+        int: Number of rows updated
+    """
+    calibration = calibration or {}
+    check_calibration(calibration)
+    # cond and temp are always read for salinity; other fields only if calibrated
+    fields = ['cond', 'temp'] + [name for name in CALIBRATED_FIELDS
+                                 if name in calibration and name not in ('cond', 'temp')]
+    updated_fields = [name for name in CALIBRATED_FIELDS if name in calibration] + ['salinity']
+
+    conn = sqlite3.connect(db_path)
+    select_sql = (f'SELECT rowid, {", ".join(fields)} FROM {table_name} '
+                  f'WHERE rowid > ? ORDER BY rowid LIMIT ?')
+    update_sql = (f'UPDATE {table_name} SET {", ".join(f"{name} = ?" for name in updated_fields)} '
+                  f'WHERE rowid = ?')
+
+    updated = 0
+    last_rowid = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            rows = conn.execute(select_sql, (last_rowid, chunk_size)).fetchall()
+            if not rows:
+                break
+            rowids = [row[0] for row in rows]
+            columns = {name: np.array([row[i] for row in rows], dtype=np.float64)
+                       for i, name in enumerate(fields, 1)}
+
+            apply_calibration(columns, calibration, pressure)
+            values = [[None if np.isnan(v) else float(v) for v in columns[name]]
+                      for name in updated_fields]
+            with conn:
+                conn.executemany(update_sql, zip(*values, rowids))
+
+            updated += len(rows)
+            last_rowid = rowids[-1]
+            logger.info(f"Updated {updated} rows")
+
+        if rollups_exist(conn, table_name):
+            with conn:
+                rebuild_rollups(conn, table_name)
+            logger.info(f"Rebuilt rollups for {table_name}")
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    rate = updated / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Recomputed {', '.join(updated_fields)} for {updated} rows "
+                f"in {elapsed:.1f}s ({rate:.0f} rows/s)")
+    return updated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Recompute salinity for every row of a TSG SQLite table, optionally "
+                    "applying new calibration coefficients to the stored values first"
+    )
+    parser.add_argument('--config', default='config.yaml',
+                        help="config file supplying the default database and table")
+    parser.add_argument('--db', help="SQLite database (default from config)")
+    parser.add_argument('--table', help="table name (default from config)")
+    parser.add_argument('--pressure', type=float, default=0, help="pressure in dbar")
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help="rows per transaction")
+    parser.add_argument('--cal', action='append', default=[], metavar='FIELD=SLOPE,OFFSET',
+                        help=f"linear calibration of one of {', '.join(CALIBRATED_FIELDS)}, "
+                             f"applied to the stored values and saved; repeat for several "
+                             f"fields. Applied again on every run")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    try:
+        calibration = parse_calibration(args.cal)
+    except ValueError as e:
+        parser.error(str(e))
+
+    db_path, table_name = database_target(args.db, args.table, args.config)
+    if db_path is None or table_name is None:
+        parser.error("--db and --table are required without a config file")
+
+    recompute_salinity(db_path, table_name, args.pressure, args.chunk_size, calibration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, NamedTuple, Optional
+
+import numpy as np
+
+from tsgreader.config import database_target
+from tsgreader.importer import insert_new_sql, records_to_rows
+from tsgreader.rollup import rebuild_rollups
+from tsgreader.schema import ensure_schema
+from tsgreader.tsgparser import TSG_DTYPE, conductivity_to_salinity_array, iter_tsg_file
+
+logger = logging.getLogger(__name__)
+
+# Fields a calibration may adjust; salinity is recomputed from cond and temp afterwards
+CALIBRATED_FIELDS = ('cond', 'temp', 'hull_temp')
+
+
+class Task(NamedTuple):
+    """Lines of one file starting in the byte range [start, end)."""
+    path: str
+    start: int
+    end: int
+
+
+class TaskResult(NamedTuple):
+    """Parsed records of a Task, sorted by datetime_utc, with its line counts."""
+    task: Task
+    records: np.ndarray
+    lines: int
+    rejects: int
+
+
+def plan_tasks(paths: Iterable[str], chunk_bytes: int = 64 << 20) -> list[Task]:
+    """
+    Split files into tasks of about chunk_bytes each.
+
+    Small files are one task. Larger ones are cut at fixed offsets;
+    iter_tsg_file moves each cut to the next line boundary, so every line
+    is parsed by exactly one task.
+    """
+    tasks = []
+    for path in paths:
+        size = os.path.getsize(path)
+        for start in range(0, max(size, 1), chunk_bytes):
+            tasks.append(Task(path, start, min(start + chunk_bytes, size)))
+    return tasks
+
+
+def check_calibration(calibration: dict) -> None:
+    """Raise ValueError if a calibration names a field that cannot be calibrated."""
+    unknown = set(calibration) - set(CALIBRATED_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot calibrate {sorted(unknown)}. Expected some of {CALIBRATED_FIELDS}")
+
+
+def apply_calibration(records: np.ndarray, calibration: dict, pressure: float = 0) -> None:
+    """
+    Apply linear calibrations in place and recompute salinity.
+
+    Args:
+        records (np.ndarray): TSG_DTYPE records, or a dict of column arrays
+            holding cond, temp and the calibrated fields
+        calibration (dict): Field in CALIBRATED_FIELDS to (slope, offset),
+            giving field * slope + offset
+        pressure (float): Pressure in dbar used for salinity
+    """
+    for field, (slope, offset) in calibration.items():
+        records[field] = records[field] * slope + offset
+    records['salinity'] = conductivity_to_salinity_array(records['cond'], records['temp'],
+                                                         pressure)
+
+
+def process_task(task: Task, fmt: str = 'auto', calibration: Optional[dict] = None,
+                 pressure: float = 0, chunk_size: int = 1 << 20,
+                 recompute_salinity: bool = False) -> TaskResult:
+    """
+    Parse and calibrate one task in a worker process.
+
+    Salinity is recomputed only when a calibration is given or
+    recompute_salinity is set; otherwise the salinity the instrument
+    reported is kept.
+
+    The records go back to the parent as one structured array, which
+    pickles as a single buffer rather than an object per value.
+    """
+    parts = []
+    lines = rejects = 0
+    for chunk in iter_tsg_file(task.path, fmt, chunk_size, start=task.start, end=task.end):
+        parts.append(chunk.records)
+        lines += chunk.lines
+        rejects += len(chunk.rejects)
+    records = np.concatenate(parts) if parts else np.empty(0, dtype=TSG_DTYPE)
+    if calibration or recompute_salinity:
+        apply_calibration(records, calibration or {}, pressure)
+    records = records[np.argsort(records['datetime_utc'], kind='stable')]
+    return TaskResult(task, records, lines, rejects)
+
+
+class DatabaseOutput:
+    def __init__(self, db_path: str, table_name: str):
+        """
+        Write reprocessed records to a TSG table.
+
+        Rows whose nmea_time is already in the table are skipped, as in
+        tsg-import, so overlapping capture files add each sample once.
+        Write to a new database or table rather than the one being
+        reprocessed. Rollups are rebuilt for each written time range.
+        """
+        self.table_name = table_name
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        ensure_schema(self.conn, table_name)
+        self.sql = insert_new_sql(table_name)
+        self.inserted = 0
+        self.duplicates = 0
+
+    def append(self, records: np.ndarray) -> None:
+        if not len(records):
+            return
+        rows = records_to_rows(records)
+        times = records['datetime_utc']
+        before = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany(self.sql, rows)
+            inserted = self.conn.total_changes - before
+            if inserted:
+                rebuild_rollups(self.conn, self.table_name, int(times.min()), int(times.max()))
+        self.inserted += inserted
+        self.duplicates += len(rows) - inserted
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class ArchiveOutput:
+    def __init__(self, root: str):
+        """Write reprocessed records to a columnar archive (see tsgreader.archive)."""
+        from tsgreader.archive import ArchiveSink
+
+        self.sink = ArchiveSink(root)
+
+    def append(self, records: np.ndarray) -> None:
+        self.sink.append(records)
+
+    def close(self) -> None:
+        self.sink.close()
+
+
+class _TimeOrderMerger:
+    def __init__(self, output, batch_rows: int):
+        """
+        Merge sorted task results and write them in time order.
+
+        Results are added in task order. Files are expected in time order
+        (e.g. daily capture files sorted by name), so rows older than the
+        first record of the newest result are final and written, and only
+        the overlap between neighbouring tasks is held back and merged.
+        A task that starts earlier than rows already written is still
+        written, and counted in out_of_order.
+        """
+        self.output = output
+        self.batch_rows = batch_rows
+        self._held = np.empty(0, dtype=TSG_DTYPE)
+        self._written_until: Optional[int] = None
+        self.out_of_order = 0
+
+    def add(self, records: np.ndarray) -> None:
+        if not len(records):
+            return
+        times = records['datetime_utc']
+        first = int(times[0])
+        if self._written_until is not None and first < self._written_until:
+            late = int(np.searchsorted(times, self._written_until, 'left'))
+            self.out_of_order += late
+            logger.warning(f"{late} records are earlier than records already written")
+        held = np.concatenate([self._held, records])
+        held = held[np.argsort(held['datetime_utc'], kind='stable')]
+        cut = int(np.searchsorted(held['datetime_utc'], first, 'left'))
+        self._write(held[:cut])
+        self._held = held[cut:]
+
+    def _write(self, records: np.ndarray) -> None:
+        for start in range(0, len(records), self.batch_rows):
+            self.output.append(records[start:start + self.batch_rows])
+        if len(records):
+            self._written_until = int(records['datetime_utc'][-1])
+
+    def close(self) -> None:
+        self._write(self._held)
+        self._held = np.empty(0, dtype=TSG_DTYPE)
+
+
+def reprocess_files(paths: Iterable[str], output, fmt: str = 'auto',
+                    calibration: Optional[dict] = None, pressure: float = 0,
+                    workers: Optional[int] = None, chunk_bytes: int = 64 << 20,
+                    batch_rows: int = 100_000,
+                    progress: Optional[Callable[[dict], None]] = None,
+                    recompute_salinity: bool = False) -> dict:
+    """
+    Re-parse raw capture files with new calibrations on a process pool.
+
+    Files, and byte ranges of files larger than chunk_bytes, are parsed,
+    calibrated and sorted by worker processes. The parent merges their
+    columnar results in time order and appends them to output, a
+    DatabaseOutput or ArchiveOutput, batch_rows at a time. Results are
+    consumed in task order while later tasks are already running, so
+    workers stay busy while the parent writes.
+
+    Args:
+        paths (Iterable[str]): Raw capture files, in time order
+        output: DatabaseOutput or ArchiveOutput (anything with append(records))
+        fmt (str): 'keyvalue', 'fixed' or 'auto'
+        calibration (dict): Field to (slope, offset), see apply_calibration
+        pressure (float): Pressure in dbar used for salinity
+        workers (int): Worker processes, default the number of CPUs
+        chunk_bytes (int): Largest byte range parsed by one task
+        batch_rows (int): Records per output append
+        progress (callable): Called with the stats dict after each task
+        recompute_salinity (bool): Recompute salinity from cond and temp even
+            without a calibration; with neither, the instrument's salinity is kept
+
+    Returns:
+        dict: Files, tasks, bytes, lines, records, rejects, seconds and records/sec
+    """
+    calibration = calibration or {}
+    check_calibration(calibration)
+    paths = list(paths)
+    tasks = plan_tasks(paths, chunk_bytes)
+    total_bytes = sum(task.end - task.start for task in tasks)
+    workers = workers or os.cpu_count() or 1
+
+    stats = {'files': len(paths), 'tasks': len(tasks), 'tasks_done': 0,
+             'bytes': total_bytes, 'bytes_done': 0, 'lines': 0, 'records': 0, 'rejects': 0}
+    merger = _TimeOrderMerger(output, batch_rows)
+    start = time.perf_counter()
+    logger.info(f"Reprocessing {len(paths)} files ({total_bytes / 1e6:.1f} MB) "
+                f"as {len(tasks)} tasks on {workers} processes")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_task, task, fmt, calibration, pressure,
+                               recompute_salinity=recompute_salinity) for task in tasks]
+        try:
+            for future in futures:
+                result = future.result()
+                merger.add(result.records)
+                stats['tasks_done'] += 1
+                stats['bytes_done'] += result.task.end - result.task.start
+                stats['lines'] += result.lines
+                stats['records'] += len(result.records)
+                stats['rejects'] += result.rejects
+                elapsed = time.perf_counter() - start
+                fraction = stats['bytes_done'] / total_bytes if total_bytes else 1.0
+                eta = elapsed / fraction - elapsed if fraction else 0.0
+                logger.info(
+                    f"{stats['tasks_done']}/{len(tasks)} tasks, {fraction:.0%} of bytes, "
+                    f"{stats['records'] / elapsed:.0f} records/s, ETA {eta:.0f}s"
+                )
+                if progress:
+                    progress(dict(stats))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            merger.close()
+
+    elapsed = time.perf_counter() - start
+    stats['out_of_order'] = merger.out_of_order
+    stats['seconds'] = elapsed
+    stats['records_per_sec'] = stats['records'] / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"Reprocessed {stats['records']} records from {len(paths)} files in {elapsed:.1f}s "
+        f"({stats['records_per_sec']:.0f} records/s), {stats['rejects']} lines rejected"
+    )
+    return stats
+
+
+def parse_calibration(values: list[str]) -> dict:
+    """Parse FIELD=SLOPE,OFFSET arguments into a calibration dict."""
+    calibration = {}
+    for value in values:
+        field, sep, coefficients = value.partition('=')
+        try:
+            slope, offset = (float(x) for x in coefficients.split(','))
+        except ValueError:
+            raise ValueError(f"Invalid calibration: {value}. Expected FIELD=SLOPE,OFFSET") from None
+        if not sep or field not in CALIBRATED_FIELDS:
+            raise ValueError(f"Invalid calibration field in {value}. "
+                             f"Expected one of {CALIBRATED_FIELDS}")
+        calibration[field] = (slope, offset)
+    return calibration
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Reprocess raw TSG capture files in parallel into SQLite or an archive"
+    )
+    parser.add_argument('files', nargs='+', help="raw capture files, in time order")
+    parser.add_argument('--config', default='config.yaml',
+                        help="config file supplying the default database and table")
+    parser.add_argument('--db', help="output SQLite database (default from config)")
+    parser.add_argument('--table', help="output table name (default from config)")
+    parser.add_argument('--archive', help="write a columnar archive to this directory instead")
+    parser.add_argument('--format', choices=('auto', 'keyvalue', 'fixed'), default='auto',
+                        help="line format")
+    parser.add_argument('--cal', action='append', default=[], metavar='FIELD=SLOPE,OFFSET',
+                        help=f"linear calibration of one of {', '.join(CALIBRATED_FIELDS)}; "
+                             f"repeat for several fields")
+    parser.add_argument('--pressure', type=float, default=0,
+                        help="pressure in dbar, used when salinity is recomputed")
+    parser.add_argument('--recompute-salinity', action='store_true',
+                        help="recompute salinity from cond and temp without a calibration "
+                             "(by default it is only recomputed with --cal)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-mb', type=float, default=64,
+                        help="largest piece of a file handled by one worker")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    try:
+        calibration = parse_calibration(args.cal)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.archive:
+        output = ArchiveOutput(args.archive)
+    else:
+        db_path, table_name = database_target(args.db, args.table, args.config)
+        if db_path is None or table_name is None:
+            parser.error("--db and --table (or --archive) are required without a config file")
+        output = DatabaseOutput(db_path, table_name)
+    try:
+        reprocess_files(args.files, output, args.format, calibration, args.pressure,
+                        args.workers, int(args.chunk_mb * (1 << 20)),
+                        recompute_salinity=args.recompute_salinity)
+    finally:
+        output.close()
+
+
+if __name__ == "__main__":
+    main()
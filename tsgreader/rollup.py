@@ -0,0 +1,233 @@
+import math
+import sqlite3
+from typing import Iterable, Optional
+
+# Rollup name and bin width in seconds, finest first
+ROLLUPS = {'1min': 60, '10min': 600}
+
+# Measurements summarised in each bin
+ROLLUP_FIELDS = ('temp', 'hull_temp', 'cond', 'salinity')
+
+_STAT_COLUMNS = [f'{field}_{stat}' for field in ROLLUP_FIELDS
+                 for stat in ('n', 'sum', 'min', 'max')]
+_ROLLUP_COLUMNS = ['bin', 'n'] + _STAT_COLUMNS + ['position_time', 'latitude', 'longitude']
+
+# Bounds of SQLite integers, for rebuilding the whole table
+_MIN_TIME = -2**63
+_MAX_TIME = 2**63 - 1
+
+
+def rollup_table(table_name: str, rollup: str) -> str:
+    """Return the name of a rollup table, e.g. tsg_1min."""
+    return f'{table_name}_{rollup}'
+
+
+def create_rollup_tables(conn: sqlite3.Connection, table_name: str) -> None:
+    """Create the rollup tables for a TSG table and fill them from its existing rows."""
+    stats = ',\n'.join(
+        f'{field}_n INTEGER NOT NULL, {field}_sum REAL NOT NULL, '
+        f'{field}_min REAL, {field}_max REAL'
+        for field in ROLLUP_FIELDS
+    )
+    for rollup in ROLLUPS:
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {rollup_table(table_name, rollup)} (
+                bin INTEGER PRIMARY KEY,
+                n INTEGER NOT NULL,
+                {stats},
+                position_time INTEGER,
+                latitude REAL,
+                longitude REAL
+            ) STRICT
+        ''')
+    rebuild_rollups(conn, table_name)
+
+
+def rollups_exist(conn: sqlite3.Connection, table_name: str) -> bool:
+    """Return True if every rollup table of a TSG table exists."""
+    names = [rollup_table(table_name, rollup) for rollup in ROLLUPS]
+    found = conn.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' "
+        f"AND name IN ({', '.join('?' for _ in names)})", names
+    ).fetchone()[0]
+    return found == len(names)
+
+
+def rebuild_rollups(conn: sqlite3.Connection, table_name: str,
+                    start: Optional[int] = None, end: Optional[int] = None) -> None:
+    """
+    Recompute rollup bins from the raw table.
+
+    Used after bulk changes that bypass SQLiteSink, such as imports and
+    salinity recomputation. Every bin overlapping [start, end] is replaced.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection
+        table_name (str): TSG table the rollups summarise
+        start (int): First datetime_utc to rebuild, or None for the beginning
+        end (int): Last datetime_utc to rebuild, or None for the end
+    """
+    stats = ', '.join(
+        f'count({field}), total({field}), min({field}), max({field})' for field in ROLLUP_FIELDS
+    )
+    for rollup, seconds in ROLLUPS.items():
+        table = rollup_table(table_name, rollup)
+        first = (start // seconds) * seconds if start is not None else _MIN_TIME
+        last = (end // seconds) * seconds + seconds if end is not None else _MAX_TIME
+
+        conn.execute(f'DELETE FROM {table} WHERE bin >= ? AND bin < ?', (first, last))
+        conn.execute(f'''
+            INSERT INTO {table} ({', '.join(_ROLLUP_COLUMNS[:-3])})
+            SELECT (datetime_utc / {seconds}) * {seconds} AS bin, count(*), {stats}
+            FROM {table_name} WHERE datetime_utc >= ? AND datetime_utc < ?
+            GROUP BY bin
+        ''', (first, last))
+        # Last known position in each bin
+        conn.execute(f'''
+            UPDATE {table} SET (position_time, latitude, longitude) = (
+                SELECT datetime_utc, latitude, longitude FROM {table_name}
+                WHERE datetime_utc >= {table}.bin AND datetime_utc < {table}.bin + {seconds}
+                AND latitude IS NOT NULL AND longitude IS NOT NULL
+                ORDER BY datetime_utc DESC LIMIT 1
+            )
+            WHERE bin >= ? AND bin < ?
+        ''', (first, last))
+
+
+def _upsert_sql(table: str) -> str:
+    """Build the statement that merges a partial bin into a rollup table."""
+    updates = ['n = n + excluded.n']
+    for field in ROLLUP_FIELDS:
+        updates += [
+            f'{field}_n = {field}_n + excluded.{field}_n',
+            f'{field}_sum = {field}_sum + excluded.{field}_sum',
+            f'{field}_min = CASE WHEN {field}_min IS NULL OR excluded.{field}_min < {field}_min '
+            f'THEN excluded.{field}_min ELSE {field}_min END',
+            f'{field}_max = CASE WHEN {field}_max IS NULL OR excluded.{field}_max > {field}_max '
+            f'THEN excluded.{field}_max ELSE {field}_max END',
+        ]
+    newer = 'position_time IS NULL OR excluded.position_time >= position_time'
+    for column in ('latitude', 'longitude', 'position_time'):
+        updates.append(f'{column} = CASE WHEN {newer} THEN excluded.{column} ELSE {column} END')
+    return (f"INSERT INTO {table} ({', '.join(_ROLLUP_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in _ROLLUP_COLUMNS)}) "
+            f"ON CONFLICT(bin) DO UPDATE SET {', '.join(updates)}")
+
+
+def _summarise(records: Iterable[dict], seconds: int) -> list[tuple]:
+    """Aggregate records into partial bins in _ROLLUP_COLUMNS order."""
+    bins = {}
+    for record in records:
+        timestamp = record['datetime_utc']
+        if timestamp is None:
+            continue
+        key = (timestamp // seconds) * seconds
+        summary = bins.get(key)
+        if summary is None:
+            summary = bins[key] = [key, 0] + [0, 0.0, None, None] * len(ROLLUP_FIELDS) + [None] * 3
+        summary[1] += 1
+        for i, field in enumerate(ROLLUP_FIELDS):
+            value = record[field]
+            # NaN marks a missing value, as in the raw table
+            if value is None or math.isnan(value):
+                continue
+            j = 2 + 4 * i
+            summary[j] += 1
+            summary[j + 1] += value
+            if summary[j + 2] is None or value < summary[j + 2]:
+                summary[j + 2] = value
+            if summary[j + 3] is None or value > summary[j + 3]:
+                summary[j + 3] = value
+        latitude, longitude = record['latitude'], record['longitude']
+        if (latitude is not None and longitude is not None
+                and (summary[-3] is None or timestamp >= summary[-3])):
+            summary[-3:] = [timestamp, latitude, longitude]
+    return [tuple(summary) for summary in bins.values()]
+
+
+def update_rollups(conn: sqlite3.Connection, table_name: str, records: Iterable[dict]) -> None:
+    """
+    Add newly written records to every rollup table.
+
+    Records are summarised per bin in memory and merged with one upsert per
+    bin, so the cost depends on the batch, not on the size of the table.
+    Call it in the same transaction as the raw insert.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection
+        table_name (str): TSG table the records were written to
+        records (Iterable[dict]): Records keyed by column name
+    """
+    records = list(records)
+    for rollup, seconds in ROLLUPS.items():
+        table = rollup_table(table_name, rollup)
+        conn.executemany(_upsert_sql(table), _summarise(records, seconds))
+
+
+def choose_resolution(start: int, end: int, max_points: int, raw_count: int) -> tuple[str, int]:
+    """
+    Pick the finest resolution whose point count fits the budget.
+
+    Returns:
+        tuple: ('raw', 1) or a (rollup name, bin width) from ROLLUPS, the
+            coarsest rollup if nothing fits
+    """
+    if raw_count <= max_points:
+        return 'raw', 1
+    span = end - start + 1
+    for rollup, seconds in ROLLUPS.items():
+        if math.ceil(span / seconds) <= max_points:
+            return rollup, seconds
+    rollup = list(ROLLUPS)[-1]
+    return rollup, ROLLUPS[rollup]
+
+
+def query_series(conn: sqlite3.Connection, table_name: str, start: int, end: int,
+                 max_points: int = 1000) -> dict:
+    """
+    Read a time range at the finest resolution that fits max_points.
+
+    Raw rows are used when there are few enough of them, otherwise the
+    1-minute or 10-minute rollup. Each point has time, count and
+    {field}_mean, {field}_min and {field}_max for every ROLLUP_FIELDS entry,
+    plus the last latitude and longitude. For raw rows count is 1 and mean,
+    min and max are the sample itself.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection
+        table_name (str): TSG table to read
+        start (int): First datetime_utc, inclusive
+        end (int): Last datetime_utc, inclusive
+        max_points (int): Maximum number of points wanted
+
+    Returns:
+        dict: 'resolution' ('raw', '1min' or '10min'), 'bin_seconds' and
+            'points', a list of dicts in time order
+    """
+    raw_count = conn.execute(
+        f'SELECT COUNT(*) FROM {table_name} WHERE datetime_utc BETWEEN ? AND ?', (start, end)
+    ).fetchone()[0]
+    resolution, seconds = choose_resolution(start, end, max_points, raw_count)
+
+    if resolution == 'raw':
+        columns = ', '.join(f'{field}, {field}, {field}' for field in ROLLUP_FIELDS)
+        rows = conn.execute(
+            f'SELECT datetime_utc, 1, {columns}, latitude, longitude FROM {table_name} '
+            f'WHERE datetime_utc BETWEEN ? AND ? ORDER BY datetime_utc', (start, end)
+        )
+    else:
+        columns = ', '.join(
+            f'{field}_sum / NULLIF({field}_n, 0), {field}_min, {field}_max'
+            for field in ROLLUP_FIELDS
+        )
+        rows = conn.execute(
+            f'SELECT bin, n, {columns}, latitude, longitude '
+            f'FROM {rollup_table(table_name, resolution)} '
+            f'WHERE bin BETWEEN ? AND ? ORDER BY bin',
+            ((start // seconds) * seconds, end)
+        )
+
+    names = ['time', 'count'] + [f'{field}_{stat}' for field in ROLLUP_FIELDS
+                                 for stat in ('mean', 'min', 'max')] + ['latitude', 'longitude']
+    points = [dict(zip(names, row)) for row in rows]
+    return {'resolution': resolution, 'bin_seconds': seconds, 'points': points}
@@ -0,0 +1,192 @@
+import logging
+import sqlite3
+from typing import Optional
+
+from tsgreader.rollup import create_rollup_tables
+
+logger = logging.getLogger(__name__)
+
+# Per-table schema versions live here so several tables can share one database
+VERSION_TABLE = 'tsg_schema_version'
+
+
+def _create_table(conn: sqlite3.Connection, table_name: str) -> None:
+    """Version 1: STRICT table with integer epoch times, taking over any existing rows."""
+    legacy = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone()
+    if legacy:
+        conn.execute(f'ALTER TABLE {table_name} RENAME TO {table_name}_legacy')
+
+    conn.execute(f'''
+        CREATE TABLE {table_name} (
+            id INTEGER PRIMARY KEY,
+            datetime_utc INTEGER,
+            scan_no INTEGER,
+            cond REAL,
+            temp REAL,
+            salinity REAL,
+            hull_temp REAL,
+            time_elapsed REAL,
+            nmea_time INTEGER,
+            latitude REAL,
+            longitude REAL
+        ) STRICT
+    ''')
+
+    if legacy:
+        _copy_legacy_rows(conn, table_name)
+
+
+def _copy_legacy_rows(conn: sqlite3.Connection, table_name: str) -> None:
+    """Copy rows from a table created before tsgreader managed the schema."""
+    legacy = f'{table_name}_legacy'
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({legacy})')}
+
+    def column(name, expression):
+        return expression if name in columns else 'NULL'
+
+    # Older rows hold nmea_time as text written by sqlite3's datetime adapter
+    nmea_time = column('nmea_time', '''
+        CASE typeof(nmea_time)
+            WHEN 'text' THEN CAST(strftime('%s', nmea_time) AS INTEGER)
+            ELSE CAST(nmea_time AS INTEGER)
+        END''')
+    copied = conn.execute(f'''
+        INSERT INTO {table_name}
+        (datetime_utc, scan_no, cond, temp, salinity, hull_temp, time_elapsed,
+         nmea_time, latitude, longitude)
+        SELECT
+            {column('datetime_utc', 'CAST(datetime_utc AS INTEGER)')},
+            {column('scan_no', 'CAST(scan_no AS INTEGER)')},
+            {column('cond', 'CAST(cond AS REAL)')},
+            {column('temp', 'CAST(temp AS REAL)')},
+            {column('salinity', 'CAST(salinity AS REAL)')},
+            {column('hull_temp', 'CAST(hull_temp AS REAL)')},
+            {column('time_elapsed', 'CAST(time_elapsed AS REAL)')},
+            {nmea_time},
+            {column('latitude', 'CAST(latitude AS REAL)')},
+            {column('longitude', 'CAST(longitude AS REAL)')}
+        FROM {legacy}
+        ORDER BY rowid
+    ''').rowcount
+    conn.execute(f'DROP TABLE {legacy}')
+    logger.info(f"Migrated {copied} rows into table {table_name}")
+
+
+def _create_indexes(conn: sqlite3.Connection, table_name: str) -> None:
+    """Version 2: indexes for time-range queries and duplicate checks."""
+    conn.execute(
+        f'CREATE INDEX IF NOT EXISTS {table_name}_datetime_utc ON {table_name} (datetime_utc)'
+    )
+    conn.execute(
+        f'CREATE INDEX IF NOT EXISTS {table_name}_nmea_time ON {table_name} (nmea_time)'
+    )
+
+
+def _create_rollups(conn: sqlite3.Connection, table_name: str) -> None:
+    """Version 3: 1-minute and 10-minute rollup tables, filled from existing rows."""
+    create_rollup_tables(conn, table_name)
+
+
+def _add_qc_flag(conn: sqlite3.Connection, table_name: str) -> None:
+    """Version 4: QARTOD flag set by the real-time QC stage, NULL where QC did not run."""
+    conn.execute(f'ALTER TABLE {table_name} ADD COLUMN qc_flag INTEGER')
+
+
+# Applied in order; a table at version N has had the first N migrations applied
+MIGRATIONS = [
+    _create_table,
+    _create_indexes,
+    _create_rollups,
+    _add_qc_flag,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _create_gps_table(conn: sqlite3.Connection, table_name: str) -> None:
+    """Version 1 of a GPS table: one row per RMC or GGA fix."""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            id INTEGER PRIMARY KEY,
+            datetime_utc INTEGER,
+            sentence TEXT,
+            nmea_time INTEGER,
+            latitude REAL,
+            longitude REAL,
+            speed_knots REAL,
+            course REAL,
+            fix_quality INTEGER,
+            satellites INTEGER,
+            hdop REAL,
+            altitude REAL
+        ) STRICT
+    ''')
+    conn.execute(
+        f'CREATE INDEX IF NOT EXISTS {table_name}_datetime_utc ON {table_name} (datetime_utc)'
+    )
+
+
+# Migrations for tables fed by a GPS stream
+GPS_MIGRATIONS = [
+    _create_gps_table,
+]
+
+
+def table_version(conn: sqlite3.Connection, table_name: str) -> int:
+    """Return the schema version of a table, 0 if tsgreader has not managed it yet."""
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS {VERSION_TABLE} '
+        f'(table_name TEXT PRIMARY KEY, version INTEGER NOT NULL) STRICT'
+    )
+    row = conn.execute(
+        f'SELECT version FROM {VERSION_TABLE} WHERE table_name = ?', (table_name,)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def ensure_schema(conn: sqlite3.Connection, table_name: str,
+                  migrations: Optional[list] = None) -> int:
+    """
+    Create or upgrade a TSG table to the current schema.
+
+    Each pending migration runs in its own transaction together with the
+    version bump, so an interrupted upgrade resumes at the failed step.
+    The transaction is begun explicitly, because Python's sqlite3 commits
+    DDL such as ALTER TABLE and CREATE TABLE as it goes; a failed migration
+    is rolled back completely, table renames included. A transaction the
+    caller has open is committed first.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection
+        table_name (str): TSG table to manage
+        migrations (list): Migrations for another kind of table, e.g. GPS_MIGRATIONS
+
+    Returns:
+        int: Number of migrations applied
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    with conn:
+        version = table_version(conn, table_name)
+    applied = 0
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        for number, migration in enumerate(migrations[version:], start=version + 1):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                migration(conn, table_name)
+                conn.execute(
+                    f'INSERT OR REPLACE INTO {VERSION_TABLE} (table_name, version) VALUES (?, ?)',
+                    (table_name, number),
+                )
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            logger.info(f"Upgraded table {table_name} to schema version {number}")
+            applied += 1
+    finally:
+        conn.isolation_level = isolation_level
+    return applied
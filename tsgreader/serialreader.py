@@ -1,19 +1,88 @@
 import serial
 import logging
-from typing import Generator, Optional
+import random
+import time
+from datetime import datetime, timezone
+from serial.tools import list_ports
+from typing import Callable, Generator, Optional
 
 logger = logging.getLogger(__name__)
 
+def _port_identity(port_info) -> Optional[tuple]:
+    """USB vendor, product and serial number of a port, or None if it is not a USB device."""
+    if port_info.vid is None:
+        return None
+    return (port_info.vid, port_info.pid, port_info.serial_number)
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds')
+
 class SerialReader:
-    def __init__(self, port: str, baudrate: int = 9600, timeout: int = 1):
-        """Initialize serial connection with specified parameters."""
+    def __init__(self, port: str, baudrate: int = 9600, timeout: int = 1,
+                 max_line_length: int = 65536, reconnect: bool = False,
+                 reconnect_delay: float = 0.5, max_reconnect_delay: float = 30,
+                 max_reconnect_attempts: Optional[int] = None,
+                 on_reconnect: Optional[Callable[[float, float], None]] = None):
+        """
+        Initialize serial connection with specified parameters.
+
+        With reconnect set, a read error closes the port and reopens it
+        instead of raising. Attempts are spaced by exponential backoff from
+        reconnect_delay up to max_reconnect_delay, each with random jitter.
+        A USB adapter that comes back under another name (e.g. ttyUSB1 or a
+        new COM number) is found again by its vendor, product and serial
+        number. Any partial line received before the fault is kept and
+        completed by the data read after reconnecting. The initial connect
+        still fails straight away, so a wrong port is reported at startup.
+        Once close() has been called, e.g. from another thread to stop a
+        blocked read, errors end the read instead of reconnecting.
+
+        Args:
+            port (str): Serial port, e.g. COM6 or /dev/ttyUSB0
+            baudrate (int): Baud rate
+            timeout (int): Seconds each read waits for data
+            max_line_length (int): Bytes kept without a line ending before discarding
+            reconnect (bool): Reopen the port after a read error instead of raising
+            reconnect_delay (float): Seconds before the first reconnect attempt
+            max_reconnect_delay (float): Longest wait between attempts
+            max_reconnect_attempts (int): Attempts before giving up and raising, None for no limit
+            on_reconnect (callable): Called with the Unix times at which the
+                port failed and came back
+        """
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
+        self.max_line_length = max_line_length
+        self.reconnect = reconnect
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_reconnect_attempts = max_reconnect_attempts
+        self.on_reconnect = on_reconnect
         self.serial_conn: Optional[serial.Serial] = None
+        # Bytes received but not yet terminated by a newline
+        self._buffer = bytearray()
+        # Start of the unread part of _buffer while lines are being yielded
+        self._pos = 0
+        # USB identity of the port, used to find it again if it is renamed
+        self._identity: Optional[tuple] = None
+        # Set by close(), so errors caused by closing the port are not reconnected
+        self._closing = False
+
+        self.reconnects = 0
+        self.downtime = 0.0
+        self.last_gap: Optional[tuple[float, float]] = None
+
+        self.bytes_read = 0
+        # Bytes waiting in the driver's receive buffer at the last read, and the most seen
+        self.in_waiting = 0
+        self.in_waiting_high_water = 0
 
     def connect(self) -> None:
         """Establish serial connection."""
+        self._closing = False
+        self._open()
+
+    def _open(self) -> None:
         try:
             self.serial_conn = serial.Serial(
                 port=self.port,
@@ -24,31 +93,210 @@ class SerialReader:
         except serial.SerialException as e:
             logger.error(f"Failed to connect to serial port {self.port}: {str(e)}")
             raise
+        identity = self._lookup_identity(self.port)
+        if identity is not None:
+            self._identity = identity
 
-    def read_lines(self) -> Generator[str, None, None]:
+    def _lookup_identity(self, device: str) -> Optional[tuple]:
+        try:
+            for port_info in list_ports.comports():
+                if port_info.device == device:
+                    return _port_identity(port_info)
+        except Exception as e:
+            logger.warning(f"Error listing serial ports: {str(e)}")
+        return None
+
+    def _find_port(self) -> str:
+        """Return the configured port, or where the same USB adapter has reappeared."""
+        if self._identity is None:
+            return self.port
+        try:
+            ports = list_ports.comports()
+        except Exception as e:
+            logger.warning(f"Error listing serial ports: {str(e)}")
+            return self.port
+        if any(port_info.device == self.port for port_info in ports):
+            return self.port
+        for port_info in ports:
+            if _port_identity(port_info) == self._identity:
+                return port_info.device
+        return self.port
+
+    def _reconnect(self) -> None:
+        """Reopen the port after a fault, with exponential backoff and jitter between attempts."""
+        failed_at = time.time()
+        delay = self.reconnect_delay
+        attempts = 0
+        while True:
+            attempts += 1
+            if self.max_reconnect_attempts is not None and attempts > self.max_reconnect_attempts:
+                raise serial.SerialException(
+                    f"Gave up reconnecting to {self.port} after {attempts - 1} attempts"
+                )
+            # Jitter spreads out retries, e.g. of several readers on one USB hub
+            time.sleep(random.uniform(delay / 2, delay))
+            if self._closing:
+                raise serial.SerialException(f"Serial port {self.port} closed while reconnecting")
+            port = self._find_port()
+            if port != self.port:
+                logger.warning(f"Serial port {self.port} reappeared as {port}")
+                self.port = port
+            try:
+                self._open()
+                break
+            except serial.SerialException:
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+        restored_at = time.time()
+        gap = restored_at - failed_at
+        self.reconnects += 1
+        self.downtime += gap
+        self.last_gap = (failed_at, restored_at)
+        logger.warning(
+            f"Reconnected to {self.port} after {gap:.1f} s and {attempts} attempts; "
+            f"no data from {_format_time(failed_at)} to {_format_time(restored_at)}"
+        )
+        if self.on_reconnect:
+            self.on_reconnect(failed_at, restored_at)
+
+    def read_lines(self, on_idle: Optional[Callable[[], None]] = None) -> Generator[str, None, None]:
         """
         Continuously read lines from serial port.
         Yields each line as it's received.
+
+        Each read blocks for up to `timeout` seconds waiting for data, then
+        takes everything already waiting in one chunk. Complete lines are
+        split out of the chunk and any trailing partial line is kept for the
+        next read.
+
+        Returns once close() has been called.
+
+        Args:
+            on_idle (callable): Called whenever a read times out with no data
         """
         if not self.serial_conn:
             self.connect()
         
+        while not self._closing:
+            try:
+                chunk = self._read()
+            except serial.SerialException:
+                if self._closing:
+                    return
+                raise
+            if not chunk:
+                if on_idle:
+                    on_idle()
+                continue
+
+            yield from self._split_lines(chunk)
+
+    def read_chunk(self) -> list[str]:
+        """
+        Read once and return the lines completed by that read.
+
+        Blocks for up to `timeout` seconds like read_lines, but returns after
+        a single read so the caller can run it in a worker thread, e.g. with
+        asyncio.to_thread. Returns an empty list if the read timed out.
+        """
+        if not self.serial_conn:
+            self.connect()
+        chunk = self._read()
+        return list(self._split_lines(chunk)) if chunk else []
+
+    def _read(self) -> bytes:
+        """
+        Read everything waiting, or wait up to `timeout` for one byte.
+
+        On a read error the port is closed, then reopened if reconnect is
+        set; the partial line buffer is left as it is. An error after
+        close() is raised without reconnecting.
+        """
         while True:
             try:
-                if self.serial_conn and self.serial_conn.in_waiting:
-                    line = self.serial_conn.readline().decode('utf-8').strip()
-                    if line:
-                        yield line
+                waiting = self.serial_conn.in_waiting
+                chunk = self.serial_conn.read(waiting or 1)
+                break
             except serial.SerialException as e:
+                if self._closing:
+                    # The port was closed under a blocked read, e.g. by Pipeline.stop()
+                    raise
                 logger.error(f"Error reading from serial port: {str(e)}")
-                self.close()
-                raise
-            except UnicodeDecodeError as e:
-                logger.warning(f"Failed to decode line: {str(e)}")
-                continue
+                self._close_port()
+                if not self.reconnect:
+                    raise
+                self._reconnect()
+        self.in_waiting = waiting
+        if waiting > self.in_waiting_high_water:
+            self.in_waiting_high_water = waiting
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def stats(self) -> dict:
+        """Return bytes read, receive buffer occupancy and reconnect counters."""
+        return {
+            'port': self.port,
+            'bytes_read': self.bytes_read,
+            'in_waiting': self.in_waiting,
+            'in_waiting_high_water': self.in_waiting_high_water,
+            'partial_line_bytes': len(self._buffer) - self._pos,
+            'reconnects': self.reconnects,
+            'downtime_seconds': round(self.downtime, 3),
+            'last_gap': ([_format_time(t) for t in self.last_gap]
+                         if self.last_gap else None),
+        }
+
+    def _split_lines(self, chunk: bytes) -> Generator[str, None, None]:
+        """
+        Append a chunk to the line buffer and yield each complete line.
+
+        The read position moves past each line before it is yielded, so a
+        caller that stops iterating part way through a chunk does not get
+        the same lines again. Lines, complete or not, longer than
+        max_line_length are discarded.
+        """
+        buffer = self._buffer
+        # Only the new bytes can hold a newline, unless a generator was not
+        # run to the end and left lines it had not yet yielded
+        start = 0 if self._pos else len(buffer)
+        if self._pos:
+            del buffer[:self._pos]
+            self._pos = 0
+        buffer += chunk
+
+        end = buffer.find(b'\n', start)
+        while end >= 0:
+            pos = self._pos
+            self._pos = end + 1
+            if end - pos > self.max_line_length:
+                logger.warning(f"Discarding {end - pos} bytes without a line ending")
+                line = None
+            else:
+                try:
+                    line = buffer[pos:end].decode('utf-8').strip()
+                except UnicodeDecodeError as e:
+                    logger.warning(f"Failed to decode line: {str(e)}")
+                    line = None
+            if line:
+                yield line
+            end = buffer.find(b'\n', self._pos)
+        del buffer[:self._pos]
+        self._pos = 0
+
+        if len(buffer) > self.max_line_length:
+            logger.warning(f"Discarding {len(buffer)} bytes without a line ending")
+            buffer.clear()
 
     def close(self) -> None:
-        """Close serial connection."""
+        """Close serial connection, ending any read in progress without reconnecting."""
+        self._closing = True
+        self._close_port()
+
+    def _close_port(self) -> None:
         if self.serial_conn and self.serial_conn.is_open:
-            self.serial_conn.close()
+            try:
+                self.serial_conn.close()
+            except serial.SerialException as e:
+                # A port that has vanished can fail to close cleanly
+                logger.warning(f"Error closing serial port {self.port}: {str(e)}")
             logger.info(f"Closed connection to serial port {self.port}")
\ No newline at end of file
@@ -0,0 +1,499 @@
+import csv
+import io
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from operator import attrgetter
+from typing import Callable, NamedTuple, Optional
+
+from tsgreader.gpsparser import GPSRecord
+from tsgreader.metrics import Metrics
+from tsgreader.rollup import update_rollups
+from tsgreader.schema import GPS_MIGRATIONS, MIGRATIONS, ensure_schema
+from tsgreader.spool import Spool, SpoolDrainer
+from tsgreader.tsgparser import TSGRecord
+
+logger = logging.getLogger(__name__)
+
+# Column order used for every insert into the TSG table
+DB_COLUMNS = ['datetime_utc', 'scan_no', 'cond', 'temp', 'salinity', 'hull_temp',
+              'time_elapsed', 'nmea_time', 'latitude', 'longitude', 'qc_flag']
+
+# Column order used for CSV output, the same as the database so the two cannot drift apart
+CSV_FIELDNAMES = DB_COLUMNS
+
+# Column order used for inserts into a GPS table
+GPS_COLUMNS = list(GPSRecord._fields)
+
+ROTATE_MODES = ('none', 'daily', 'size')
+
+_NMEA_TIME = DB_COLUMNS.index('nmea_time')
+_db_values = attrgetter(*DB_COLUMNS)
+_GPS_NMEA_TIME = GPS_COLUMNS.index('nmea_time')
+
+
+def insert_sql(table_name: str, columns: list[str] = DB_COLUMNS) -> str:
+    """Build the INSERT statement for a TSG table, or another table with the given columns."""
+    placeholders = ', '.join('?' for _ in columns)
+    return f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+def _epoch_time(row: list, index: int) -> tuple:
+    value = row[index]
+    if isinstance(value, datetime):
+        row[index] = int(value.timestamp())
+    return tuple(row)
+
+
+def record_to_row(record) -> tuple:
+    """Convert a parsed TSG record to a tuple in DB_COLUMNS order, with times as epoch seconds."""
+    if isinstance(record, TSGRecord):
+        row = list(_db_values(record))
+    else:
+        row = [record.get(column) for column in DB_COLUMNS]
+    return _epoch_time(row, _NMEA_TIME)
+
+
+def gps_record_to_row(record: GPSRecord) -> tuple:
+    """Convert a GPSRecord to a tuple in GPS_COLUMNS order, with times as epoch seconds."""
+    return _epoch_time(list(record), _GPS_NMEA_TIME)
+
+
+class TableKind(NamedTuple):
+    """How SQLiteSink stores one kind of record."""
+    columns: list[str]
+    to_row: Callable
+    migrations: list
+    rollups: bool
+    # Columns identifying a record when replaying the spool, led by the timestamp
+    key: tuple
+
+
+# Kinds of table SQLiteSink can write, named like the stream parsers that feed them
+TABLE_KINDS = {
+    'tsg': TableKind(DB_COLUMNS, record_to_row, MIGRATIONS, True,
+                     ('datetime_utc', 'nmea_time')),
+    'gps': TableKind(GPS_COLUMNS, gps_record_to_row, GPS_MIGRATIONS, False,
+                     ('datetime_utc', 'sentence', 'nmea_time')),
+}
+
+
+class SQLiteSink:
+    def __init__(self, db_path: str, table_name: str, batch_size: int = 60,
+                 flush_interval: float = 5.0, synchronous: str = 'NORMAL',
+                 metrics: Optional[Metrics] = None, spool_path: Optional[str] = None,
+                 latency_budget: float = 0.5, drain_interval: float = 5.0):
+        """
+        Batched writer for the TSG SQLite table.
+
+        Keeps a single connection open and writes records with executemany.
+        A batch is flushed when it holds batch_size records or when its oldest
+        record has waited flush_interval seconds, whichever comes first.
+        The table is created or upgraded to the current schema on connect,
+        and its rollup tables are updated in the same transaction as each batch.
+
+        More tables, e.g. one per instrument stream, can be registered with
+        add_table and written with write(record, table_name); a batch then
+        covers every table and is committed in one transaction.
+
+        With spool_path, a batch that cannot be written, e.g. because a
+        reader holds a lock or the database's network share has gone, is
+        appended to an fsynced spool file instead of being dropped, as is
+        every batch after it until a background SpoolDrainer has replayed
+        the spool. The connection waits at most latency_budget seconds for
+        a lock, and a commit that takes longer also switches to the spool,
+        so acquisition is not held up by an unhealthy database.
+
+        Args:
+            db_path (str): Path to the SQLite database
+            table_name (str): Table to insert records into
+            batch_size (int): Maximum number of records per transaction
+            flush_interval (float): Maximum age in seconds of a buffered record
+            synchronous (str): SQLite synchronous pragma used with the WAL journal
+            metrics (Metrics): If given, each commit is timed ('commit') along
+                with each record from arrival to commit ('end_to_end'), and
+                spooled records are counted ('db_spooled')
+            spool_path (str): Spool file for batches the database does not take
+            latency_budget (float): Seconds a write may take before batches
+                are spooled, used only with spool_path
+            drain_interval (float): Seconds between attempts to replay the spool
+        """
+        self.db_path = db_path
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous
+        self.metrics = metrics
+        self.conn: Optional[sqlite3.Connection] = None
+
+        self._tables: dict[str, TableKind] = {}
+        self._sql: dict[str, str] = {}
+        self._pending: dict[str, list[tuple]] = {}
+        self._pending_count = 0
+        self._pending_since: Optional[float] = None
+        # perf_counter arrival time of each pending record, kept only with metrics
+        self._arrivals: list[float] = []
+        self._opened_at = time.monotonic()
+
+        self.records_written = 0
+        self.batches_written = 0
+        self.write_seconds = 0.0
+
+        self.latency_budget = latency_budget
+        self.spool: Optional[Spool] = None
+        self.drainer: Optional[SpoolDrainer] = None
+        if spool_path:
+            self.spool = Spool(spool_path)
+            self.drainer = SpoolDrainer(self.spool, self._open, self._tables, drain_interval,
+                                        latency_budget, metrics)
+
+        self.add_table(table_name)
+
+    def add_table(self, table_name: str, kind: str = 'tsg') -> None:
+        """
+        Register another table that records can be written to.
+
+        Args:
+            table_name (str): Table name
+            kind (str): A TABLE_KINDS key, 'tsg' or 'gps'
+        """
+        if kind not in TABLE_KINDS:
+            raise ValueError(f"Invalid table kind: {kind}. Expected one of {tuple(TABLE_KINDS)}")
+        table = TABLE_KINDS[kind]
+        self._tables[table_name] = table
+        self._sql[table_name] = insert_sql(table_name, table.columns)
+        if self.conn is not None:
+            ensure_schema(self.conn, table_name, table.migrations)
+
+    def connect(self) -> None:
+        """Open the database connection, configure the journal and migrate the table."""
+        if self.drainer is not None:
+            # Also replays records spooled by a previous run
+            self.drainer.start()
+        conn = self._open()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            for table_name, table in self._tables.items():
+                ensure_schema(conn, table_name, table.migrations)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        self.conn = conn
+        logger.info(f"Opened database {self.db_path}")
+
+    def _open(self) -> sqlite3.Connection:
+        # Connections are opened lazily so a sink can be created on one thread
+        # and used on another. With a spool, lock waits are cut short and
+        # the batch is spooled instead.
+        timeout = self.latency_budget if self.spool is not None else 5.0
+        return sqlite3.connect(self.db_path, timeout=timeout, check_same_thread=False)
+
+    def write(self, record, table_name: Optional[str] = None,
+              arrival: Optional[float] = None) -> None:
+        """
+        Buffer a single record for a table (default the TSG table), flushing if due.
+
+        Args:
+            record: Record to write
+            table_name (str): Registered table, default the TSG table
+            arrival (float): time.perf_counter() when the record's line arrived,
+                for the end_to_end metric; default now
+        """
+        table_name = table_name or self.table_name
+        row = self._tables[table_name].to_row(record)
+        if not self._pending_count:
+            self._pending_since = time.monotonic()
+        self._pending.setdefault(table_name, []).append(row)
+        self._pending_count += 1
+        if self.metrics is not None:
+            self._arrivals.append(arrival if arrival is not None else time.perf_counter())
+
+        if self.flush_due():
+            self.flush()
+
+    def flush_due(self) -> bool:
+        """Return True if the buffered batch should be written now."""
+        if not self._pending_count:
+            return False
+        if self._pending_count >= self.batch_size:
+            return True
+        return time.monotonic() - self._pending_since >= self.flush_interval
+
+    def flush(self) -> None:
+        """
+        Write all buffered records in a single transaction.
+
+        The batch is spooled if the write fails and a spool is configured.
+        Without one it is discarded, so that a persistent database error
+        cannot grow the buffer without bound.
+        """
+        if not self._pending_count:
+            return
+        if self.spool is None and self.conn is None:
+            self.connect()
+
+        batches = self._pending
+        count = self._pending_count
+        arrivals = self._arrivals
+        self._pending = {}
+        self._pending_count = 0
+        self._pending_since = None
+        self._arrivals = []
+
+        if self.spool is not None and self.spool.active:
+            # Keep records in order behind those waiting to be replayed
+            self._spool_batches(batches, count)
+            return
+
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.connect()
+            with self.conn:
+                for table_name, rows in batches.items():
+                    self.conn.executemany(self._sql[table_name], rows)
+                    table = self._tables[table_name]
+                    if table.rollups:
+                        update_rollups(self.conn, table_name,
+                                       (dict(zip(table.columns, row)) for row in rows))
+        except sqlite3.Error as e:
+            if self.spool is not None:
+                logger.warning(f"Error writing to database, spooling {count} records: {str(e)}")
+                # The connection may be broken, e.g. if its network share dropped out
+                self._close_connection()
+                self._spool_batches(batches, count)
+                return
+            logger.error(f"Dropped batch of {count} records")
+            if self.metrics is not None:
+                self.metrics.incr('db_dropped', count)
+            raise
+        end = time.perf_counter()
+        self.write_seconds += end - start
+        self.records_written += count
+        self.batches_written += 1
+        if self.metrics is not None:
+            self.metrics.observe('commit', end - start)
+            for arrival in arrivals:
+                self.metrics.observe('end_to_end', end - arrival)
+        if self.spool is not None and end - start > self.latency_budget:
+            logger.warning(f"Database write took {end - start:.2f} s, over the "
+                           f"{self.latency_budget} s budget; spooling until it recovers")
+            self.spool.active = True
+
+    def _spool_batches(self, batches: dict[str, list[tuple]], count: int) -> None:
+        try:
+            self.spool.append({table_name: (self._tables[table_name].columns, rows)
+                               for table_name, rows in batches.items()})
+        except (OSError, TypeError, ValueError):
+            logger.error(f"Dropped batch of {count} records")
+            if self.metrics is not None:
+                self.metrics.incr('db_dropped', count)
+            raise
+        if self.metrics is not None:
+            self.metrics.incr('db_spooled', count)
+        self.drainer.start()
+
+    def _close_connection(self) -> None:
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Error closing database: {str(e)}")
+            self.conn = None
+
+    def stats(self) -> dict:
+        """Return write counters and throughput for this sink."""
+        elapsed = time.monotonic() - self._opened_at
+        return {
+            'records': self.records_written,
+            'batches': self.batches_written,
+            'pending': self._pending_count,
+            'write_seconds': self.write_seconds,
+            'records_per_sec': self.records_written / elapsed if elapsed > 0 else 0.0,
+            'write_records_per_sec': (self.records_written / self.write_seconds
+                                      if self.write_seconds > 0 else 0.0),
+            'spool': self.spool.stats() if self.spool is not None else None,
+        }
+
+    def close(self) -> None:
+        """Flush any buffered records, log throughput and close the connection."""
+        try:
+            self.flush()
+        finally:
+            stats = self.stats()
+            logger.info(
+                f"Wrote {stats['records']} records to {self.db_path} in "
+                f"{stats['batches']} batches "
+                f"({stats['write_records_per_sec']:.0f} records/s while writing)"
+            )
+            self._close_connection()
+            if self.drainer is not None:
+                # Replay what is left now rather than on the next run, if the database allows
+                self.drainer.stop()
+                self.spool.close()
+
+
+class CSVSink:
+    def __init__(self, datafile: str, rotate: str = 'none', max_bytes: int = 100_000_000,
+                 flush_rows: int = 60, flush_interval: float = 5.0, fsync: bool = False,
+                 fieldnames: list[str] = CSV_FIELDNAMES):
+        """
+        Buffered CSV writer with optional file rotation.
+
+        Keeps the current file open and buffers rows in memory. Buffered rows
+        are written when flush_rows rows are waiting or the oldest has waited
+        flush_interval seconds, and optionally fsynced.
+
+        With rotate='daily' a new file is started for each UTC day, named
+        like tsg_20240320.csv. With rotate='size' a new file is started once
+        the current one reaches max_bytes bytes on disk, named like
+        tsg_1.csv. The header is written once at the top of each new file.
+        Rows are written as UTF-8. An existing file whose header differs from
+        fieldnames, e.g. written before a column was added, is left alone and
+        the next free name (tsg_1.csv, ...) is used instead.
+
+        Args:
+            datafile (str): Base CSV path, e.g. tsg.csv
+            rotate (str): 'none', 'daily' or 'size'
+            max_bytes (int): File size that triggers rotation in 'size' mode
+            flush_rows (int): Number of buffered rows that triggers a flush
+            flush_interval (float): Maximum age in seconds of a buffered row
+            fsync (bool): Force data to disk after every flush
+            fieldnames (list): CSV columns, e.g. GPS_COLUMNS for a GPS stream
+        """
+        if rotate not in ROTATE_MODES:
+            raise ValueError(f"Invalid rotate mode: {rotate}. Expected one of {ROTATE_MODES}")
+
+        self.datafile = datafile
+        self.rotate = rotate
+        self.max_bytes = max_bytes
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self.path: Optional[str] = None
+        self._file = None
+        self._size = 0
+        self._day: Optional[str] = None
+        self._index = 0
+
+        self._buffer = io.StringIO()
+        self._writer = csv.DictWriter(self._buffer, fieldnames=fieldnames)
+        self._header = ','.join(fieldnames)
+        self._pending_rows = 0
+        self._pending_since: Optional[float] = None
+
+        self.rows_written = 0
+
+    def _path_for(self, day: Optional[str], index: int) -> str:
+        """Build the file name for a rotation day and size index."""
+        root, ext = os.path.splitext(self.datafile)
+        if day:
+            root = f"{root}_{day}"
+        if index:
+            root = f"{root}_{index}"
+        return f"{root}{ext}"
+
+    def _open(self, day: Optional[str], index: int = 0) -> None:
+        """Open the file for the given day, skipping files that are full or have other columns."""
+        self._close_file()
+        self._day = day
+        self._index = index
+        while not self._can_append(self._path_for(day, self._index)):
+            self._index += 1
+        self._open_path(self._path_for(day, self._index))
+
+    def _can_append(self, path: str) -> bool:
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return True
+        if self.rotate == 'size' and os.path.getsize(path) >= self.max_bytes:
+            return False
+        with open(path, newline='', encoding='utf-8', errors='replace') as f:
+            header = f.readline().rstrip('\r\n')
+        if header != self._header:
+            logger.warning(f"{path} has other columns than this version writes, "
+                           f"not appending to it")
+            return False
+        return True
+
+    def _open_path(self, path: str) -> None:
+        self.path = path
+        # Binary, so the size used for rotation counts bytes rather than characters
+        self._file = open(path, 'ab')
+        self._size = self._file.tell()
+        # Write header if file is empty
+        if self._size == 0:
+            self._writer.writeheader()
+        logger.info(f"Writing CSV to {path}")
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _record_day(self, record) -> Optional[str]:
+        if self.rotate != 'daily':
+            return None
+        timestamp = record.get('datetime_utc')
+        if timestamp is None:
+            when = datetime.now(timezone.utc)
+        else:
+            when = datetime.fromtimestamp(timestamp, timezone.utc)
+        return when.strftime('%Y%m%d')
+
+    def write(self, record) -> None:
+        """Buffer a single record, rotating and flushing as configured."""
+        # NamedTuple records become real dicts, which DictWriter handles fastest
+        if isinstance(record, tuple):
+            record = record._asdict()
+        day = self._record_day(record)
+        if self._file is None or day != self._day:
+            self.flush()
+            self._open(day)
+        elif self.rotate == 'size' and self._size >= self.max_bytes:
+            self.flush()
+            self._open(self._day, self._index + 1)
+
+        if not self._pending_rows:
+            self._pending_since = time.monotonic()
+        self._writer.writerow(record)
+        self._pending_rows += 1
+
+        if self.flush_due():
+            self.flush()
+
+    def flush_due(self) -> bool:
+        """Return True if the buffered rows should be written now."""
+        if not self._pending_rows:
+            return False
+        if self._pending_rows >= self.flush_rows:
+            return True
+        return time.monotonic() - self._pending_since >= self.flush_interval
+
+    def flush(self) -> None:
+        """Write buffered rows to the current file."""
+        data = self._buffer.getvalue()
+        if not data or self._file is None:
+            return
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+        encoded = data.encode('utf-8')
+        self._file.write(encoded)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._size += len(encoded)
+        self.rows_written += self._pending_rows
+        self._pending_rows = 0
+        self._pending_since = None
+
+    def close(self) -> None:
+        """Flush buffered rows and close the current file."""
+        try:
+            self.flush()
+        finally:
+            self._close_file()
@@ -0,0 +1,312 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Generator, Optional
+
+from tsgreader.metrics import Metrics
+from tsgreader.rollup import update_rollups
+from tsgreader.schema import ensure_schema
+
+logger = logging.getLogger(__name__)
+
+
+class Spool:
+    def __init__(self, path: str, fsync: bool = True):
+        """
+        Append-only file of database batches that could not be written.
+
+        Each batch is one JSON line holding its table, column names and
+        rows, written with a single write and fsync, so a crash loses at most
+        the batch being appended and a torn last line is skipped on replay.
+        Storing the column names lets a spool written by an older version be
+        replayed after the table gains columns.
+
+        While `active` is set, the sink appends every batch here instead of
+        writing to the database, keeping records in arrival order until the
+        drainer has replayed the spool. Batches being replayed are moved to
+        `<path>.draining` first, so appends never touch a file being read.
+
+        Args:
+            path (str): Spool file
+            fsync (bool): fsync after each appended batch
+        """
+        self.path = path
+        self.draining_path = f"{path}.draining"
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self._file = None
+
+        self.records_spooled = 0
+        self.batches_spooled = 0
+        self.records_replayed = 0
+        self.records_duplicate = 0
+        # Records left by a previous run are replayed before new writes go to the database
+        self.active = self.pending_bytes() > 0
+        if self.active:
+            logger.warning(f"Found {self.pending_bytes()} bytes of spooled records in {path}")
+
+    def append(self, batches: dict[str, tuple[list[str], list[tuple]]]) -> int:
+        """
+        Append batches for one or more tables and make the spool active.
+
+        Args:
+            batches (dict): Table name to (column names, rows)
+
+        Returns:
+            int: Number of records appended
+        """
+        lines = []
+        count = 0
+        for table_name, (columns, rows) in batches.items():
+            lines.append(json.dumps({'table': table_name, 'columns': list(columns),
+                                     'rows': rows}, separators=(',', ':')))
+            count += len(rows)
+        data = '\n'.join(lines) + '\n'
+        with self.lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.active = True
+            self.records_spooled += count
+            self.batches_spooled += 1
+        return count
+
+    def take(self) -> Optional[str]:
+        """
+        Return a file of spooled batches to replay, or None if the spool is empty.
+
+        A file left from an interrupted replay is returned first; otherwise
+        the spool file is moved aside so appends start a new one.
+        """
+        with self.lock:
+            if os.path.exists(self.draining_path):
+                return self.draining_path
+            if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                return None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            os.replace(self.path, self.draining_path)
+            return self.draining_path
+
+    def done(self, path: str) -> None:
+        """Remove a file whose batches have been committed to the database."""
+        os.remove(path)
+
+    def deactivate(self) -> bool:
+        """Let the sink write to the database again if nothing is left to replay."""
+        with self.lock:
+            if self.pending_bytes():
+                return False
+            self.active = False
+            return True
+
+    def pending_bytes(self) -> int:
+        """Bytes of batches waiting to be replayed."""
+        return sum(os.path.getsize(path) for path in (self.path, self.draining_path)
+                   if os.path.exists(path))
+
+    def close(self) -> None:
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> dict:
+        return {
+            'active': self.active,
+            'pending_bytes': self.pending_bytes(),
+            'records_spooled': self.records_spooled,
+            'batches_spooled': self.batches_spooled,
+            'records_replayed': self.records_replayed,
+            'records_duplicate': self.records_duplicate,
+        }
+
+
+def read_spool(path: str) -> Generator[tuple[str, list[str], list[list]], None, None]:
+    """
+    Yield (table name, column names, rows) for each batch in a spool file.
+
+    Lines that cannot be decoded, such as a batch torn by a crash, are logged and skipped.
+    """
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            try:
+                batch = json.loads(line)
+                yield batch['table'], batch['columns'], batch['rows']
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Skipping unreadable batch on line {number} of {path}: {str(e)}")
+
+
+def replay_rows(conn: sqlite3.Connection, table_name: str, table, columns: list[str],
+                rows: list) -> int:
+    """
+    Insert spooled rows that are not already in the table.
+
+    Rows are deduplicated against those already committed to the table, on
+    the table's key columns (TableKind.key, led by datetime_utc): the keys
+    stored in the batch's time range are read in one indexed query, so
+    replaying a spool twice, e.g. after a crash between commit and removing
+    the file, adds nothing. Rows within the batch are not compared with
+    each other, since two records may share a second, and a key holding
+    NULL never matches, so rows without an nmea_time are always inserted.
+    Rollups are updated for the inserted rows only.
+
+    Args:
+        conn (sqlite3.Connection): Connection inside an open transaction
+        table_name (str): Table to insert into
+        table (TableKind): Kind of the table
+        columns (list): Column names of the rows
+        rows (list): Spooled rows
+
+    Returns:
+        int: Number of rows inserted
+    """
+    key = [columns.index(name) for name in table.key]
+    times = [row[key[0]] for row in rows if row[key[0]] is not None]
+    stored = set()
+    if times:
+        stored.update(row for row in conn.execute(
+            f"SELECT {', '.join(table.key)} FROM {table_name} "
+            f"WHERE {table.key[0]} BETWEEN ? AND ?", (min(times), max(times))
+        ) if None not in row)
+    new_rows = [row for row in rows if tuple(row[i] for i in key) not in stored]
+
+    placeholders = ', '.join('?' for _ in columns)
+    conn.executemany(
+        f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})", new_rows
+    )
+    if table.rollups and new_rows:
+        # Columns missing from an older spool are NULL, as in the table
+        empty = dict.fromkeys(table.columns)
+        update_rollups(conn, table_name, ({**empty, **dict(zip(columns, row))}
+                                          for row in new_rows))
+    return len(new_rows)
+
+
+class SpoolDrainer:
+    def __init__(self, spool: Spool, connect: Callable[[], sqlite3.Connection], tables: dict,
+                 interval: float = 5.0, latency_budget: float = 0.5,
+                 metrics: Optional[Metrics] = None):
+        """
+        Background thread that replays the spool into SQLite once it is available.
+
+        Every interval seconds, while the spool is active, the drainer takes
+        the database write lock on its own connection, replays every spooled
+        batch in one transaction and removes the replayed file. The sink goes
+        back to writing directly only once the spool is empty and the replay
+        (or, with nothing to replay, taking the write lock) finished within
+        latency_budget, so a database that is up but slow stays behind the
+        spool.
+
+        Args:
+            spool (Spool): Spool to replay
+            connect (callable): Opens a new connection to the database
+            tables (dict): Table name to TableKind, as registered with the sink
+            interval (float): Seconds between attempts
+            latency_budget (float): Seconds a replay may take for the database
+                to count as healthy
+            metrics (Metrics): Replayed records are counted ('db_replayed')
+                and each replay timed ('replay')
+        """
+        self.spool = spool
+        self.connect = connect
+        self.tables = tables
+        self.interval = interval
+        self.latency_budget = latency_budget
+        self.metrics = metrics
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='tsg-spool', daemon=True)
+        self._thread.start()
+
+    def stop(self, drain: bool = True) -> None:
+        """Stop the thread, then make a last attempt to replay the spool if drain is set."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if drain and self.spool.active:
+            self.drain()
+        pending = self.spool.pending_bytes()
+        if pending:
+            logger.warning(
+                f"{pending} bytes of records remain in {self.spool.path} "
+                f"and will be replayed on the next run"
+            )
+
+    def drain(self) -> int:
+        """
+        Replay everything spooled so far and return the number of records inserted.
+
+        Errors leave the spool as it is for the next attempt.
+        """
+        try:
+            conn = self.connect()
+        except sqlite3.Error as e:
+            logger.warning(f"Database unavailable, records stay spooled: {str(e)}")
+            return 0
+        replayed = 0
+        try:
+            for table_name, table in list(self.tables.items()):
+                ensure_schema(conn, table_name, table.migrations)
+            start = time.perf_counter()
+            while True:
+                path = self.spool.take()
+                if path is None:
+                    # Nothing to replay: check the write lock can be taken in time
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.rollback()
+                    break
+                inserted = total = 0
+                with conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    for table_name, columns, rows in read_spool(path):
+                        table = self.tables.get(table_name)
+                        if table is None:
+                            logger.error(f"Skipping {len(rows)} spooled records for unknown "
+                                         f"table {table_name}")
+                            continue
+                        inserted += replay_rows(conn, table_name, table, columns, rows)
+                        total += len(rows)
+                self.spool.done(path)
+                replayed += inserted
+                self.spool.records_replayed += inserted
+                self.spool.records_duplicate += total - inserted
+                logger.info(f"Replayed {inserted} spooled records into the database"
+                            + (f", skipped {total - inserted} already there"
+                               if total > inserted else ""))
+            elapsed = time.perf_counter() - start
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Error replaying spool, records stay spooled: {str(e)}")
+            return replayed
+        finally:
+            conn.close()
+
+        if self.metrics is not None:
+            self.metrics.observe('replay', elapsed)
+            if replayed:
+                self.metrics.incr('db_replayed', replayed)
+        if elapsed > self.latency_budget:
+            logger.warning(f"Database took {elapsed:.2f} s to replay, over the "
+                           f"{self.latency_budget} s budget; still spooling")
+        elif self.spool.deactivate():
+            logger.info("Spool empty, writing to the database directly again")
+        return replayed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self.spool.active:
+                self.drain()
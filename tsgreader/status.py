@@ -0,0 +1,135 @@
+import atexit
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+LOG_DATEFMT = "%Y-%m-%dT%H:%M:%S"
+
+# Record fields summarised in the status line and their labels
+SUMMARY_FIELDS = {'temp': 'Lab', 'hull_temp': 'Hull', 'salinity': 'Sal'}
+
+
+def setup_logging(logfile: str, level: int = logging.INFO) -> QueueListener:
+    """
+    Log to a file and the console from a background thread.
+
+    The root logger gets a QueueHandler, so logging calls on the
+    acquisition thread only put records on a queue. A QueueListener thread
+    writes them to the file and console handlers, keeping slow console or
+    disk I/O out of the read loop. The listener is stopped at exit so
+    queued messages are still written.
+
+    Args:
+        logfile (str): Path of the log file
+        level (int): Root logger level
+
+    Returns:
+        QueueListener: The running listener
+    """
+    log_queue = queue.SimpleQueue()
+    formatter = logging.Formatter(LOG_FORMAT, datefmt=LOG_DATEFMT)
+    handlers = [logging.FileHandler(logfile), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+    return listener
+
+
+def stop_logging(listener: QueueListener) -> None:
+    """Write any queued messages and detach the handlers added by setup_logging."""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, QueueHandler) and handler.queue is listener.queue:
+            root.removeHandler(handler)
+    atexit.unregister(listener.stop)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+class StatusSummary:
+    def __init__(self, interval: float = 60, fields: dict = SUMMARY_FIELDS, name: str = 'TSG'):
+        """
+        Log the min/mean/max of a few record fields every interval seconds.
+
+        Replaces a log line per record: add() only updates running totals
+        and one INFO line covers the whole interval. tick() can be called
+        while no data arrives, so a silent instrument is reported as well.
+
+        Args:
+            interval (float): Seconds between status lines
+            fields (dict): Record field to the label used in the status line
+            name (str): Name of the stream, used in the status line
+        """
+        self.interval = interval
+        self.fields = fields
+        self.name = name
+        self._reset(time.monotonic())
+
+    def _reset(self, now: float) -> None:
+        self._started = now
+        self.count = 0
+        # Per field: [count, sum, min, max]
+        self._stats = {field: [0, 0.0, float('inf'), float('-inf')] for field in self.fields}
+
+    def add(self, record) -> None:
+        """Add a record's values to the current interval, logging if the interval has passed."""
+        self.count += 1
+        for field, stats in self._stats.items():
+            value = record.get(field)
+            # NaN compares unequal to itself and is skipped like a missing value
+            if value is None or value != value:
+                continue
+            stats[0] += 1
+            stats[1] += value
+            if value < stats[2]:
+                stats[2] = value
+            if value > stats[3]:
+                stats[3] = value
+        self.tick()
+
+    def tick(self) -> None:
+        """Log the summary if the interval has passed."""
+        now = time.monotonic()
+        if now - self._started >= self.interval:
+            self.log(now)
+
+    def summary(self) -> dict:
+        """Return count and (min, mean, max) per field for the current interval."""
+        return {
+            'count': self.count,
+            **{field: (stats[2], stats[1] / stats[0], stats[3]) if stats[0] else None
+               for field, stats in self._stats.items()},
+        }
+
+    def log(self, now: Optional[float] = None) -> None:
+        """Log the current interval and start a new one."""
+        now = time.monotonic() if now is None else now
+        elapsed = now - self._started
+        if not self.count:
+            logger.warning(f"{self.name}: no records in the last {elapsed:.0f} s")
+        else:
+            values = []
+            for field, label in self.fields.items():
+                stats = self._stats[field]
+                if stats[0]:
+                    values.append(f"{label} {stats[2]:.4g}/{stats[1] / stats[0]:.4g}/{stats[3]:.4g}")
+                else:
+                    values.append(f"{label} -")
+            logger.info(
+                f"{self.name}: {self.count} records in {elapsed:.0f} s, "
+                f"min/mean/max {', '.join(values)}"
+            )
+        self._reset(now)
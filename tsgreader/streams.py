@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Iterable, Optional
+
+import serial
+
+from tsgreader.gpsparser import NMEAParser
+from tsgreader.metrics import Metrics
+from tsgreader.qc import StreamingQC
+from tsgreader.tsgparser import TSGLineParser
+
+logger = logging.getLogger(__name__)
+
+# Parser for each kind of stream; the kind also selects the table layout (sinks.TABLE_KINDS)
+PARSERS = {
+    'tsg': TSGLineParser,
+    'gps': NMEAParser,
+}
+
+
+class Stream:
+    def __init__(self, name: str, reader, parse: Callable[[str], tuple], table_name: str,
+                 db_sink, sinks: Iterable = (), on_record: Optional[Callable] = None,
+                 metrics: Optional[Metrics] = None, qc: Optional[StreamingQC] = None):
+        """
+        One serial instrument: its reader, its parser and where its records go.
+
+        Args:
+            name (str): Name used in logs
+            reader: SerialReader (or anything with read_chunk() and close())
+            parse (callable): Function turning a line into a record
+            table_name (str): Table of db_sink the records are written to
+            db_sink: SQLiteSink shared by all streams
+            sinks (Iterable): Other sinks, e.g. a CSVSink, written with write(record)
+            on_record (callable): Called with each parsed record
+            metrics (Metrics): Parse, QC, database and line latencies and counts
+                are recorded under the stream's name, e.g. 'gps.parse'
+            qc (StreamingQC): Sets qc_flag on each record before it is written
+        """
+        self.name = name
+        self.reader = reader
+        self.parse = parse
+        self.table_name = table_name
+        self.db_sink = db_sink
+        self.sinks = list(sinks)
+        self.on_record = on_record
+        self.metrics = metrics or Metrics()
+        self.qc = qc
+
+        self.lines_read = 0
+        self.records = 0
+        self.parse_errors = 0
+
+    def handle(self, line: str, arrival: Optional[float] = None) -> None:
+        """
+        Parse a line and write the record to the database and the stream's sinks.
+
+        Args:
+            line (str): Line read from the port
+            arrival (float): time.perf_counter() when the line arrived; default now
+        """
+        if arrival is None:
+            arrival = time.perf_counter()
+        name = self.name
+        self.lines_read += 1
+        self.metrics.incr(f"{name}.lines")
+        try:
+            record = self.parse(line)
+        except Exception as e:
+            self.parse_errors += 1
+            self.metrics.incr(f"{name}.parse_errors")
+            logger.error(f"Error parsing {name} line: {line}. Error: {str(e)}")
+            return
+        if not record:
+            return
+        parsed = time.perf_counter()
+        self.metrics.observe(f"{name}.parse", parsed - arrival)
+
+        self.records += 1
+        self.metrics.incr(f"{name}.records")
+        if self.qc is not None:
+            record = self.qc.process(record)
+            checked = time.perf_counter()
+            self.metrics.observe(f"{name}.qc", checked - parsed)
+            parsed = checked
+        if self.on_record:
+            self.on_record(record)
+        try:
+            self.db_sink.write(record, self.table_name, arrival=arrival)
+        except Exception as e:
+            logger.error(f"Error writing {name} to database: {str(e)}")
+        self.metrics.observe(f"{name}.db", time.perf_counter() - parsed)
+        for sink in self.sinks:
+            try:
+                sink.write(record)
+            except Exception as e:
+                logger.error(f"Error writing {name} to {type(sink).__name__}: {str(e)}")
+        self.metrics.observe(f"{name}.line", time.perf_counter() - arrival)
+
+    def stats(self) -> dict:
+        return {'lines': self.lines_read, 'records': self.records,
+                'parse_errors': self.parse_errors}
+
+
+async def read_stream(stream: Stream) -> None:
+    """Read a stream until its port fails, handling lines on the event loop."""
+    try:
+        while True:
+            # The blocking serial read runs in a worker thread; parsing and
+            # writing stay on the event loop, so sinks are only used from one thread
+            lines = await asyncio.to_thread(stream.reader.read_chunk)
+            arrival = time.perf_counter()
+            for line in lines:
+                stream.handle(line, arrival)
+    except serial.SerialException as e:
+        logger.error(f"Stream {stream.name} stopped: {str(e)}")
+
+
+async def flush_due_sinks(sinks: Iterable, interval: float = 1.0, profiler=None) -> None:
+    """
+    Every interval seconds, write buffered records that have waited long enough.
+
+    profiler.check() is called on each pass, so a requested profile covers
+    the event loop thread where lines are parsed and written.
+    """
+    sinks = list(sinks)
+    while True:
+        await asyncio.sleep(interval)
+        if profiler:
+            profiler.check()
+        for sink in sinks:
+            try:
+                if sink.flush_due():
+                    sink.flush()
+            except Exception as e:
+                logger.error(f"Error writing to {type(sink).__name__}: {str(e)}")
+
+
+async def run_streams(streams: list[Stream], idle_flush: float = 1.0, profiler=None) -> None:
+    """
+    Read every stream concurrently in one process until all have stopped.
+
+    Each stream's serial reads run in worker threads via asyncio.to_thread;
+    records from all streams are written to the shared sinks from the
+    event loop, and partial batches are flushed every idle_flush seconds.
+
+    Args:
+        streams (list): Streams to read
+        idle_flush (float): Seconds between checks for batches due to be written
+        profiler (ProfileHook): Checked every idle_flush seconds
+    """
+    sinks = {id(sink): sink for stream in streams for sink in [stream.db_sink, *stream.sinks]}
+    flusher = asyncio.create_task(flush_due_sinks(sinks.values(), idle_flush, profiler))
+    try:
+        await asyncio.gather(*(read_stream(stream) for stream in streams))
+    finally:
+        flusher.cancel()
+        if profiler:
+            profiler.stop()
+        for stream in streams:
+            logger.info(f"Stream {stream.name}: {stream.stats()}")
@@ -1,16 +1,22 @@
+import argparse
+import os
 import random
 import time
 from datetime import datetime, timezone
 import logging
-import yaml
-from tsgreader.tsgparser import conductivity_to_salinity
-from tsgreader.main import write_to_csv, write_to_database
+from typing import Callable, Optional
+import numpy as np
+from tsgreader.tsgparser import (
+    MISSING_INT, TSG_DTYPE, TSGRecord, conductivity_to_salinity, conductivity_to_salinity_array,
+)
+
+logger = logging.getLogger(__name__)
 
 def generate_tsg_data():
     """
-    Generate a single TSG data record as a dictionary.
+    Generate a single TSG data record.
 
-    :return: A dictionary containing TSG data
+    :return: A TSGRecord containing TSG data
     """
     salinity_range = (20.2, 20.3)
     temperature_range = (10.8, 10.9)
@@ -21,62 +27,284 @@ def generate_tsg_data():
     # Add current UTC timestamp as Unix timestamp
     current_utc = int(datetime.now(timezone.utc).timestamp())
 
-    result = {
-        "datetime_utc": current_utc,
-        "scan_no": random.randint(1, 1000),
-        "cond": round(random.uniform(*salinity_range), 4),
-        "temp": round(random.uniform(*temperature_range), 4),
-        "salinity": None,  # Placeholder for salinity
-        "hull_temp": round(random.uniform(*temperature_range), 4),
-        "time_elapsed": round(random.uniform(*pressure_range), 3),
-        "nmea_time": int(datetime.now().timestamp()),
-        "longitude": round(random.uniform(*longitude_range), 5),
-        "latitude": round(random.uniform(*latitude_range), 5),
-    }
+    cond = round(random.uniform(*salinity_range), 4)
+    temp = round(random.uniform(*temperature_range), 4)
+    return TSGRecord(
+        datetime_utc=current_utc,
+        scan_no=random.randint(1, 1000),
+        cond=cond,
+        temp=temp,
+        hull_temp=round(random.uniform(*temperature_range), 4),
+        salinity=conductivity_to_salinity(cond, temp),
+        time_elapsed=round(random.uniform(*pressure_range), 3),
+        nmea_time=int(datetime.now().timestamp()),
+        latitude=round(random.uniform(*latitude_range), 5),
+        longitude=round(random.uniform(*longitude_range), 5),
+    )
+
+def generate_tsg_batch(n: int, start_time=None, interval: float = 1.0, rng=None) -> np.ndarray:
+    """
+    Generate n TSG data records at once as a structured array.
 
-    result['salinity'] = conductivity_to_salinity(result['cond'], result['temp'])
-    return result
+    Values are drawn from the same ranges as generate_tsg_data and salinity
+    is calculated for the whole batch in one call.
 
+    :param n: Number of records
+    :param start_time: Unix timestamp of the first record (default now)
+    :param interval: Seconds between records
+    :param rng: numpy Generator to draw values from
+    :return: A TSG_DTYPE structured array
+    """
+    salinity_range = (20.2, 20.3)
+    temperature_range = (10.8, 10.9)
+    pressure_range = (50, 250)
+    latitude_range = (41.3166, 41.3167)
+    longitude_range = (-72.0608, -72.0607)
 
+    rng = rng or np.random.default_rng()
+    if start_time is None:
+        start_time = int(datetime.now(timezone.utc).timestamp())
 
-def load_config(config_path="config.yaml"):
-    with open(config_path, "r") as f:
-        return yaml.safe_load(f)
+    records = np.empty(n, dtype=TSG_DTYPE)
+    times = (start_time + np.arange(n) * interval).astype(np.int64)
+    records['datetime_utc'] = times
+    records['scan_no'] = rng.integers(1, 1001, n)
+    records['cond'] = rng.uniform(*salinity_range, n).round(4)
+    records['temp'] = rng.uniform(*temperature_range, n).round(4)
+    records['hull_temp'] = rng.uniform(*temperature_range, n).round(4)
+    records['time_elapsed'] = rng.uniform(*pressure_range, n).round(3)
+    records['nmea_time'] = times
+    records['latitude'] = rng.uniform(*latitude_range, n).round(5)
+    records['longitude'] = rng.uniform(*longitude_range, n).round(5)
+    records['qc_flag'] = MISSING_INT
+    records['salinity'] = conductivity_to_salinity_array(records['cond'], records['temp'])
+    return records
 
-def main():
 
-    # Configuration
 
-    frequency = 1  # 1 data point per second
-    config = load_config()
-    file_path = config["file"]["data"]
-    db_path = config["database"]["db"]
-    table_name = config["database"]["table"]
+def _nmea_coordinate(value: float, hemispheres: str, degree_digits: int) -> str:
+    """Format decimal degrees as "DD MM.MMMM N" for key=value lines."""
+    hemisphere = hemispheres[0] if value >= 0 else hemispheres[1]
+    value = abs(value)
+    degrees = int(value)
+    minutes = (value - degrees) * 60
+    return f"{degrees:0{degree_digits}d} {minutes:07.4f} {hemisphere}"
 
-    # Configure logging
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
+def format_tsg_line(record, fmt: str = 'keyvalue') -> str:
+    """
+    Format a TSG record as a line of instrument output.
+
+    :param record: A record dict or a row of a TSG_DTYPE array
+    :param fmt: 'keyvalue' for t1=..., c1=... lines or 'fixed' for whitespace-delimited lines
+    :return: The line without a line ending
+    """
+    if fmt == 'fixed':
+        return (
+            f"{int(record['scan_no']):11d}{record['cond']:18.7f}{record['temp']:15.4f}"
+            f"{record['hull_temp']:15.4f}{record['time_elapsed']:14.3f} {int(record['nmea_time']):10d}"
+            f"{record['latitude']:16.5f}{record['longitude']:16.5f}"
+        )
+    when = datetime.fromtimestamp(int(record['nmea_time']), timezone.utc)
+    return (
+        f"t1= {record['temp']:.4f}, c1= {record['cond']:.5f}, s= {record['salinity']:7.4f}, "
+        f"t2= {record['hull_temp']:.4f}, "
+        f"lat={_nmea_coordinate(record['latitude'], 'NS', 2)}, "
+        f"lon={_nmea_coordinate(record['longitude'], 'EW', 3)}, "
+        f"hms={when:%H%M%S}, dmy={when:%d%m%y}"
+    )
+
+def format_tsg_lines(records, fmt: str = 'keyvalue') -> list[str]:
+    """Format every record of a TSG_DTYPE array with format_tsg_line."""
+    return [format_tsg_line(record, fmt) for record in records]
+
+class InstrumentEmulator:
+    def __init__(self, fmt: str = 'keyvalue', rate: float = 1.0, speed: float = 1.0,
+                 batch_size: int = 1000, partial: float = 0.0, garbage: float = 0.0,
+                 burst: float = 0.0, burst_size: int = 20, seed: Optional[int] = None):
+        """
+        Synthetic TSG that writes formatted lines to a serial device.
+
+        Records are generated in vectorized batches and paced at rate lines
+        per second of instrument time, sped up by speed (1 = real time,
+        10 = ten times faster, inf = as fast as the device accepts them).
+
+        Faults are injected per line with the given probabilities:
+            partial: the line is cut short and its line ending dropped
+            garbage: random bytes are inserted into the line
+            burst: the next burst_size lines are held back and sent at once
+
+        :param fmt: 'keyvalue' or 'fixed' line format
+        :param rate: Instrument sample rate in lines per second
+        :param speed: Acceleration factor, inf for no pacing
+        :param batch_size: Records generated per batch
+        :param partial: Probability of a partial line
+        :param garbage: Probability of garbage bytes in a line
+        :param burst: Probability of starting a burst
+        :param burst_size: Lines per burst
+        :param seed: Random seed for values and faults
+        """
+        self.fmt = fmt
+        self.rate = rate
+        self.speed = speed
+        self.batch_size = batch_size
+        self.partial = partial
+        self.garbage = garbage
+        self.burst = burst
+        self.burst_size = burst_size
+        self.rng = np.random.default_rng(seed)
+
+        self.lines_sent = 0
+        self.bytes_sent = 0
+        self.faults = {'partial': 0, 'garbage': 0, 'burst': 0}
 
-    logger.info("Starting continuous synthetic TSG data generation...")
+    def generate_lines(self, n: int, start_time: float) -> list[bytes]:
+        """Generate n encoded lines with faults applied."""
+        records = generate_tsg_batch(n, start_time=start_time, interval=1 / self.rate, rng=self.rng)
+        lines = [(line + '\r\n').encode() for line in format_tsg_lines(records, self.fmt)]
+        if not (self.partial or self.garbage):
+            return lines
 
-    while True:
-        try:
-            # Generate data
-            tsg_data = generate_tsg_data()
-            logger.info(f"Generated TSG data: {tsg_data}")
+        draws = self.rng.random((n, 2))
+        for i in np.flatnonzero(draws[:, 0] < self.garbage):
+            line = lines[i]
+            junk = bytes(self.rng.integers(0x80, 0x100, self.rng.integers(1, 16)).tolist())
+            at = int(self.rng.integers(0, len(line) - 2))
+            lines[i] = line[:at] + junk + line[at:]
+            self.faults['garbage'] += 1
+        for i in np.flatnonzero(draws[:, 1] < self.partial):
+            line = lines[i]
+            lines[i] = line[:int(self.rng.integers(1, len(line) - 2))]
+            self.faults['partial'] += 1
+        return lines
 
-            # Write to CSV
-            write_to_csv(tsg_data, file_path)
+    def run(self, write: Callable[[bytes], object], count: Optional[int] = None) -> None:
+        """
+        Write lines until count lines have been generated, or forever.
+
+        :param write: Function taking the bytes to send, e.g. os.write bound to a pty
+        :param count: Number of lines to send, or None to run until interrupted
+        """
+        start = time.monotonic()
+        instrument_start = time.time()
+        interval = 1 / (self.rate * self.speed)
+        generated = 0
+        held = []
+
+        while count is None or generated < count:
+            n = self.batch_size if count is None else min(self.batch_size, count - generated)
+            lines = self.generate_lines(n, instrument_start + generated / self.rate)
+            bursts = self.rng.random(n) < self.burst
+
+            pos = 0
+            while pos < n:
+                if interval:
+                    now = time.monotonic() - start
+                    due = int(now / interval) + 1 - (generated + pos)
+                    if due <= 0:
+                        time.sleep((generated + pos) * interval - now)
+                        continue
+                else:
+                    due = n - pos
+
+                # Send every line that is due by now in a single write
+                out = []
+                for i in range(pos, min(pos + due, n)):
+                    if held or bursts[i]:
+                        if not held:
+                            self.faults['burst'] += 1
+                        held.append(lines[i])
+                        if len(held) >= self.burst_size:
+                            out.extend(held)
+                            held = []
+                    else:
+                        out.append(lines[i])
+                self._send(write, out)
+                pos = min(pos + due, n)
+            generated += n
+
+        self._send(write, held)
+
+    def _send(self, write, lines: list[bytes]) -> None:
+        if not lines:
+            return
+        data = b''.join(lines)
+        write(data)
+        self.lines_sent += len(lines)
+        self.bytes_sent += len(data)
+
+    def stats(self) -> dict:
+        """Return lines, bytes and fault counts sent so far."""
+        return {'lines': self.lines_sent, 'bytes': self.bytes_sent, **self.faults}
+
+
+def open_output(port: Optional[str], baudrate: int):
+    """
+    Open the device the emulator writes to.
+
+    With no port a pseudo-terminal is created and its name logged so tsg can
+    be pointed at it. Otherwise port is opened with pyserial, e.g. one end of
+    a virtual null-modem pair.
+
+    :return: (write function, close function, device name)
+    """
+    if port is None:
+        import pty
+        import tty
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        name = os.ttyname(slave)
+
+        def close():
+            os.close(master)
+            os.close(slave)
+        return (lambda data: os.write(master, data)), close, name
+
+    import serial
+    conn = serial.Serial(port=port, baudrate=baudrate)
+    return conn.write, conn.close, port
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Emulate a TSG writing to a serial device")
+    parser.add_argument('--format', choices=('keyvalue', 'fixed'), default='keyvalue',
+                        help="line format")
+    parser.add_argument('--rate', type=float, default=1.0, help="instrument lines per second")
+    parser.add_argument('--speed', default='1',
+                        help="acceleration factor, e.g. 10 for 10x, or 'max' for no pacing")
+    parser.add_argument('--count', type=int, help="lines to send before exiting")
+    parser.add_argument('--port', help="serial port to write to (default: create a pty)")
+    parser.add_argument('--baudrate', type=int, default=9600)
+    parser.add_argument('--partial', type=float, default=0.0, help="probability of a partial line")
+    parser.add_argument('--garbage', type=float, default=0.0,
+                        help="probability of garbage bytes in a line")
+    parser.add_argument('--burst', type=float, default=0.0, help="probability of a burst")
+    parser.add_argument('--burst-size', type=int, default=20, help="lines per burst")
+    parser.add_argument('--seed', type=int, help="random seed")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
 
-            # Write to database
-            write_to_database(tsg_data, db_path, table_name)
+    speed = float('inf') if args.speed == 'max' else float(args.speed)
+    emulator = InstrumentEmulator(
+        fmt=args.format, rate=args.rate, speed=speed, partial=args.partial,
+        garbage=args.garbage, burst=args.burst, burst_size=args.burst_size, seed=args.seed,
+    )
+    write, close, name = open_output(args.port, args.baudrate)
+    logger.info(f"Emulating TSG on {name} at {args.rate} lines/s, speed {args.speed}")
 
-            time.sleep(1 / frequency)
-        except KeyboardInterrupt:
-            logger.info("Data generation interrupted by user. Stopping...")
-            break
-        except Exception as e:
-            logger.error(f"Error during data generation or writing: {str(e)}")
+    start = time.monotonic()
+    try:
+        emulator.run(write, args.count)
+    except KeyboardInterrupt:
+        logger.info("Emulation interrupted by user. Stopping...")
+    finally:
+        elapsed = time.monotonic() - start
+        stats = emulator.stats()
+        logger.info(
+            f"Sent {stats['lines']} lines ({stats['lines'] / elapsed:.0f} lines/s), "
+            f"{stats['partial']} partial, {stats['garbage']} garbage, {stats['burst']} bursts"
+        )
+        close()
 
 
 if __name__ == "__main__":
@@ -1,5 +1,115 @@
-from datetime import datetime, timezone
-import gsw
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Generator, Iterable, NamedTuple, Optional
+import calendar
+import re
+import time
+
+# NumPy and gsw are only needed by the bulk parsers and salinity conversion,
+# and take most of the import time, so they are imported on first use; the
+# per-line parser used by the tsg command does not need either.
+
+# Columns of the structured arrays returned by the bulk parsers (TSG_DTYPE)
+TSG_FIELDS = [
+    ('datetime_utc', 'i8'),
+    ('scan_no', 'i8'),
+    ('cond', 'f8'),
+    ('temp', 'f8'),
+    ('hull_temp', 'f8'),
+    ('salinity', 'f8'),
+    ('time_elapsed', 'f8'),
+    ('nmea_time', 'i8'),
+    ('latitude', 'f8'),
+    ('longitude', 'f8'),
+    ('qc_flag', 'i8'),
+]
+
+# Fill value for missing integer columns in bulk results; float columns use NaN
+MISSING_INT = -1
+
+FORMATS = ('auto', 'keyvalue', 'fixed')
+
+# Field order of the standard key=value output
+KEYVALUE_LAYOUT = ('t1', 'c1', 's', 't2', 'lat', 'lon', 'hms', 'dmy')
+
+# UTC epoch used to turn NMEA datetimes into Unix timestamps
+_UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_SECOND = timedelta(seconds=1)
+
+# Value patterns for known keys, one regex group per extracted value
+_NUMBER = r'([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)'
+_FIELD_PATTERNS = {
+    't1': _NUMBER,
+    'c1': _NUMBER,
+    's': _NUMBER,
+    't2': _NUMBER,
+    'lat': r'(\d+)\s+(\d*\.?\d+)\s+([NS])',
+    'lon': r'(\d+)\s+(\d*\.?\d+)\s+([EW])',
+    'hms': r'(\d\d)(\d\d)(\d\d)',
+    'dmy': r'(\d\d)(\d\d)(\d\d)',
+}
+
+class TSGRecord(NamedTuple):
+    """
+    One parsed TSG sample, fields in TSG_DTYPE order.
+
+    The record of the acquisition path (TSGLineParser, QC, sinks): a tuple
+    is far smaller and cheaper to build than a dict per sample. The public
+    line parsers, parse_tsg_line and parse_fixed_width_line, still return
+    plain dicts; to_dict() converts a record to one.
+
+    So that sinks and QC can take either kind of record, fields can also be
+    looked up by name with record['temp'], record.get('temp') and
+    record.keys(). Otherwise it is a tuple: integer indexes, slices,
+    iteration and unpacking give values, and `x in record` tests values.
+    """
+    datetime_utc: Optional[int] = None
+    scan_no: Optional[int] = None
+    cond: Optional[float] = None
+    temp: Optional[float] = None
+    hull_temp: Optional[float] = None
+    salinity: Optional[float] = None
+    time_elapsed: Optional[float] = None
+    nmea_time: Optional[datetime] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    qc_flag: Optional[int] = None
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return tuple.__getitem__(self, _RECORD_INDEX[key])
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default=None):
+        index = _RECORD_INDEX.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return _RECORD_KEYS
+
+    def to_dict(self) -> dict:
+        return dict(zip(self._fields, self))
+
+_RECORD_INDEX = {name: i for i, name in enumerate(TSGRecord._fields)}
+_new_tuple = tuple.__new__
+# A dict view, so set operations work as with dict.keys() (csv.DictWriter relies on them)
+_RECORD_KEYS = dict.fromkeys(TSGRecord._fields).keys()
+
+class BulkParseResult(NamedTuple):
+    """Records parsed from many lines, plus the line numbers that failed to parse."""
+    records: np.ndarray
+    rejects: np.ndarray
+
+class TSGChunk(NamedTuple):
+    """One chunk of a streamed file, its line count and the byte offset just past it."""
+    records: np.ndarray
+    rejects: np.ndarray
+    offset: int
+    lines: int
 
 def parse_coordinate(coord_str: str, coord_type: str) -> float:
     """
@@ -37,7 +147,7 @@ def parse_datetime(hms_str: str, dmy_str: str) -> datetime:
         dmy_str (str): Date string in DDMMYY format
         
     Returns:
-        datetime: Parsed datetime object
+        datetime: Parsed datetime object in UTC, as NMEA times are
     """
     if len(hms_str) != 6 or len(dmy_str) != 6:
         raise ValueError(f"Invalid time/date format: {hms_str}, {dmy_str}")
@@ -50,21 +160,38 @@ def parse_datetime(hms_str: str, dmy_str: str) -> datetime:
     month = int(dmy_str[2:4])
     year = 2000 + int(dmy_str[4:6])  # Assume 20XX
     
-    return datetime(year, month, day, hour, minute, second)
+    return datetime(year, month, day, hour, minute, second, tzinfo=timezone.utc)
+
+def detect_format(line: str) -> str:
+    """
+    Detect the format of a TSG line.
+
+    Returns:
+        str: 'keyvalue' for key=value lines, 'fixed' for whitespace-delimited lines
+    """
+    return 'keyvalue' if '=' in line else 'fixed'
 
 def parse_tsg_line(line: str) -> dict:
     """
-    Parse a single line of TSG data in key-value format.
+    Parse a single line of TSG data in key-value or fixed-width format.
 
     Args:
-        line (str): A comma-delimited string containing TSG measurements in key=value format
+        line (str): A comma-delimited string containing TSG measurements in key=value format,
+            or a whitespace-delimited line (see parse_fixed_width_line)
 
     Returns:
-        dict: Parsed TSG data
+        dict: Parsed TSG data, keyed by TSGRecord field
 
     Example format:
         t1= 25.5397, c1= 0.03668, s=  0.1750, t2= 21.9663, lat=41 31.4341 N, lon=070 40.3335 W, hms=210916, dmy=110825
     """
+    return _parse_record(line).to_dict()
+
+def _parse_record(line: str) -> TSGRecord:
+    """parse_tsg_line returning the TSGRecord used on the acquisition path."""
+    if detect_format(line) == 'fixed':
+        return _parse_fixed_width_record(line)
+
     try:
         # Parse key-value pairs
         pairs = [pair.strip() for pair in line.split(',')]
@@ -93,24 +220,439 @@ def parse_tsg_line(line: str) -> dict:
         if 'hms' in data_dict and 'dmy' in data_dict:
             nmea_time = parse_datetime(data_dict['hms'], data_dict['dmy'])
 
-        result = {
-            'datetime_utc': current_utc,
-            'scan_no': None,  # Not provided in new format
-            'cond': float(data_dict.get('c1', 0)),
-            'temp': float(data_dict.get('t1', 0)),
-            'hull_temp': float(data_dict.get('t2', 0)),
-            'salinity': float(data_dict.get('s', 0)),
-            'time_elapsed': None,  # Not provided in new format
-            'nmea_time': nmea_time,
-            'latitude': latitude,
-            'longitude': longitude
-        }
+        return TSGRecord(
+            datetime_utc=current_utc,
+            scan_no=None,  # Not provided in new format
+            cond=float(data_dict.get('c1', 0)),
+            temp=float(data_dict.get('t1', 0)),
+            hull_temp=float(data_dict.get('t2', 0)),
+            salinity=float(data_dict.get('s', 0)),
+            time_elapsed=None,  # Not provided in new format
+            nmea_time=nmea_time,
+            latitude=latitude,
+            longitude=longitude
+        )
 
-        return result
+    except (ValueError, IndexError) as e:
+        raise ValueError(f"Error parsing TSG line: {str(e)}") from e
+
+def parse_fixed_width_line(line: str) -> dict:
+    """
+    Parse a single line of TSG data in whitespace-delimited fixed-width format.
+
+    Fields are scan number, conductivity, temperature, hull temperature and
+    optionally elapsed time, NMEA time as a Unix timestamp, latitude and
+    longitude in decimal degrees. Salinity is calculated from conductivity
+    and temperature.
+
+    Args:
+        line (str): A whitespace-delimited string with 4 or 8 fields
+
+    Returns:
+        dict: Parsed TSG data, keyed by TSGRecord field
+
+    Example format:
+        15         0.0022200        20.2129        10.8658        56.000 1710957175        41.31663       -72.06076
+    """
+    return _parse_fixed_width_record(line).to_dict()
+
+def _parse_fixed_width_record(line: str) -> TSGRecord:
+    try:
+        fields = line.split()
+        if len(fields) not in (4, 8):
+            raise ValueError(f"Expected 4 or 8 fields, got {len(fields)}")
+
+        cond = float(fields[1])
+        temp = float(fields[2])
+        if cond < 0 or temp < 0:
+            salinity = float('nan')
+        else:
+            salinity = float(conductivity_to_salinity(cond, temp))
+
+        time_elapsed = nmea_time = latitude = longitude = None
+        if len(fields) == 8:
+            time_elapsed = float(fields[4])
+            nmea_time = datetime.fromtimestamp(int(fields[5]), timezone.utc)
+            latitude = float(fields[6])
+            longitude = float(fields[7])
+
+        return TSGRecord(
+            datetime_utc=int(datetime.now(timezone.utc).timestamp()),
+            scan_no=int(fields[0]),
+            cond=cond,
+            temp=temp,
+            hull_temp=float(fields[3]),
+            salinity=salinity,
+            time_elapsed=time_elapsed,
+            nmea_time=nmea_time,
+            latitude=latitude,
+            longitude=longitude
+        )
 
     except (ValueError, IndexError) as e:
         raise ValueError(f"Error parsing TSG line: {str(e)}") from e
 
+class TSGLineParser:
+    def __init__(self, layout: Optional[Iterable[str]] = None, relearn_after: int = 10):
+        """
+        Fast parser for key=value TSG lines.
+
+        Matches each line against one precompiled regex for a fixed field
+        layout and converts the captured groups directly, without building
+        intermediate dicts. The layout is learned from the first line that
+        parse_tsg_line accepts unless one is given. Lines that do not match
+        the layout, including fixed-width lines, go through the general
+        parser. Records are TSGRecord tuples rather than the dicts
+        parse_tsg_line returns.
+
+        Args:
+            layout (Iterable[str]): Key order, e.g. KEYVALUE_LAYOUT, or None to learn it
+            relearn_after (int): Consecutive non-matching lines that parse
+                correctly before the layout is learned again
+        """
+        self.relearn_after = relearn_after
+        self.layout: Optional[tuple] = None
+        self._regex = None
+        self._groups: dict = {}
+        self._misses = 0
+        self.fast_count = 0
+        self.fallback_count = 0
+        if layout is not None:
+            self.compile(layout)
+
+    def compile(self, layout: Iterable[str]) -> None:
+        """Build the line regex for a key order."""
+        layout = tuple(layout)
+        parts = []
+        groups = {}
+        group = 0
+        for key in layout:
+            pattern = _FIELD_PATTERNS.get(key, r'[^,]*')
+            groups[key] = group
+            group += re.compile(pattern).groups
+            parts.append(re.escape(key) + r'=\s*' + pattern)
+        missing = [key for key in ('t1', 'c1', 't2', 's') if key not in groups]
+        if missing:
+            raise ValueError(f"Missing required fields: {missing}")
+
+        self.layout = layout
+        self._regex = re.compile(r'\s*' + r'\s*,\s*'.join(parts) + r'\s*$')
+        self._groups = groups
+
+    def learn(self, line: str) -> bool:
+        """Learn the layout from a key=value line; return True if it was usable."""
+        keys = [pair.split('=', 1)[0].strip() for pair in line.split(',') if '=' in pair]
+        try:
+            self.compile(keys)
+        except ValueError:
+            return False
+        self._misses = 0
+        return True
+
+    def parse(self, line: str) -> TSGRecord:
+        """Parse a line into a TSGRecord with the values parse_tsg_line returns."""
+        values = self._match(line)
+        if values is None:
+            return self._fallback(line)
+
+        (temp, cond, salinity, hull_temp, latitude, longitude, nmea_time) = values
+        # tuple.__new__ skips the keyword handling of TSGRecord(...) on this hot path
+        return _new_tuple(TSGRecord, (int(time.time()), None, cond, temp, hull_temp, salinity,
+                                      None, nmea_time, latitude, longitude, None))
+
+    def parse_row(self, line: str) -> tuple:
+        """Parse a key=value line into a tuple in TSG_DTYPE order for bulk parsing."""
+        values = self._match(line)
+        if values is None:
+            self.fallback_count += 1
+            return _keyvalue_row(line)
+
+        nan = float('nan')
+        (temp, cond, salinity, hull_temp, latitude, longitude, nmea_time) = values
+        epoch = (nmea_time - _UNIX_EPOCH) // _ONE_SECOND if nmea_time else MISSING_INT
+        return (epoch, MISSING_INT, cond, temp, hull_temp, salinity, nan, epoch,
+                nan if latitude is None else latitude,
+                nan if longitude is None else longitude, MISSING_INT)
+
+    def _match(self, line: str) -> Optional[tuple]:
+        if self._regex is None:
+            return None
+        m = self._regex.match(line)
+        if m is None:
+            return None
+        g = m.groups()
+        groups = self._groups
+        try:
+            i = groups['t1']
+            temp = float(g[i])
+            cond = float(g[groups['c1']])
+            salinity = float(g[groups['s']])
+            hull_temp = float(g[groups['t2']])
+
+            latitude = longitude = None
+            if 'lat' in groups:
+                i = groups['lat']
+                latitude = float(g[i]) + float(g[i + 1]) / 60.0
+                if g[i + 2] == 'S':
+                    latitude = -latitude
+            if 'lon' in groups:
+                i = groups['lon']
+                longitude = float(g[i]) + float(g[i + 1]) / 60.0
+                if g[i + 2] == 'W':
+                    longitude = -longitude
+
+            nmea_time = None
+            if 'hms' in groups and 'dmy' in groups:
+                h, d = groups['hms'], groups['dmy']
+                nmea_time = datetime(2000 + int(g[d + 2]), int(g[d + 1]), int(g[d]),
+                                     int(g[h]), int(g[h + 1]), int(g[h + 2]),
+                                     tzinfo=timezone.utc)
+        except ValueError:
+            return None
+
+        self.fast_count += 1
+        self._misses = 0
+        return temp, cond, salinity, hull_temp, latitude, longitude, nmea_time
+
+    def _fallback(self, line: str) -> TSGRecord:
+        self.fallback_count += 1
+        result = _parse_record(line)
+        if detect_format(line) == 'keyvalue':
+            self._misses += 1
+            if self._regex is None or self._misses >= self.relearn_after:
+                self.learn(line)
+        return result
+
+def _keyvalue_row(line: str) -> tuple:
+    """Parse a key=value line into a tuple in TSG_DTYPE order."""
+    data = {}
+    for pair in line.split(','):
+        key, sep, value = pair.partition('=')
+        if sep:
+            data[key.strip()] = value.strip()
+
+    nan = float('nan')
+    latitude = parse_coordinate(data['lat'], 'lat') if 'lat' in data else nan
+    longitude = parse_coordinate(data['lon'], 'lon') if 'lon' in data else nan
+    nmea_time = MISSING_INT
+    if 'hms' in data and 'dmy' in data:
+        # NMEA times are UTC
+        nmea_time = calendar.timegm(parse_datetime(data['hms'], data['dmy']).timetuple())
+
+    return (nmea_time, MISSING_INT, float(data['c1']), float(data['t1']), float(data['t2']),
+            float(data['s']), nan, nmea_time, latitude, longitude, MISSING_INT)
+
+def _load_numpy() -> None:
+    """Import NumPy and create TSG_DTYPE, once, before the bulk parsers use them."""
+    global np, TSG_DTYPE
+    if 'TSG_DTYPE' in globals():
+        return
+    import numpy as np
+    TSG_DTYPE = np.dtype(TSG_FIELDS)
+
+def __getattr__(name: str):
+    # TSG_DTYPE is created on first access, e.g. `from tsgreader.tsgparser import TSG_DTYPE`
+    if name == 'TSG_DTYPE':
+        _load_numpy()
+        return TSG_DTYPE
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _parse_keyvalue_lines(lines: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    parser = TSGLineParser()
+    rows = []
+    rejects = []
+    for number, line in enumerate(lines):
+        if not line:
+            continue
+        try:
+            if parser.layout is None:
+                row = _keyvalue_row(line)
+                parser.learn(line)
+                rows.append(row)
+            else:
+                rows.append(parser.parse_row(line))
+        except (ValueError, IndexError, KeyError):
+            rejects.append(number)
+    return np.array(rows, dtype=TSG_DTYPE), np.array(rejects, dtype=np.int64)
+
+def _parse_fixed_lines(lines: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    fields = [line.split() for line in lines]
+    values = np.full((len(lines), 8), np.nan)
+    ok = np.zeros(len(lines), dtype=bool)
+
+    for width in (8, 4):
+        index = [i for i, f in enumerate(fields) if len(f) == width]
+        if not index:
+            continue
+        try:
+            # Convert all lines of this width at once, falling back to
+            # line-by-line only if something in the chunk is malformed
+            flat = np.array([x for i in index for x in fields[i]], dtype=np.float64)
+            values[index, :width] = flat.reshape(len(index), width)
+            ok[index] = True
+        except ValueError:
+            for i in index:
+                try:
+                    values[i, :width] = [float(x) for x in fields[i]]
+                    ok[i] = True
+                except ValueError:
+                    pass
+
+    blank = np.array([not f for f in fields], dtype=bool)
+    rejects = np.flatnonzero(~ok & ~blank)
+    values = values[ok]
+
+    records = np.empty(len(values), dtype=TSG_DTYPE)
+    nmea_time = np.where(np.isnan(values[:, 5]), MISSING_INT, values[:, 5]).astype(np.int64)
+    records['datetime_utc'] = nmea_time
+    records['scan_no'] = values[:, 0].astype(np.int64)
+    records['cond'] = values[:, 1]
+    records['temp'] = values[:, 2]
+    records['hull_temp'] = values[:, 3]
+    records['time_elapsed'] = values[:, 4]
+    records['nmea_time'] = nmea_time
+    records['latitude'] = values[:, 6]
+    records['longitude'] = values[:, 7]
+    records['qc_flag'] = MISSING_INT
+    records['salinity'] = conductivity_to_salinity_array(values[:, 1], values[:, 2])
+    return records, rejects
+
+def _parse_chunk(lines: list[str], fmt: str) -> tuple[np.ndarray, np.ndarray]:
+    _load_numpy()
+    lines = [line.strip() for line in lines]
+    if fmt == 'fixed':
+        return _parse_fixed_lines(lines)
+    return _parse_keyvalue_lines(lines)
+
+def _resolve_format(lines: list[str], fmt: str) -> str:
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format: {fmt}. Expected one of {FORMATS}")
+    if fmt != 'auto':
+        return fmt
+    for line in lines:
+        if line.strip():
+            return detect_format(line)
+    return 'auto'
+
+def parse_tsg_lines(lines: Iterable[str], fmt: str = 'auto') -> BulkParseResult:
+    """
+    Parse many TSG lines into a columnar structured array.
+
+    Lines that cannot be parsed are skipped and their positions recorded in
+    the reject index. Blank lines are ignored. Missing float values are NaN
+    and missing integer values are MISSING_INT. nmea_time is a Unix
+    timestamp, and datetime_utc is set to nmea_time since replayed lines have
+    no arrival time.
+
+    Args:
+        lines (Iterable[str]): TSG lines in one format
+        fmt (str): 'keyvalue', 'fixed' or 'auto' to detect from the first line
+
+    Returns:
+        BulkParseResult: TSG_DTYPE records and int64 indexes of rejected lines
+    """
+    _load_numpy()
+    lines = list(lines)
+    fmt = _resolve_format(lines, fmt)
+    if fmt == 'auto':
+        return BulkParseResult(np.empty(0, dtype=TSG_DTYPE), np.empty(0, dtype=np.int64))
+    return BulkParseResult(*_parse_chunk(lines, fmt))
+
+def iter_tsg_file(path: str, fmt: str = 'auto', chunk_size: int = 1 << 20,
+                  start: int = 0, end: Optional[int] = None) -> Generator[TSGChunk, None, None]:
+    """
+    Stream a raw capture file as chunks of parsed records.
+
+    Reads roughly chunk_size bytes at a time, cut at line boundaries. With a
+    byte range, every line that starts in [start, end) is parsed exactly once,
+    so a file can be split into adjacent ranges without losing or repeating
+    lines.
+
+    Args:
+        path (str): Raw capture file
+        fmt (str): 'keyvalue', 'fixed' or 'auto' to detect from the first line
+        chunk_size (int): Approximate number of bytes per chunk
+        start (int): Byte offset to start from
+        end (int): Byte offset to stop at, or None for the end of the file
+
+    Yields:
+        TSGChunk: Records, rejected line numbers counted from the first line
+            after start, the byte offset just past the chunk and its line count
+    """
+    _load_numpy()
+    with open(path, 'rb') as f:
+        if start > 0:
+            # Skip the line in progress at start; it belongs to the previous range
+            f.seek(start - 1)
+            f.readline()
+        offset = f.tell()
+        line_no = 0
+        carry = b''
+        done = False
+
+        while not done and (end is None or offset < end):
+            data = f.read(chunk_size)
+            if data:
+                data = carry + data
+                cut = data.rfind(b'\n') + 1
+                if cut == 0:
+                    carry = data
+                    continue
+                block, carry = data[:cut], data[cut:]
+            else:
+                # Last line without a trailing newline
+                block, carry, done = carry, b'', True
+                if not block:
+                    break
+
+            if end is not None and offset + len(block) > end:
+                stop = block.find(b'\n', max(end - offset - 1, 0)) + 1
+                block = block[:stop] if stop else block
+                done = True
+
+            lines = block.decode('utf-8', errors='replace').split('\n')
+            if lines and lines[-1] == '':
+                lines.pop()
+            fmt = _resolve_format(lines, fmt)
+            if fmt != 'auto':
+                records, rejects = _parse_chunk(lines, fmt)
+            else:
+                records, rejects = np.empty(0, dtype=TSG_DTYPE), np.empty(0, dtype=np.int64)
+
+            offset += len(block)
+            yield TSGChunk(records, rejects + line_no, offset, len(lines))
+            line_no += len(lines)
+
+def parse_tsg_file(path: str, fmt: str = 'auto', chunk_size: int = 1 << 20) -> BulkParseResult:
+    """
+    Parse a raw capture file into a columnar structured array.
+
+    Args:
+        path (str): Raw capture file
+        fmt (str): 'keyvalue', 'fixed' or 'auto' to detect from the first line
+        chunk_size (int): Approximate number of bytes read at a time
+
+    Returns:
+        BulkParseResult: TSG_DTYPE records and int64 line numbers of rejected lines
+    """
+    _load_numpy()
+    chunks = list(iter_tsg_file(path, fmt, chunk_size))
+    if not chunks:
+        return BulkParseResult(np.empty(0, dtype=TSG_DTYPE), np.empty(0, dtype=np.int64))
+    return BulkParseResult(
+        np.concatenate([chunk.records for chunk in chunks]),
+        np.concatenate([chunk.rejects for chunk in chunks]),
+    )
+
+# The TSG reports conductivity in S/m; gsw expects mS/cm
+_MS_PER_CM_PER_S_PER_M = 10.0
+
+def _practical_salinity(cond, temp, pressure):
+    """Practical salinity from conductivity in S/m, shared by the scalar and array versions."""
+    import gsw
+
+    return gsw.conversions.SP_from_C(cond * _MS_PER_CM_PER_S_PER_M, temp, pressure)
+
 def conductivity_to_salinity(cond: float, temp: float, pressure: float = 0) -> float:
     """
     Convert conductivity to salinity in PSU using the GSW toolkit.
@@ -128,4 +670,30 @@ def conductivity_to_salinity(cond: float, temp: float, pressure: float = 0) -> f
     """
     if cond < 0 or temp < 0 or pressure < 0:
         raise ValueError("cond, temp, and pressure must be non-negative values.")
-    return gsw.conversions.SP_from_C(cond, temp, pressure)
\ No newline at end of file
+    return _practical_salinity(cond, temp, pressure)
+
+def conductivity_to_salinity_array(cond, temp, pressure=0) -> np.ndarray:
+    """
+    Convert arrays of conductivity to salinity in PSU using the GSW toolkit.
+
+    Vectorized version of conductivity_to_salinity. Instead of raising,
+    samples where cond, temp or pressure is negative (or NaN) give NaN.
+
+    Args:
+        cond (array_like): Conductivity in S/m.
+        temp (array_like): Temperature in degrees Celsius.
+        pressure (array_like): Pressure in dbar (default is 0).
+
+    Returns:
+        np.ndarray: Salinity in PSU.
+    """
+    _load_numpy()
+    cond, temp, pressure = np.broadcast_arrays(
+        np.asarray(cond, dtype=np.float64),
+        np.asarray(temp, dtype=np.float64),
+        np.asarray(pressure, dtype=np.float64),
+    )
+    valid = (cond >= 0) & (temp >= 0) & (pressure >= 0)
+    salinity = np.full(cond.shape, np.nan)
+    salinity[valid] = _practical_salinity(cond[valid], temp[valid], pressure[valid])
+    return salinity